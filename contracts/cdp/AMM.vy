@@ -1,4 +1,5 @@
 #pragma version 0.3.10
+#pragma optimize codesize
 """
 @title LLAMMA AMM
 @author Curve.Fi (with edits by defidotmoney)
@@ -16,7 +17,8 @@
 # * active_band - current band. Other bands are either in one or other coin, but not both
 # * min_band - bands below this are definitely empty
 # * max_band - bands above this are definitely empty
-# * bands_x[n], bands_y[n] - amounts of coin x or y deposited in band n
+# * bands_x[n], bands_y[n] - amounts of coin x or y deposited in band n, packed into one slot in bands[n]
+# * band_bitmap[w] - bit i is set when band 256 * w + i is non-empty, used to skip over empty bands
 # * user_shares[user,n] / total_shares[n] - fraction of n'th band owned by a user
 # * p_oracle - external oracle price (can be from another AMM)
 # * p (as in get_p) - current price of AMM. It depends not only on the balances (x,y) in the band and active_band, but
@@ -77,6 +79,8 @@ event SetRate:
 MAX_TICKS: constant(int256) = 50
 MAX_TICKS_UINT: constant(uint256) = 50
 MAX_SKIP_TICKS: constant(int256) = 1024
+MAX_LADDER_BANDS: constant(int256) = 256
+MAX_LADDER_PRICES: constant(uint256) = 257  # band edges of MAX_LADDER_BANDS bands
 
 
 struct UserTicks:
@@ -118,8 +122,8 @@ active_band: public(int256)
 min_band: public(int256)
 max_band: public(int256)
 
-admin_fees_x: uint256
-admin_fees_y: uint256
+admin_fees_x: public(uint256)
+admin_fees_y: public(uint256)
 
 old_p_o: uint256
 old_dfee: uint256
@@ -127,8 +131,9 @@ prev_p_o_time: uint256
 PREV_P_O_DELAY: constant(uint256) = 2 * 60  # s = 2 min
 MAX_P_O_CHG: constant(uint256) = 12500 * 10**14  # <= 2**(1/3) - max relative change to have fee < 50%
 
-bands_x: public(HashMap[int256, uint256])
-bands_y: public(HashMap[int256, uint256])
+bands: HashMap[int256, uint256]  # x in the lower 128 bits, y in the upper 128 bits
+# bit `n % 256` of word `n // 256` is set when band `n` holds any stablecoin or collateral
+band_bitmap: public(HashMap[int256, uint256])
 
 total_shares: HashMap[int256, uint256]
 user_shares: HashMap[address, UserTicks]
@@ -316,6 +321,29 @@ def p_oracle_down(n: int256) -> uint256:
     return self._p_oracle_up(n + 1)
 
 
+@view
+@external
+def p_oracle_ladder(n1: int256, n2: int256) -> DynArray[uint256, MAX_LADDER_PRICES]:
+    """
+    @notice Oracle price edges of all bands from `n1` to `n2`
+    @dev Element `i` is `p_oracle_up(n1 + i)`, which is also `p_oracle_down(n1 + i - 1)`.
+         The base price is only calculated once for the whole range.
+    @param n1 Lowest band number
+    @param n2 Highest band number, less than MAX_LADDER_BANDS above `n1`
+    @return Prices at 1e18 base, `n2 - n1 + 2` values starting at `p_oracle_up(n1)`
+    """
+    assert n2 >= n1 and n2 - n1 < MAX_LADDER_BANDS  # dev: invalid band range
+    base_price: uint256 = self._base_price()
+    prices: DynArray[uint256, MAX_LADDER_PRICES] = []
+    n: int256 = n1
+    for i in range(MAX_LADDER_PRICES):
+        prices.append(unsafe_div(base_price * self._band_exp(n), 10**18))
+        if n > n2:
+            break
+        n = unsafe_add(n, 1)
+    return prices
+
+
 @view
 @external
 def get_p() -> uint256:
@@ -324,7 +352,30 @@ def get_p() -> uint256:
     @return Current price at 1e18 base
     """
     n: int256 = self.active_band
-    return self._get_p(n, self.bands_x[n], self.bands_y[n])
+    xy: uint256[2] = self._read_band(n)
+    return self._get_p(n, xy[0], xy[1])
+
+
+@view
+@external
+def bands_x(n: int256) -> uint256:
+    """
+    @notice Amount of stablecoin deposited in band `n`
+    @param n Band number (can be negative)
+    @return Amount at 1e18 base
+    """
+    return self.bands[n] & (2**128 - 1)
+
+
+@view
+@external
+def bands_y(n: int256) -> uint256:
+    """
+    @notice Amount of collateral deposited in band `n`
+    @param n Band number (can be negative)
+    @return Amount at 1e18 base
+    """
+    return shift(self.bands[n], -128)
 
 
 @view
@@ -345,18 +396,17 @@ def can_skip_bands(n_end: int256) -> bool:
     @notice Check that we have no liquidity between active_band and `n_end`
     """
     n: int256 = self.active_band
-    for i in range(MAX_SKIP_TICKS):
-        if n_end > n:
-            if self.bands_y[n] != 0:
-                return False
-            n = unsafe_add(n, 1)
-        else:
-            if self.bands_x[n] != 0:
-                return False
-            n = unsafe_sub(n, 1)
-        if n == n_end:  # not including n_end
-            break
-    return True
+    found: bool = False
+    if n_end > n:
+        # collateral in [active_band, n_end), not including n_end
+        found, n = self._find_band(n, n_end - 1, True)
+    elif n_end == n:
+        # stablecoin in active_band, after which the search turns back up to n_end - 1
+        return self.bands[n] & (2**128 - 1) == 0 and shift(self.bands[n - 1], -128) == 0
+    else:
+        # stablecoin in (n_end, active_band]
+        found, n = self._find_band(n, n_end + 1, False)
+    return not found
     # Actually skipping bands:
     # * change self.active_band to the new n
     # * change self.p_base_mul
@@ -368,16 +418,13 @@ def can_skip_bands(n_end: int256) -> bool:
 @external
 def active_band_with_skip() -> int256:
     n0: int256 = self.active_band
-    n: int256 = n0
-    min_band: int256 = self.min_band
-    for i in range(MAX_SKIP_TICKS):
-        if n < min_band:
-            n = n0 - MAX_SKIP_TICKS
-            break
-        if self.bands_x[n] != 0:
-            break
-        n = unsafe_sub(n, 1)
-    return n
+    if self.min_band <= n0:
+        found: bool = False
+        n: int256 = 0
+        found, n = self._find_band(n0, self.min_band, False)
+        if found:
+            return n
+    return n0 - MAX_SKIP_TICKS
 
 
 @view
@@ -522,8 +569,9 @@ def get_amount_for_price(p: uint256) -> (uint256, bool):
 
     for i in range(MAX_TICKS + MAX_SKIP_TICKS):
         assert p_o_up > 0
-        x: uint256 = self.bands_x[n]
-        y: uint256 = self.bands_y[n]
+        xy: uint256[2] = self._read_band(n)
+        x: uint256 = xy[0]
+        y: uint256 = xy[1]
         if i == 0:
             if p < self._get_p(n, x, y):
                 pump = False
@@ -677,25 +725,22 @@ def deposit_range(user: address, amount: uint256, n1: int256, n2: int256):
     lm: LMGauge = self.lm_hook
 
     # Autoskip bands if we can
-    for i in range(MAX_SKIP_TICKS + 1):
-        if n1 > n0:
-            if i != 0:
-                self.active_band = n0
-            break
-        assert self.bands_x[n0] == 0 and i < MAX_SKIP_TICKS, "DFM:A Deposit below current band"
-        n0 -= 1
+    if n1 <= n0:
+        assert n0 - n1 < MAX_SKIP_TICKS and not self._find_band(n0, n1, False)[0], "DFM:A Deposit below current band"
+        self.active_band = n1 - 1
 
     for i in range(MAX_TICKS):
         band: int256 = unsafe_add(n1, i)
         if band > n2:
             break
 
-        assert self.bands_x[band] == 0, "DFM:A Band not empty"
+        xy: uint256[2] = self._read_band(band)
+        assert xy[0] == 0, "DFM:A Band not empty"
         y: uint256 = y_per_band
         if i == 0:
             y = amount * coll_precision - y * unsafe_sub(n_bands, 1)
 
-        total_y: uint256 = self.bands_y[band]
+        total_y: uint256 = xy[1]
 
         # Total / user share
         s: uint256 = self.total_shares[band]
@@ -708,7 +753,7 @@ def deposit_range(user: address, amount: uint256, n1: int256, n2: int256):
         self.total_shares[band] = s
 
         total_y += y
-        self.bands_y[band] = total_y
+        self._write_band(band, 0, total_y)
 
         if lm.address != empty(address):
             # If initial s == 0 - s becomes equal to y which is > 100 => nonzero
@@ -754,8 +799,9 @@ def withdraw(user: address, frac: uint256) -> uint256[2]:
     coll_precision: uint256 = self.COLLATERAL_PRECISION
 
     for i in range(MAX_TICKS):
-        x: uint256 = self.bands_x[n]
-        y: uint256 = self.bands_y[n]
+        xy: uint256[2] = self._read_band(n)
+        x: uint256 = xy[0]
+        y: uint256 = xy[1]
         ds: uint256 = unsafe_div(frac * user_shares[i], 10**18)
         user_shares[i] = unsafe_sub(user_shares[i], ds)  # Can ONLY zero out when frac == 10**18
         s: uint256 = self.total_shares[n]
@@ -783,8 +829,7 @@ def withdraw(user: address, frac: uint256) -> uint256[2]:
                     min_band += 1
         if x > 0 or y > 0:
             max_band = n
-        self.bands_x[n] = x
-        self.bands_y[n] = y
+        self._write_band(n, x, y)
         total_x += dx
         total_y += dy
 
@@ -870,10 +915,15 @@ def set_oracle(oracle: PriceOracle):
 def set_rate(rate: uint256) -> uint256:
     """
     @notice Set interest rate. That affects the dependence of AMM base price over time
+    @dev If the same rate was already applied within this block, this call is
+         a no-op and no `SetRate` event is emitted
     @param rate New rate in units of int(fraction * 1e18) per second
     @return rate_mul multiplier (e.g. 1.0 + integral(rate, dt))
     """
     self._assert_only_controller()
+    if self.rate_time == block.timestamp and self.rate == rate:
+        return self.rate_mul
+
     rate_mul: uint256 = self._rate_mul()
     self.rate_mul = rate_mul
     self.rate_time = block.timestamp
@@ -1025,8 +1075,17 @@ def _p_oracle_up(n: int256) -> uint256:
     """
     # p_oracle_up(n) = p_base * ((A - 1) / A) ** n
     # p_oracle_down(n) = p_base * ((A - 1) / A) ** (n + 1) = p_oracle_up(n+1)
-    # return unsafe_div(self._base_price() * self.exp_int(-n * LOG_A_RATIO), 10**18)
+    return unsafe_div(self._base_price() * self._band_exp(n), 10**18)
 
+
+@view
+@internal
+def _band_exp(n: int256) -> uint256:
+    """
+    @notice Multiplier of the base price for the upper edge of band `n`
+    @param n Band number (can be negative)
+    @return ((A - 1) / A) ** n at 1e18 base
+    """
     power: int256 = -n * LOG_A_RATIO
 
     # ((A - 1) / A) ** n = exp(-n * ln(A / (A - 1))) = exp(-n * LOG_A_RATIO)
@@ -1061,7 +1120,7 @@ def _p_oracle_up(n: int256) -> uint256:
         unsafe_sub(k, 195))
     ## End exp
     assert exp_result > 1000  # dev: limit precision of the multiplier
-    return unsafe_div(self._base_price() * exp_result, 10**18)
+    return exp_result
 
 
 @view
@@ -1154,6 +1213,81 @@ def _get_p(n: int256, x: uint256, y: uint256) -> uint256:
     return (f + x * 10**18) / (g + y)
 
 
+@view
+@internal
+def _read_band(n: int256) -> uint256[2]:
+    """
+    @notice Unpacks and reads the amounts of coins in a band
+    @param n Band number
+    @return Amounts of [stablecoin, collateral] in the band
+    """
+    xy: uint256 = self.bands[n]
+    return [xy & (2**128 - 1), shift(xy, -128)]
+
+
+@internal
+def _write_band(n: int256, x: uint256, y: uint256):
+    """
+    @notice Packs and writes the amounts of coins in a band
+    @param n Band number
+    @param x Amount of stablecoin in the band
+    @param y Amount of collateral in the band
+    """
+    assert x <= 2**128 - 1 and y <= 2**128 - 1
+    xy: uint256 = x | shift(y, 128)
+    if (self.bands[n] == 0) != (xy == 0):
+        # band changed between empty and non-empty
+        self.band_bitmap[shift(n, -8)] ^= 1 << convert(n & 255, uint256)
+    self.bands[n] = xy
+
+
+@view
+@internal
+def _find_band(n_from: int256, n_to: int256, up: bool) -> (bool, int256):
+    """
+    @notice Find the first band holding collateral when searching up, or stablecoin
+            when searching down, from `n_from` towards `n_to` (inclusive)
+    @dev Bands are only read when marked as non-empty in `band_bitmap`, and
+         empty bitmap words are skipped in one step. At most MAX_SKIP_TICKS
+         bands are searched.
+    @return (band found, band number)
+    """
+    n: int256 = n_from
+    n_last: int256 = 0
+    if up:
+        n_last = min(n_to, unsafe_add(n, MAX_SKIP_TICKS - 1))
+    else:
+        n_last = max(n_to, unsafe_sub(n, MAX_SKIP_TICKS - 1))
+    word: int256 = shift(n, -8)
+    bits: uint256 = self.band_bitmap[word]
+    for i in range(MAX_SKIP_TICKS):
+        if shift(n, -8) != word:
+            word = shift(n, -8)
+            bits = self.band_bitmap[word]
+        if bits == 0:
+            # skip the rest of the empty word
+            n = shift(word, 8)
+            if up:
+                n = unsafe_add(n, 255)
+                if n >= n_last:
+                    break
+            elif n <= n_last:
+                break
+        elif (bits >> convert(n & 255, uint256)) & 1 != 0:
+            xy: uint256 = self.bands[n]
+            if up:
+                xy = shift(xy, -128)
+            if xy & (2**128 - 1) != 0:
+                return (True, n)
+        if n == n_last:
+            break
+        if up:
+            n = unsafe_add(n, 1)
+        else:
+            n = unsafe_sub(n, 1)
+    return (False, 0)
+
+
 @view
 @internal
 def _read_user_tick_numbers(user: address) -> int256[2]:
@@ -1215,8 +1349,9 @@ def calc_swap_out(pump: bool, in_amount: uint256, p_o: uint256[2], in_precision:
     out: DetailedTrade = empty(DetailedTrade)
     out.n2 = self.active_band
     p_o_up: uint256 = self._p_oracle_up(out.n2)
-    x: uint256 = self.bands_x[out.n2]
-    y: uint256 = self.bands_y[out.n2]
+    xy: uint256[2] = self._read_band(out.n2)
+    x: uint256 = xy[0]
+    y: uint256 = xy[1]
 
     in_amount_left: uint256 = in_amount
     fee: uint256 = max(self.fee, p_o[1])
@@ -1294,7 +1429,7 @@ def calc_swap_out(pump: bool, in_amount: uint256, p_o: uint256[2], in_precision:
                 out.n2 = unsafe_add(out.n2, 1)
                 p_o_up = unsafe_div(p_o_up * Aminus1, A)
                 x = 0
-                y = self.bands_y[out.n2]
+                y = shift(self.bands[out.n2], -128)
 
         else:  # dump
             if x != 0:
@@ -1333,7 +1468,7 @@ def calc_swap_out(pump: bool, in_amount: uint256, p_o: uint256[2], in_precision:
                     break
                 out.n2 = unsafe_sub(out.n2, 1)
                 p_o_up = unsafe_div(p_o_up * A, Aminus1)
-                x = self.bands_x[out.n2]
+                x = self.bands[out.n2] & (2**128 - 1)
                 y = 0
 
         if j != MAX_TICKS_UINT:
@@ -1401,8 +1536,9 @@ def calc_swap_in(pump: bool, out_amount: uint256, p_o: uint256[2], in_precision:
     out: DetailedTrade = empty(DetailedTrade)
     out.n2 = self.active_band
     p_o_up: uint256 = self._p_oracle_up(out.n2)
-    x: uint256 = self.bands_x[out.n2]
-    y: uint256 = self.bands_y[out.n2]
+    xy: uint256[2] = self._read_band(out.n2)
+    x: uint256 = xy[0]
+    y: uint256 = xy[1]
 
     out_amount_left: uint256 = out_amount
     fee: uint256 = max(self.fee, p_o[1])
@@ -1478,7 +1614,7 @@ def calc_swap_in(pump: bool, out_amount: uint256, p_o: uint256[2], in_precision:
                 out.n2 += 1
                 p_o_up = unsafe_div(p_o_up * Aminus1, A)
                 x = 0
-                y = self.bands_y[out.n2]
+                y = shift(self.bands[out.n2], -128)
 
         else:  # dump
             if x != 0:
@@ -1516,7 +1652,7 @@ def calc_swap_in(pump: bool, out_amount: uint256, p_o: uint256[2], in_precision:
                     break
                 out.n2 -= 1
                 p_o_up = unsafe_div(p_o_up * A, Aminus1)
-                x = self.bands_x[out.n2]
+                x = self.bands[out.n2] & (2**128 - 1)
                 y = 0
 
         if j != MAX_TICKS_UINT:
@@ -1560,9 +1696,9 @@ def get_xy_up(user: address, use_y: bool) -> uint256:
         x: uint256 = 0
         y: uint256 = 0
         if n >= n_active:
-            y = self.bands_y[n]
+            y = shift(self.bands[n], -128)
         if n <= n_active:
-            x = self.bands_x[n]
+            x = self.bands[n] & (2**128 - 1)
         # p_o_up: uint256 = self._p_oracle_up(n)
         p_o_up: uint256 = p_o_down
         # p_o_down = self._p_oracle_up(n + 1)
@@ -1688,8 +1824,9 @@ def _get_xy(user: address, is_sum: bool) -> DynArray[uint256, MAX_TICKS_UINT][2]
         for i in range(MAX_TICKS):
             total_shares: uint256 = self.total_shares[ns[0]] + DEAD_SHARES
             ds: uint256 = ticks[i]
-            dx: uint256 = unsafe_div((self.bands_x[ns[0]] + 1) * ds, total_shares)
-            dy: uint256 = unsafe_div((self.bands_y[ns[0]] + 1) * ds, total_shares)
+            xy: uint256[2] = self._read_band(ns[0])
+            dx: uint256 = unsafe_div((xy[0] + 1) * ds, total_shares)
+            dy: uint256 = unsafe_div((xy[1] + 1) * ds, total_shares)
             if is_sum:
                 xs[0] += dx
                 ys[0] += dy
@@ -1797,8 +1934,7 @@ def _exchange(i: uint256, j: uint256, amount: uint256, minmax_amount: uint256, _
             y = out.ticks_in[unsafe_sub(n_diff, k)]
             if n == out.n2:
                 x = out.last_tick_j
-        self.bands_x[n] = x
-        self.bands_y[n] = y
+        self._write_band(n, x, y)
         if lm.address != empty(address):
             s: uint256 = 0
             if y > 0:
@@ -213,9 +213,23 @@ enum HookType:
     FEE_ONLY
     FEE_AND_REBATE
 
+enum LoanAction:
+    CREATE
+    ADJUST
+    CLOSE
+
+struct LoanOperation:
+    action: LoanAction
+    market: address
+    coll_change: int256
+    debt_change: int256
+    n_bands: uint256
+    max_active_band: int256
+
 
 NUM_HOOK_IDS: constant(uint256) = 4
 MAX_HOOKS: constant(uint256) = 4
+MAX_OPERATIONS: constant(uint256) = 16
 
 # Limits
 MIN_A: constant(uint256) = 2
@@ -250,6 +264,8 @@ is_protocol_enabled: public(bool)
 implementations: HashMap[uint256, Implementations]
 
 market_hooks: HashMap[address, DynArray[uint256, MAX_HOOKS]]
+# market -> HookId -> packed hookdata of the hooks active on that hook point
+market_hooks_by_id: HashMap[address, HashMap[uint256, DynArray[uint256, MAX_HOOKS]]]
 hook_debt: HashMap[address, HashMap[address, uint256]]
 total_hook_debt: public(uint256)
 
@@ -667,40 +683,16 @@ def create_loan(
     @param n_bands Number of bands to deposit collateral into
                    Can be from market.MIN_TICKS() to market.MAX_TICKS()
     """
-    assert coll_amount > 0 and debt_amount > 0, "DFM:C 0 coll or debt"
     self._assert_is_protocol_enabled()
     self._assert_caller_or_approved_delegate(account)
     c: MarketContracts = self._get_market_contracts_or_revert(market)
 
-    hook_adjust: int256 = self._call_hooks(
-        market,
-        HookId.ON_CREATE_LOAN,
-        _abi_encode(
-            account,
-            market,
-            coll_amount,
-            debt_amount,
-            method_id=method_id("on_create_loan(address,address,uint256,uint256)")
-        ),
-        self._positive_only_bounds(debt_amount)
-    )
-    debt_amount_final: uint256 = self._uint_plus_int(debt_amount, hook_adjust)
-
-    self._deposit_collateral(msg.sender, c.collateral, c.amm, coll_amount)
-    debt_increase: uint256 = MarketOperator(market).create_loan(account, coll_amount, debt_amount_final, n_bands)
-
-    total_debt: uint256 = self.total_debt + debt_increase
-    self._assert_below_debt_ceiling(total_debt)
-
-    self.total_debt = total_debt
-    self.minted += debt_amount
+    self._create_loan(account, market, c, coll_amount, debt_amount, n_bands)
 
     STABLECOIN.mint(msg.sender, debt_amount)
 
     self._update_rate(market, c.amm, c.mp_idx)
 
-    log CreateLoan(market, account, msg.sender, coll_amount, debt_amount_final)
-
 
 @external
 @nonreentrant('lock')
@@ -719,51 +711,19 @@ def adjust_loan(
     @param debt_change Debt adjustment amount. A positive value mints, negative burns.
     @param max_active_band Maximum active band (used to prevent front-running)
     """
-    assert coll_change != 0 or debt_change != 0, "DFM:C No change"
-
     self._assert_is_protocol_enabled()
     self._assert_caller_or_approved_delegate(account)
     c: MarketContracts = self._get_market_contracts_or_revert(market)
 
-    debt_change_final: int256 = self._call_hooks(
-        market,
-        HookId.ON_ADJUST_LOAN,
-        _abi_encode(
-            account,
-            market,
-            coll_change,
-            debt_change,
-            method_id=method_id("on_adjust_loan(address,address,int256,int256)")
-        ),
-        self._adjust_loan_bounds(debt_change)
-    ) + debt_change
-
-    debt_adjustment: int256 = MarketOperator(market).adjust_loan(account, coll_change, debt_change_final, max_active_band)
+    self._adjust_loan(account, market, c, coll_change, debt_change, max_active_band)
 
-    total_debt: uint256 = self._uint_plus_int(self.total_debt, debt_adjustment)
-    self.total_debt = total_debt
-
-    if debt_change != 0:
-        debt_change_abs: uint256 = convert(abs(debt_change), uint256)
-        if debt_change > 0:
-            self._assert_below_debt_ceiling(total_debt)
-            self.minted += debt_change_abs
-            STABLECOIN.mint(msg.sender, debt_change_abs)
-        else:
-            self.redeemed += debt_change_abs
-            STABLECOIN.burn(msg.sender, debt_change_abs)
-
-    if coll_change != 0:
-        coll_change_abs: uint256 = convert(abs(coll_change), uint256)
-        if coll_change > 0:
-            self._deposit_collateral(msg.sender, c.collateral, c.amm, coll_change_abs)
-        else:
-            self._withdraw_collateral(msg.sender, c.collateral, c.amm, coll_change_abs)
+    if debt_change > 0:
+        STABLECOIN.mint(msg.sender, convert(debt_change, uint256))
+    elif debt_change < 0:
+        STABLECOIN.burn(msg.sender, convert(-debt_change, uint256))
 
     self._update_rate(market, c.amm, c.mp_idx)
 
-    log AdjustLoan(market, account, msg.sender, coll_change, debt_change_final)
-
 
 @external
 @nonreentrant('lock')
@@ -782,35 +742,85 @@ def close_loan(account: address, market: address) -> (int256, uint256):
     self._assert_caller_or_approved_delegate(account)
     c: MarketContracts = self._get_market_contracts_or_revert(market)
 
-    debt_adjustment: int256 = 0
     burn_amount: uint256 = 0
     xy: uint256[2] = empty(uint256[2])
-    debt_adjustment, burn_amount, xy = MarketOperator(market).close_loan(account)
-
-    burn_adjust: int256 = self._call_hooks(
-        market,
-        HookId.ON_CLOSE_LOAN,
-        _abi_encode(account, market, burn_amount, method_id=method_id("on_close_loan(address,address,uint256)")),
-        self._positive_only_bounds(burn_amount)
-    )
-    burn_amount = self._uint_plus_int(burn_amount, burn_adjust)
-
-    self.redeemed += burn_amount
-    self.total_debt = self._uint_plus_int(self.total_debt, debt_adjustment)
+    burn_amount, xy = self._close_loan(account, market, c)
 
-    if xy[0] > 0:
-        STABLECOIN.transferFrom(c.amm, msg.sender, xy[0])
     STABLECOIN.burn(msg.sender, burn_amount)
-    if xy[1] > 0:
-        self._withdraw_collateral(msg.sender, c.collateral, c.amm, xy[1])
 
     self._update_rate(market, c.amm, c.mp_idx)
 
-    log CloseLoan(market, account, msg.sender, xy[1], xy[0], burn_amount)
-
     return convert(xy[0], int256) - convert(burn_amount, int256), xy[1]
 
 
+@external
+@nonreentrant('lock')
+def execute(account: address, operations: DynArray[LoanOperation, MAX_OPERATIONS]) -> int256:
+    """
+    @notice Create, adjust and close loans for `account` across several markets
+    @dev Each operation is applied in order, with the same checks and hooks as
+         `create_loan`, `adjust_loan` and `close_loan`. Stablecoins minted and
+         burned by all operations are netted into a single mint or burn for the
+         caller, and the rate of each touched market is updated once at the end.
+    @param account Account to apply the operations for
+    @param operations List of operations:
+             * action: `LoanAction` to apply
+             * market: Market of the loan
+             * coll_change: Collateral adjustment amount. A positive value deposits,
+               negative withdraws. Must be positive for `CREATE`, unused for `CLOSE`.
+             * debt_change: Debt adjustment amount. A positive value mints, negative
+               burns. Must be positive for `CREATE`, unused for `CLOSE`.
+             * n_bands: Number of bands to deposit collateral into, only for `CREATE`
+             * max_active_band: Maximum active band, only for `ADJUST`
+    @return Debt balance change for caller
+             * negative value indicates the net amount burned
+             * positive value indicates the net amount minted or received from AMMs
+    """
+    self._assert_caller_or_approved_delegate(account)
+
+    mint_amount: int256 = 0
+    amm_received: uint256 = 0
+    markets: DynArray[address, MAX_OPERATIONS] = []
+
+    for op in operations:
+        c: MarketContracts = self._get_market_contracts_or_revert(op.market)
+
+        if op.action == LoanAction.CLOSE:
+            burn_amount: uint256 = 0
+            xy: uint256[2] = empty(uint256[2])
+            burn_amount, xy = self._close_loan(account, op.market, c)
+            mint_amount -= convert(burn_amount, int256)
+            amm_received += xy[0]
+        else:
+            self._assert_is_protocol_enabled()
+            if op.action == LoanAction.CREATE:
+                self._create_loan(
+                    account,
+                    op.market,
+                    c,
+                    convert(op.coll_change, uint256),
+                    convert(op.debt_change, uint256),
+                    op.n_bands
+                )
+            else:
+                self._adjust_loan(account, op.market, c, op.coll_change, op.debt_change, op.max_active_band)
+            mint_amount += op.debt_change
+
+        if op.market not in markets:
+            markets.append(op.market)
+
+    if mint_amount > 0:
+        STABLECOIN.mint(msg.sender, convert(mint_amount, uint256))
+    elif mint_amount < 0:
+        STABLECOIN.burn(msg.sender, convert(-mint_amount, uint256))
+
+    for market in markets:
+        c: MarketContracts = self.market_contracts[market]
+        self._update_rate(market, c.amm, c.mp_idx)
+
+    return mint_amount + convert(amm_received, int256)
+
+
 @external
 @nonreentrant('lock')
 def liquidate(market: address, target: address, min_x: uint256, frac: uint256 = 10**18) -> (int256, uint256):
@@ -825,49 +835,61 @@ def liquidate(market: address, target: address, min_x: uint256, frac: uint256 =
              * positive value indicates a surplus received from the AMM
             Collateral balance received from AMM
     """
-    assert frac <= 10**18, "DFM:C frac too high"
     c: MarketContracts = self._get_market_contracts_or_revert(market)
 
     debt_adjustment: int256 = 0
     debt_amount: uint256 = 0
     xy: uint256[2] = empty(uint256[2])
-    debt_adjustment, debt_amount, xy = MarketOperator(market).liquidate(msg.sender, target, min_x, frac)
+    debt_adjustment, debt_amount, xy = self._liquidate(market, target, min_x, frac)
 
-    burn_adjust: int256 = self._call_hooks(
-        market,
-        HookId.ON_LIQUIDATION,
-        _abi_encode(
-            msg.sender,
-            market,
-            target,
-            debt_amount,
-            method_id=method_id("on_liquidation(address,address,address,uint256)")
-        ),
-        self._positive_only_bounds(debt_amount)
-    )
-    debt_amount = self._uint_plus_int(debt_amount, burn_adjust)
+    return self._settle_liquidation(market, c, debt_adjustment, debt_amount, xy)
 
-    self.redeemed += debt_amount
-    self.total_debt = self._uint_plus_int(self.total_debt, debt_adjustment)
 
-    burn_amm: uint256 = min(xy[0], debt_amount)
-    if burn_amm != 0:
-        STABLECOIN.burn(c.amm, burn_amm)
+@external
+@nonreentrant('lock')
+def liquidate_many(
+    market: address,
+    targets: DynArray[address, 255],
+    min_xs: DynArray[uint256, 255],
+    fracs: DynArray[uint256, 255]
+) -> (int256, uint256):
+    """
+    @notice Perform liquidations on multiple unhealthy accounts within one market
+    @dev Each target is liquidated and passed through the market hooks in the same
+         way as in `liquidate`. Stablecoin and collateral transfers are netted
+         across all targets, and the market rate is only updated once at the end.
+    @param market Market of the loans being liquidated
+    @param targets List of accounts to be liquidated
+    @param min_xs Minimal amount of stablecoin to receive for each target
+    @param fracs Fraction to liquidate for each target; 100% = 10**18
+    @return Aggregate debt balance change for caller
+             * negative value indicates the amount burned to liquidate
+             * positive value indicates a surplus received from the AMM
+            Aggregate collateral balance received from AMM
+    """
+    num_targets: uint256 = len(targets)
+    assert len(min_xs) == num_targets and len(fracs) == num_targets, "DFM:C Array length mismatch"
+    c: MarketContracts = self._get_market_contracts_or_revert(market)
 
-    if debt_amount > xy[0]:
-        remaining: uint256 = unsafe_sub(debt_amount, xy[0])
-        STABLECOIN.burn(msg.sender, remaining)
-    elif xy[0] > debt_amount:
-        STABLECOIN.transferFrom(c.amm, msg.sender, unsafe_sub(xy[0], debt_amount))
+    debt_adjustment_total: int256 = 0
+    debt_total: uint256 = 0
+    xy_total: uint256[2] = empty(uint256[2])
 
-    if xy[1] > 0:
-        self._withdraw_collateral(msg.sender, c.collateral, c.amm, xy[1])
+    for i in range(255):
+        if i == num_targets:
+            break
 
-    self._update_rate(market, c.amm, c.mp_idx)
+        debt_adjustment: int256 = 0
+        debt_amount: uint256 = 0
+        xy: uint256[2] = empty(uint256[2])
+        debt_adjustment, debt_amount, xy = self._liquidate(market, targets[i], min_xs[i], fracs[i])
 
-    log LiquidateLoan(market, msg.sender, target, xy[1], xy[0], debt_amount)
+        debt_adjustment_total += debt_adjustment
+        debt_total += debt_amount
+        xy_total[0] += xy[0]
+        xy_total[1] += xy[1]
 
-    return convert(xy[0], int256) - convert(debt_amount, int256), xy[1]
+    return self._settle_liquidation(market, c, debt_adjustment_total, debt_total, xy_total)
 
 
 @external
@@ -1082,6 +1104,7 @@ def add_market_hook(market: address, hook: address):
     hookdata_packed += convert(hook, uint256) << 96
 
     self.market_hooks[market].append(hookdata_packed)
+    self._set_hooks_by_id(market, self.market_hooks[market])
 
     log AddMarketHook(market, hook, config[0], config[1])
 
@@ -1113,6 +1136,8 @@ def remove_market_hook(market: address, hook: address):
             self.market_hooks[market][i] = last_hookdata
         break
 
+    self._set_hooks_by_id(market, self.market_hooks[market])
+
     hook_debt: uint256 = self.hook_debt[market][hook]
     if hook_debt > 0:
         self._adjust_hook_debt(market, hook, -convert(hook_debt, int256))
@@ -1333,11 +1358,17 @@ def _get_hook_type(hookdata: uint256) -> HookType:
     return convert(hookdata & 7, HookType)
 
 
-@view
 @internal
-def _is_hook_id_active(hookdata: uint256, hook_id: HookId) -> bool:
-    # hook ids are tracked from the 4th bit onward
-    return hookdata & (convert(hook_id, uint256) << 3) != 0
+def _set_hooks_by_id(market: address, hookdata_array: DynArray[uint256, MAX_HOOKS]):
+    # rebuild the per-`HookId` lists read by `_call_hooks` and `_call_view_hooks`,
+    # keeping the order of `market_hooks`
+    for i in range(NUM_HOOK_IDS):
+        hook_id_hooks: DynArray[uint256, MAX_HOOKS] = []
+        for hookdata in hookdata_array:
+            # hook ids are tracked from the 4th bit onward
+            if hookdata & (1 << (i + 3)) != 0:
+                hook_id_hooks.append(hookdata)
+        self.market_hooks_by_id[market][1 << i] = hook_id_hooks
 
 
 @view
@@ -1345,14 +1376,10 @@ def _is_hook_id_active(hookdata: uint256, hook_id: HookId) -> bool:
 def _call_view_hooks(market: address, hook_id: HookId, calldata: Bytes[255], bounds: int256[2]) -> int256:
     debt_adjustment: int256 = 0
     for market_hooks_key in [market, empty(address)]:
-        hookdata_array: DynArray[uint256, MAX_HOOKS] = self.market_hooks[market_hooks_key]
-        if len(hookdata_array) == 0:
-            continue
-
+        hookdata_array: DynArray[uint256, MAX_HOOKS] = (
+            self.market_hooks_by_id[market_hooks_key][convert(hook_id, uint256)]
+        )
         for hookdata in hookdata_array:
-            if not self._is_hook_id_active(hookdata, hook_id):
-                continue
-
             hook: address = self._get_hook_address(hookdata)
             response: int256 = convert(raw_call(hook, calldata, max_outsize=32, is_static_call=True), int256)
             if response == 0:
@@ -1377,6 +1404,177 @@ def _call_view_hooks(market: address, hook_id: HookId, calldata: Bytes[255], bou
     return debt_adjustment
 
 
+@internal
+def _create_loan(
+    account: address,
+    market: address,
+    c: MarketContracts,
+    coll_amount: uint256,
+    debt_amount: uint256,
+    n_bands: uint256
+):
+    # stablecoins are minted by the caller
+    assert coll_amount > 0 and debt_amount > 0, "DFM:C 0 coll or debt"
+
+    hook_adjust: int256 = self._call_hooks(
+        market,
+        HookId.ON_CREATE_LOAN,
+        _abi_encode(
+            account,
+            market,
+            coll_amount,
+            debt_amount,
+            method_id=method_id("on_create_loan(address,address,uint256,uint256)")
+        ),
+        self._positive_only_bounds(debt_amount)
+    )
+    debt_amount_final: uint256 = self._uint_plus_int(debt_amount, hook_adjust)
+
+    self._deposit_collateral(msg.sender, c.collateral, c.amm, coll_amount)
+    debt_increase: uint256 = MarketOperator(market).create_loan(account, coll_amount, debt_amount_final, n_bands)
+
+    total_debt: uint256 = self.total_debt + debt_increase
+    self._assert_below_debt_ceiling(total_debt)
+
+    self.total_debt = total_debt
+    self.minted += debt_amount
+
+    log CreateLoan(market, account, msg.sender, coll_amount, debt_amount_final)
+
+
+@internal
+def _adjust_loan(
+    account: address,
+    market: address,
+    c: MarketContracts,
+    coll_change: int256,
+    debt_change: int256,
+    max_active_band: int256
+):
+    # stablecoins are minted or burned by the caller
+    assert coll_change != 0 or debt_change != 0, "DFM:C No change"
+
+    debt_change_final: int256 = self._call_hooks(
+        market,
+        HookId.ON_ADJUST_LOAN,
+        _abi_encode(
+            account,
+            market,
+            coll_change,
+            debt_change,
+            method_id=method_id("on_adjust_loan(address,address,int256,int256)")
+        ),
+        self._adjust_loan_bounds(debt_change)
+    ) + debt_change
+
+    debt_adjustment: int256 = MarketOperator(market).adjust_loan(account, coll_change, debt_change_final, max_active_band)
+
+    total_debt: uint256 = self._uint_plus_int(self.total_debt, debt_adjustment)
+    self.total_debt = total_debt
+
+    if debt_change > 0:
+        self._assert_below_debt_ceiling(total_debt)
+        self.minted += convert(debt_change, uint256)
+    elif debt_change < 0:
+        self.redeemed += convert(-debt_change, uint256)
+
+    if coll_change != 0:
+        coll_change_abs: uint256 = convert(abs(coll_change), uint256)
+        if coll_change > 0:
+            self._deposit_collateral(msg.sender, c.collateral, c.amm, coll_change_abs)
+        else:
+            self._withdraw_collateral(msg.sender, c.collateral, c.amm, coll_change_abs)
+
+    log AdjustLoan(market, account, msg.sender, coll_change, debt_change_final)
+
+
+@internal
+def _close_loan(account: address, market: address, c: MarketContracts) -> (uint256, uint256[2]):
+    # stablecoins are burned by the caller, returns the burn amount and [x, y] withdrawn
+    debt_adjustment: int256 = 0
+    burn_amount: uint256 = 0
+    xy: uint256[2] = empty(uint256[2])
+    debt_adjustment, burn_amount, xy = MarketOperator(market).close_loan(account)
+
+    burn_adjust: int256 = self._call_hooks(
+        market,
+        HookId.ON_CLOSE_LOAN,
+        _abi_encode(account, market, burn_amount, method_id=method_id("on_close_loan(address,address,uint256)")),
+        self._positive_only_bounds(burn_amount)
+    )
+    burn_amount = self._uint_plus_int(burn_amount, burn_adjust)
+
+    self.redeemed += burn_amount
+    self.total_debt = self._uint_plus_int(self.total_debt, debt_adjustment)
+
+    if xy[0] > 0:
+        STABLECOIN.transferFrom(c.amm, msg.sender, xy[0])
+    if xy[1] > 0:
+        self._withdraw_collateral(msg.sender, c.collateral, c.amm, xy[1])
+
+    log CloseLoan(market, account, msg.sender, xy[1], xy[0], burn_amount)
+
+    return burn_amount, xy
+
+
+@internal
+def _liquidate(market: address, target: address, min_x: uint256, frac: uint256) -> (int256, uint256, uint256[2]):
+    assert frac <= 10**18, "DFM:C frac too high"
+
+    debt_adjustment: int256 = 0
+    debt_amount: uint256 = 0
+    xy: uint256[2] = empty(uint256[2])
+    debt_adjustment, debt_amount, xy = MarketOperator(market).liquidate(msg.sender, target, min_x, frac)
+
+    burn_adjust: int256 = self._call_hooks(
+        market,
+        HookId.ON_LIQUIDATION,
+        _abi_encode(
+            msg.sender,
+            market,
+            target,
+            debt_amount,
+            method_id=method_id("on_liquidation(address,address,address,uint256)")
+        ),
+        self._positive_only_bounds(debt_amount)
+    )
+
+    debt_amount = self._uint_plus_int(debt_amount, burn_adjust)
+
+    log LiquidateLoan(market, msg.sender, target, xy[1], xy[0], debt_amount)
+
+    return debt_adjustment, debt_amount, xy
+
+
+@internal
+def _settle_liquidation(
+    market: address,
+    c: MarketContracts,
+    debt_adjustment: int256,
+    debt_amount: uint256,
+    xy: uint256[2]
+) -> (int256, uint256):
+    # burns the liquidated debt and sends the AMM balances to the caller
+    self.redeemed += debt_amount
+    self.total_debt = self._uint_plus_int(self.total_debt, debt_adjustment)
+
+    burn_amm: uint256 = min(xy[0], debt_amount)
+    if burn_amm != 0:
+        STABLECOIN.burn(c.amm, burn_amm)
+
+    if debt_amount > xy[0]:
+        STABLECOIN.burn(msg.sender, unsafe_sub(debt_amount, xy[0]))
+    elif xy[0] > debt_amount:
+        STABLECOIN.transferFrom(c.amm, msg.sender, unsafe_sub(xy[0], debt_amount))
+
+    if xy[1] > 0:
+        self._withdraw_collateral(msg.sender, c.collateral, c.amm, xy[1])
+
+    self._update_rate(market, c.amm, c.mp_idx)
+
+    return convert(xy[0], int256) - convert(debt_amount, int256), xy[1]
+
+
 @internal
 def _deposit_collateral(account: address, collateral: address, amm: address, amount: uint256):
     assert ERC20(collateral).transferFrom(account, amm, amount, default_return_value=True)
@@ -1396,14 +1594,10 @@ def _call_hooks(
 ) -> int256:
     debt_adjustment: int256 = 0
     for market_hooks_key in [market, empty(address)]:
-        hookdata_array: DynArray[uint256, MAX_HOOKS] = self.market_hooks[market_hooks_key]
-        if len(hookdata_array) == 0:
-            continue
-
+        hookdata_array: DynArray[uint256, MAX_HOOKS] = (
+            self.market_hooks_by_id[market_hooks_key][convert(hook_id, uint256)]
+        )
         for hookdata in hookdata_array:
-            if not self._is_hook_id_active(hookdata, hook_id):
-                continue
-
             hook: address = self._get_hook_address(hookdata)
             response: int256 = convert(raw_call(hook, calldata, max_outsize=32), int256)
             if response == 0:
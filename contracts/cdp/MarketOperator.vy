@@ -10,6 +10,7 @@ interface LLAMMA:
     def get_p() -> uint256: view
     def get_base_price() -> uint256: view
     def active_band() -> int256: view
+    def min_band() -> int256: view
     def active_band_with_skip() -> int256: view
     def p_oracle_up(n: int256) -> uint256: view
     def p_oracle_down(n: int256) -> uint256: view
@@ -122,6 +123,11 @@ loans: public(address[2**64 - 1])  # Enumerate existing loans
 loan_ix: public(HashMap[address, uint256])  # Position of the loan in the list
 n_loans: public(uint256)  # Number of nonzero loans
 
+# Loans indexed by their lowest band, used to find loans in soft-liquidation
+band_loans: public(HashMap[int256, HashMap[uint256, address]])
+band_loan_ix: public(HashMap[address, uint256])  # Position of the loan in the band list
+band_n_loans: public(HashMap[int256, uint256])  # Number of loans with `n1` at this band
+
 debt_ceiling: public(uint256)
 liquidation_discount: public(uint256)
 loan_discount: public(uint256)
@@ -363,6 +369,59 @@ def users_to_liquidate(_from: uint256=0, _limit: uint256=0) -> DynArray[Position
     return out
 
 
+@view
+@external
+def users_to_liquidate_by_band(_bands_above: uint256=0, _limit: uint256=0) -> DynArray[Position, 1000]:
+    """
+    @notice Returns a dynamic array of users who can be "hard-liquidated",
+            only checking loans with their lowest band at or below the active band.
+    @dev Loans are indexed by their lowest band, so the cost of this call scales
+         with the number of loans in soft-liquidation rather than the total number
+         of loans. A loan above the active band can still become unhealthy from
+         accrued interest alone - use `_bands_above` to widen the search, or
+         `users_to_liquidate` for a full scan.
+    @param _bands_above Number of bands above the active band to also check
+    @param _limit Number of loans to look over
+    @return Dynamic array with detailed info about positions of users
+    """
+    amm: LLAMMA = self.AMM
+    out: DynArray[Position, 1000] = []
+    n: int256 = amm.min_band()
+    n_end: int256 = amm.active_band() + convert(_bands_above, int256)
+    if n > n_end:
+        return out
+
+    price: uint256 = amm.price_oracle()
+    band_n_loans: uint256 = self.band_n_loans[n]
+    ix: uint256 = 0
+    count: uint256 = 0
+    for i in range(10**6):
+        if ix == band_n_loans:
+            if n == n_end:
+                break
+            n = unsafe_add(n, 1)
+            band_n_loans = self.band_n_loans[n]
+            ix = 0
+            continue
+        if count == _limit and _limit != 0:
+            break
+        account: address = self.band_loans[n][ix]
+        debt: uint256 = self._debt(account, amm)[0]
+        health: int256 = self._health(amm, account, debt, True, self.liquidation_discounts[account], price)
+        if health < 0:
+            xy: uint256[2] = amm.get_sum_xy(account)
+            out.append(Position({
+                account: account,
+                x: xy[0],
+                y: xy[1],
+                debt: debt,
+                health: health
+            }))
+        ix += 1
+        count += 1
+    return out
+
+
 @view
 @external
 def amm_price() -> uint256:
@@ -629,6 +688,7 @@ def create_loan(account: address, coll_amount: uint256, debt_amount: uint256, n_
     self.loans[n_loans] = account
     self.loan_ix[account] = n_loans
     self.n_loans = unsafe_add(n_loans, 1)
+    self._add_to_band(account, n1)
 
     debt_increase: uint256 = self._increase_total_debt(debt_amount, rate_mul)
 
@@ -677,6 +737,9 @@ def adjust_loan(account: address, coll_change: int256, debt_change: int256, max_
         n1: int256 = self._calculate_debt_n1(amm, coll_amount, account_debt, size, price)
         n2: int256 = n1 + unsafe_sub(ns[1], ns[0])
         amm.deposit_range(account, coll_amount, n1, n2)
+        if n1 != ns[0]:
+            self._remove_from_band(account, ns[0])
+            self._add_to_band(account, n1)
         liquidation_discount: uint256 = self.liquidation_discount
         self.liquidation_discounts[account] = liquidation_discount
         log UserState(account, coll_amount, account_debt, n1, n2, liquidation_discount)
@@ -711,6 +774,7 @@ def close_loan(account: address) -> (int256, uint256, uint256[2]):
     account_debt, rate_mul = self._debt(account, amm)
     assert account_debt > 0, "DFM:M Loan doesn't exist"
 
+    self._remove_from_band(account, amm.read_user_tick_numbers(account)[0])
     xy: uint256[2] = amm.withdraw(account, 10**18)
 
     self.loan[account] = Loan({initial_debt: 0, rate_mul: 0})
@@ -754,6 +818,8 @@ def liquidate(caller: address, target: address, min_x: uint256, frac: uint256) -
     debt = unsafe_div(debt * frac, 10**18)
     assert debt > 0, "DFM:M No Debt"
     final_debt = unsafe_sub(final_debt, debt)
+    if final_debt == 0:
+        self._remove_from_band(target, amm.read_user_tick_numbers(target)[0])
 
     # Withdraw sender's stablecoin and collateral to our contract
     # When frac is set - we withdraw a bit less for the same debt fraction
@@ -1151,3 +1217,24 @@ def _remove_from_list(receiver: address) -> int256:
         return remaining
 
     return 0
+
+
+@internal
+def _add_to_band(account: address, n1: int256):
+    band_n_loans: uint256 = self.band_n_loans[n1]
+    self.band_loans[n1][band_n_loans] = account
+    self.band_loan_ix[account] = band_n_loans
+    self.band_n_loans[n1] = unsafe_add(band_n_loans, 1)
+
+
+@internal
+def _remove_from_band(account: address, n1: int256):
+    last_loan_ix: uint256 = self.band_n_loans[n1] - 1
+    loan_ix: uint256 = self.band_loan_ix[account]
+    assert self.band_loans[n1][loan_ix] == account  # dev: should never fail but safety first
+    self.band_loan_ix[account] = 0
+    if loan_ix < last_loan_ix:  # Need to replace
+        last_loan: address = self.band_loans[n1][last_loan_ix]
+        self.band_loans[n1][loan_ix] = last_loan
+        self.band_loan_ix[last_loan] = loan_ix
+    self.band_n_loans[n1] = last_loan_ix
@@ -88,6 +88,16 @@ peg_keeper_i: HashMap[PegKeeper,  uint256]  # 1 + index of peg keeper in a list
 max_debt: public(uint256)
 active_debt: public(uint256)
 
+# isqrt(debt ratio) of each peg keeper, and the sum across all active keepers
+# updated each time a peg keeper's debt is modified via this contract
+debt_ratio_sqrt: public(HashMap[PegKeeper, uint256])
+debt_ratio_sqrt_sum: public(uint256)
+
+# stablecoin price and pool price oracles, cached for the duration of `update_many`
+# values are set to zero again before the call returns
+cached_stable_price: uint256
+cached_price_oracle: HashMap[StableSwapNG, uint256]
+
 worst_price_threshold: public(uint256)  # 3 * 10 ** 14  # 0.0003
 price_deviation: public(uint256)        # 5 * 10 ** 14 # 0.0005 = 0.05%
 action_delay: public(uint256)
@@ -213,14 +223,13 @@ def get_max_provide(pk: PegKeeper) -> uint256:
     if self.is_killed in Killed.Provide:
         return 0
 
-    if STABLECOIN_ORACLE.price() < ONE:
+    if self._get_stable_price() < ONE:
         return 0
 
     price: uint256 = max_value(uint256)
     largest_price: uint256 = 0
-    debt_ratios: DynArray[uint256, MAX_LEN] = []
     for info in self.peg_keepers:
-        price_oracle: uint256 = self._get_price_oracle(info)
+        price_oracle: uint256 = self._get_cached_price_oracle(info)
         if info.peg_keeper == pk:
             price = price_oracle
             if not self._price_in_range(price, self._get_price(info)):
@@ -228,7 +237,6 @@ def get_max_provide(pk: PegKeeper) -> uint256:
             continue
         elif largest_price < price_oracle:
             largest_price = price_oracle
-        debt_ratios.append(self._get_ratio(info.peg_keeper))
 
     # underflow here is OK, in a severe depeg we do not wish to add liquidity
     if largest_price < unsafe_sub(price, self.worst_price_threshold):
@@ -236,7 +244,8 @@ def get_max_provide(pk: PegKeeper) -> uint256:
 
     debt: uint256 = pk.debt()
     total: uint256 = debt + STABLECOIN.balanceOf(pk.address)
-    return self._get_max_ratio(debt_ratios) * total / ONE - debt
+    rsum: uint256 = self.debt_ratio_sqrt_sum - self.debt_ratio_sqrt[pk]
+    return self._get_max_ratio(rsum) * total / ONE - debt
 
 
 @view
@@ -254,13 +263,13 @@ def get_max_withdraw(pk: PegKeeper) -> uint256:
     if self.is_killed in Killed.Withdraw:
         return 0
 
-    if STABLECOIN_ORACLE.price() > ONE:
+    if self._get_stable_price() > ONE:
         return 0
 
     i: uint256 = self.peg_keeper_i[pk]
     if i > 0:
         info: PegKeeperInfo = self.peg_keepers[i - 1]
-        if self._price_in_range(self._get_price(info), self._get_price_oracle(info)):
+        if self._price_in_range(self._get_price(info), self._get_cached_price_oracle(info)):
             return max_value(uint256)
     return 0
 
@@ -283,13 +292,73 @@ def update(pk: PegKeeper, beneficiary: address = msg.sender) -> uint256:
     debt_adjustment: int256 = 0
     caller_profit: uint256 = 0
     (debt_adjustment, caller_profit) = pk.update(beneficiary)
-    if debt_adjustment != 0:
-        self.peg_keepers[i - 1].last_change = block.timestamp
-        self.active_debt = self._uint_plus_int(self.active_debt, debt_adjustment)
+    self._after_update(pk, i, debt_adjustment)
 
     return caller_profit
 
 
+@external
+@nonreentrant("lock")
+def update_many(pks: DynArray[PegKeeper, MAX_LEN], beneficiary: address = msg.sender) -> uint256:
+    """
+    @notice Provide or withdraw coins from the pool of each given peg keeper
+    @dev The stablecoin price and pool price oracles are only fetched once
+         for the entire batch. Peg keepers that are still within the action
+         delay, or where the update reverts (e.g. because of a regulator ban
+         or because the action is unprofitable), are skipped.
+    @param pks List of peg keepers to provide or withdraw from
+    @param beneficiary Address to send earned profits to
+    @return Total amount of profit received by beneficiary
+    """
+    self.cached_stable_price = STABLECOIN_ORACLE.price()
+    for info in self.peg_keepers:
+        self.cached_price_oracle[info.pool] = self._get_price_oracle(info)
+
+    action_delay: uint256 = self.action_delay
+    total_profit: uint256 = 0
+    for pk in pks:
+        i: uint256 = self.peg_keeper_i[pk]
+        assert i != 0, "DFM:R Unknown PegKeeper"
+        if self.peg_keepers[i - 1].last_change + action_delay >= block.timestamp:
+            continue
+
+        success: bool = False
+        response: Bytes[64] = b""
+        success, response = raw_call(
+            pk.address,
+            _abi_encode(beneficiary, method_id=method_id("update(address)")),
+            max_outsize=64,
+            revert_on_failure=False
+        )
+        if not success:
+            continue
+
+        debt_adjustment: int256 = 0
+        caller_profit: uint256 = 0
+        debt_adjustment, caller_profit = _abi_decode(response, (int256, uint256))
+        self._after_update(pk, i, debt_adjustment)
+        total_profit += caller_profit
+
+    self.cached_stable_price = 0
+    for info in self.peg_keepers:
+        self.cached_price_oracle[info.pool] = 0
+
+    return total_profit
+
+
+@external
+def sync_debt_ratio(pk: PegKeeper):
+    """
+    @notice Update the stored debt ratio for a peg keeper
+    @dev The stored ratio is updated automatically on each debt change made
+         via this contract. This function is only required if the peg keeper's
+         stablecoin balance was modified by some other means.
+    @param pk Address of the peg keeper to update the ratio for
+    """
+    assert self.peg_keeper_i[pk] != 0, "DFM:R Unknown PegKeeper"
+    self._sync_debt_ratio(pk)
+
+
 @external
 def withdraw_profit():
     """
@@ -385,6 +454,9 @@ def remove_peg_keeper(pk: PegKeeper):
     self.peg_keepers.pop()
     self.peg_keeper_i[pk] = empty(uint256)
 
+    self.debt_ratio_sqrt_sum -= self.debt_ratio_sqrt[pk]
+    self.debt_ratio_sqrt[pk] = 0
+
     log RemovePegKeeper(pk)
 
 
@@ -489,6 +561,7 @@ def init_migrate_peg_keepers(peg_keepers: DynArray[PegKeeper, MAX_LEN], debt_cei
 
         max_debt += debt_ceilings[i]
         active_debt += pk.debt()
+        self._sync_debt_ratio(pk)
 
     self.max_debt = max_debt
     self.active_debt = active_debt
@@ -526,6 +599,24 @@ def _get_price_oracle(_info: PegKeeperInfo) -> uint256:
     return price
 
 
+@view
+@internal
+def _get_stable_price() -> uint256:
+    price: uint256 = self.cached_stable_price
+    if price == 0:
+        price = STABLECOIN_ORACLE.price()
+    return price
+
+
+@view
+@internal
+def _get_cached_price_oracle(_info: PegKeeperInfo) -> uint256:
+    price: uint256 = self.cached_price_oracle[_info.pool]
+    if price == 0:
+        price = self._get_price_oracle(_info)
+    return price
+
+
 @view
 @internal
 def _price_in_range(_p0: uint256, _p1: uint256) -> bool:
@@ -553,11 +644,11 @@ def _get_ratio(_peg_keeper: PegKeeper) -> uint256:
 
 @view
 @internal
-def _get_max_ratio(_debt_ratios: DynArray[uint256, MAX_LEN]) -> uint256:
-    rsum: uint256 = 0
-    for r in _debt_ratios:
-        rsum += isqrt(r * ONE)
-    return (self.alpha + self.beta * rsum / ONE) ** 2 / ONE
+def _get_max_ratio(_rsum: uint256) -> uint256:
+    """
+    @param _rsum Sum of `isqrt(ratio)` across all other peg keepers
+    """
+    return (self.alpha + self.beta * _rsum / ONE) ** 2 / ONE
 
 
 @pure
@@ -576,9 +667,28 @@ def _mint(pk: PegKeeper, amount: uint256):
 
     STABLECOIN.mint(pk.address, amount)
     self.max_debt += amount
+    self._sync_debt_ratio(pk)
 
 
 @internal
 def _recall_debt(pk: PegKeeper, reduce_amount: uint256):
     pk.recall_debt(reduce_amount)
     self.max_debt -= reduce_amount
+    self._sync_debt_ratio(pk)
+
+
+@internal
+def _after_update(pk: PegKeeper, i: uint256, debt_adjustment: int256):
+    if debt_adjustment != 0:
+        self.peg_keepers[i - 1].last_change = block.timestamp
+        self.active_debt = self._uint_plus_int(self.active_debt, debt_adjustment)
+
+    # owed debt may be burned even when the debt adjustment is zero
+    self._sync_debt_ratio(pk)
+
+
+@internal
+def _sync_debt_ratio(pk: PegKeeper):
+    ratio_sqrt: uint256 = isqrt(self._get_ratio(pk) * ONE)
+    self.debt_ratio_sqrt_sum = self.debt_ratio_sqrt_sum + ratio_sqrt - self.debt_ratio_sqrt[pk]
+    self.debt_ratio_sqrt[pk] = ratio_sqrt
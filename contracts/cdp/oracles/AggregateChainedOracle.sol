@@ -3,6 +3,7 @@
 pragma solidity 0.8.25;
 
 import { Address } from "@openzeppelin/contracts/utils/Address.sol";
+import { SafeCast } from "@openzeppelin/contracts/utils/math/SafeCast.sol";
 import { CoreOwnable } from "../../base/dependencies/CoreOwnable.sol";
 import { IPriceOracle } from "../../interfaces/IPriceOracle.sol";
 import { IUptimeOracle } from "../../interfaces/IUptimeOracle.sol";
@@ -12,9 +13,14 @@ import { IUptimeOracle } from "../../interfaces/IUptimeOracle.sol";
     @author defidotmoney
     @notice Returns the average price from one or more sequences of oracle calls,
             with price caching and an optional `UptimeOracle` call.
+    @dev The price is only calculated once per block. After the first call to `price_w`
+         within a block, both `price` and `price_w` return the stored price for the
+         remainder of that block. This avoids re-evaluating every call path when a
+         single transaction touches the oracle multiple times (e.g. batched liquidations).
  */
 contract AggregateChainedOracle is IPriceOracle, CoreOwnable {
     using Address for address;
+    using SafeCast for uint256;
 
     struct OracleCall {
         // Address of the oracle to call.
@@ -33,8 +39,16 @@ contract AggregateChainedOracle is IPriceOracle, CoreOwnable {
 
     OracleCall[][] private oracleCallPaths;
 
+    // Packed copy of each path in `oracleCallPaths`, one word per call. Only set for paths
+    // where all calls have selector-only calldata, otherwise the array is empty. Layout:
+    // | write selector (32) | view selector (32) | isMultiplied (8) | decimals (8) | target (160) |
+    uint256[][] private packedCallPaths;
+
     IUptimeOracle public uptimeOracle;
-    uint256 public storedPrice;
+
+    // packed into a single slot, so a cached price costs one storage read
+    uint192 public storedPrice;
+    uint64 public storedPriceBlock;
 
     constructor(address _coreOwner, IUptimeOracle _uptimeOracle) CoreOwnable(_coreOwner) {
         uptimeOracle = _uptimeOracle;
@@ -47,11 +61,12 @@ contract AggregateChainedOracle is IPriceOracle, CoreOwnable {
         @dev Read-only version used within view methods
      */
     function price() external view returns (uint256) {
+        if (storedPriceBlock == block.number) return storedPrice;
         uint256 result = _maybeGetStoredPrice();
         if (result != 0) return result;
         uint256 length = oracleCallPaths.length;
         for (uint256 i = 0; i < length; i++) {
-            result += _fetchCallPathResultView(oracleCallPaths[i]);
+            result += _fetchStoredCallPathResultView(i);
         }
         return result / length;
     }
@@ -59,18 +74,21 @@ contract AggregateChainedOracle is IPriceOracle, CoreOwnable {
     /**
         @notice The current oracle price, normalized to 1e18 precision
         @dev Write version that also stores the price. The stored price is
-             returned later if the uptime oracle reports a downtime.
+             returned for the rest of the block, and later if the uptime oracle
+             reports a downtime.
      */
     function price_w() external returns (uint256) {
+        if (storedPriceBlock == block.number) return storedPrice;
         uint256 result = _maybeGetStoredPrice();
         if (result != 0) return result;
 
         uint256 length = oracleCallPaths.length;
         for (uint256 i = 0; i < length; i++) {
-            result += _fetchCallPathResultWrite(oracleCallPaths[i]);
+            result += _fetchStoredCallPathResultWrite(i);
         }
         result = result / length;
-        storedPrice = result;
+        storedPrice = result.toUint192();
+        storedPriceBlock = uint64(block.number);
 
         return result;
     }
@@ -95,13 +113,24 @@ contract AggregateChainedOracle is IPriceOracle, CoreOwnable {
         return oracleCallPaths[idx];
     }
 
+    /**
+        @notice Check if an oracle call path is stored in the packed format
+        @dev Paths are packed when every call uses only a function selector
+             as calldata. Packed paths are cheaper to query.
+        @param idx Index of the oracle call path
+        @return isPacked Boolean indicating if the path is packed
+     */
+    function isCallPathPacked(uint256 idx) external view returns (bool isPacked) {
+        return packedCallPaths[idx].length > 0;
+    }
+
     /**
         @notice Fetches the current view response for a single oracle call path
         @param idx Index of the oracle call path to query
         @return response Oracle call path view response
      */
     function getCallPathResult(uint256 idx) external view returns (uint256 response) {
-        return _fetchCallPathResultView(oracleCallPaths[idx]);
+        return _fetchStoredCallPathResultView(idx);
     }
 
     // --- unguarded external functions ---
@@ -112,7 +141,7 @@ contract AggregateChainedOracle is IPriceOracle, CoreOwnable {
         @return response Oracle call path write response
      */
     function getCallPathResultWrite(uint256 idx) external returns (uint256 response) {
-        return _fetchCallPathResultWrite(oracleCallPaths[idx]);
+        return _fetchStoredCallPathResultWrite(idx);
     }
 
     // --- owner-only guarded external functions ---
@@ -130,22 +159,34 @@ contract AggregateChainedOracle is IPriceOracle, CoreOwnable {
              is executed independently. The final returned price is an average
              of the values returned from each path.
         @param path Dynamic array of one or more `OraclePath` structs. The
-                    comments in the struct definition explain the layout.
+                    comments in the struct definition explain the layout. If
+                    `inputView` and `inputWrite` are only a function selector
+                    for every call, the path is also stored in a packed format.
      */
     function addCallPath(OracleCall[] calldata path) external onlyOwner {
         uint256 length = path.length;
         require(length > 0, "DFM: Cannot set empty path");
 
         oracleCallPaths.push();
+        packedCallPaths.push();
         OracleCall[] storage storagePath = oracleCallPaths[oracleCallPaths.length - 1];
+        bool isPackable = true;
         for (uint256 i = 0; i < length; i++) {
             require(path[i].decimals < 19, "DFM: Maximum 18 decimals");
             storagePath.push(path[i]);
+            if (path[i].inputView.length != 4 || path[i].inputWrite.length != 4) isPackable = false;
+        }
+        if (isPackable) {
+            uint256[] storage packedPath = packedCallPaths[packedCallPaths.length - 1];
+            for (uint256 i = 0; i < length; i++) {
+                packedPath.push(_packCall(path[i]));
+            }
         }
 
         uint256 resultView = _fetchCallPathResultView(path);
         uint256 resultWrite = _fetchCallPathResultWrite(path);
         require(resultView == resultWrite, "DFM: view != write");
+        storedPriceBlock = 0;
     }
 
     /**
@@ -161,8 +202,11 @@ contract AggregateChainedOracle is IPriceOracle, CoreOwnable {
         require(length > 1, "DFM: Cannot remove only path");
         if (idx < length - 1) {
             oracleCallPaths[idx] = oracleCallPaths[length - 1];
+            packedCallPaths[idx] = packedCallPaths[length - 1];
         }
         oracleCallPaths.pop();
+        packedCallPaths.pop();
+        storedPriceBlock = 0;
     }
 
     // --- internal functions ---
@@ -178,15 +222,44 @@ contract AggregateChainedOracle is IPriceOracle, CoreOwnable {
         return 0;
     }
 
+    function _fetchStoredCallPathResultView(uint256 idx) internal view returns (uint256 result) {
+        uint256[] storage packedPath = packedCallPaths[idx];
+        uint256 length = packedPath.length;
+        if (length == 0) return _fetchCallPathResultView(oracleCallPaths[idx]);
+
+        result = 1e18;
+        for (uint256 i = 0; i < length; i++) {
+            uint256 packedCall = packedPath[i];
+            bytes memory response = address(uint160(packedCall)).functionStaticCall(
+                abi.encodeWithSelector(bytes4(uint32(packedCall >> 176)))
+            );
+            result = _applyAnswer(result, response, uint8(packedCall >> 160), ((packedCall >> 168) & 1) == 1);
+        }
+        return result;
+    }
+
+    function _fetchStoredCallPathResultWrite(uint256 idx) internal returns (uint256 result) {
+        uint256[] storage packedPath = packedCallPaths[idx];
+        uint256 length = packedPath.length;
+        if (length == 0) return _fetchCallPathResultWrite(oracleCallPaths[idx]);
+
+        result = 1e18;
+        for (uint256 i = 0; i < length; i++) {
+            uint256 packedCall = packedPath[i];
+            bytes memory response = address(uint160(packedCall)).functionCall(
+                abi.encodeWithSelector(bytes4(uint32(packedCall >> 208)))
+            );
+            result = _applyAnswer(result, response, uint8(packedCall >> 160), ((packedCall >> 168) & 1) == 1);
+        }
+        return result;
+    }
+
     function _fetchCallPathResultView(OracleCall[] memory path) internal view returns (uint256 result) {
         result = 1e18;
         uint256 length = path.length;
         for (uint256 i = 0; i < length; i++) {
-            uint256 answer = uint256(bytes32(path[i].target.functionStaticCall(path[i].inputView)));
-            require(answer != 0, "DFM: Oracle returned 0");
-            answer *= 10 ** (18 - path[i].decimals);
-            if (path[i].isMultiplied) result = (result * answer) / 1e18;
-            else result = (result * 1e18) / answer;
+            bytes memory response = path[i].target.functionStaticCall(path[i].inputView);
+            result = _applyAnswer(result, response, path[i].decimals, path[i].isMultiplied);
         }
         return result;
     }
@@ -195,12 +268,31 @@ contract AggregateChainedOracle is IPriceOracle, CoreOwnable {
         result = 1e18;
         uint256 length = path.length;
         for (uint256 i = 0; i < length; i++) {
-            uint256 answer = uint256(bytes32(path[i].target.functionCall(path[i].inputWrite)));
-            require(answer != 0, "DFM: Oracle returned 0");
-            answer *= 10 ** (18 - path[i].decimals);
-            if (path[i].isMultiplied) result = (result * answer) / 1e18;
-            else result = (result * 1e18) / answer;
+            bytes memory response = path[i].target.functionCall(path[i].inputWrite);
+            result = _applyAnswer(result, response, path[i].decimals, path[i].isMultiplied);
         }
         return result;
     }
+
+    function _applyAnswer(
+        uint256 result,
+        bytes memory response,
+        uint8 decimals,
+        bool isMultiplied
+    ) internal pure returns (uint256) {
+        uint256 answer = uint256(bytes32(response));
+        require(answer != 0, "DFM: Oracle returned 0");
+        answer *= 10 ** (18 - decimals);
+        if (isMultiplied) return (result * answer) / 1e18;
+        else return (result * 1e18) / answer;
+    }
+
+    function _packCall(OracleCall calldata oracleCall) internal pure returns (uint256) {
+        uint256 packedCall = uint256(uint160(oracleCall.target));
+        packedCall |= uint256(oracleCall.decimals) << 160;
+        if (oracleCall.isMultiplied) packedCall |= 1 << 168;
+        packedCall |= uint256(uint32(bytes4(oracleCall.inputView))) << 176;
+        packedCall |= uint256(uint32(bytes4(oracleCall.inputWrite))) << 208;
+        return packedCall;
+    }
 }
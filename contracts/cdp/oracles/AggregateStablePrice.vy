@@ -82,6 +82,10 @@ def ema_tvl() -> DynArray[uint256, MAX_PAIRS]:
 @view
 @external
 def price() -> uint256:
+    if self.last_timestamp == block.timestamp:
+        # pool price oracles and `_ema_tvl` cannot change within a block,
+        # so the value stored by `price_w` is still current
+        return self.last_price
     return self._price(self._ema_tvl())
 
 
@@ -129,6 +133,7 @@ def add_price_pair(_pool: Stableswap):
     self.price_pairs[n] = price_pair  # Should revert if too many pairs
     self.last_tvl[n] = _pool.totalSupply()
     self.n_price_pairs = n + 1
+    self._refresh_last_price()
     log AddPricePair(n, _pool, price_pair.is_inverse)
 
 
@@ -149,11 +154,19 @@ def remove_price_pair(n: uint256):
     self.price_pairs[n_max] = empty(PricePair)
     self.last_tvl[n_max] = 0
     self.n_price_pairs = n_max
+    self._refresh_last_price()
     log RemovePricePair(n)
 
 
 # --- internal functions ---
 
+@internal
+def _refresh_last_price():
+    # keep the stored price valid for `price` after the set of pairs changes
+    if self.last_timestamp == block.timestamp:
+        self.last_price = self._price(self._ema_tvl())
+
+
 @view
 @internal
 def exp(power: int256) -> uint256:
@@ -90,7 +90,9 @@ contract ChainlinkEMA {
     /**
         @dev Calculates the latest EMA price by performing observations at all observation
              intervals since the last stored one. Used when the number of new observations
-             required is less than `2 * OBSERVATIONS`.
+             required is less than `2 * OBSERVATIONS`. Consecutive observations with the
+             same answer are applied in a single step, so the cost scales with the number
+             of Chainlink rounds rather than the number of elapsed intervals.
      */
     function _calculateLatestEMA(
         uint256 currentObservation,
@@ -102,11 +104,8 @@ contract ChainlinkEMA {
 
         // special case, latest round is the same as stored round
         if (latestResponse.roundId == response.roundId) {
-            uint256 answer = response.answer;
-            while (storedObservation < currentObservation) {
-                storedObservation += INTERVAL;
-                currentPrice = _getNextEMA(answer, currentPrice);
-            }
+            uint256 steps = (currentObservation - storedObservation) / INTERVAL;
+            currentPrice = _getNextEMA(response.answer, currentPrice, steps);
             return (currentPrice, latestResponse, false);
         }
 
@@ -118,6 +117,10 @@ contract ChainlinkEMA {
             nextResponse = latestResponse;
         }
 
+        // observations are batched while the answer is unchanged, and
+        // only applied once the answer changes or all observations are done
+        uint256 batchAnswer = response.answer;
+        uint256 batchSteps;
         while (storedObservation < currentObservation) {
             storedObservation += INTERVAL;
             while (!isLatestResponse && nextResponse.updatedAt < storedObservation) {
@@ -128,8 +131,22 @@ contract ChainlinkEMA {
                     nextResponse = _getNextRoundData(nextResponse.roundId);
                 }
             }
-            currentPrice = _getNextEMA(response.answer, currentPrice);
+            if (response.answer != batchAnswer) {
+                currentPrice = _getNextEMA(batchAnswer, currentPrice, batchSteps);
+                batchAnswer = response.answer;
+                batchSteps = 0;
+            }
+
+            // skip ahead to the last observation that still uses this response
+            uint256 lastObservation = currentObservation;
+            if (!isLatestResponse) {
+                uint256 nextObservation = (nextResponse.updatedAt / INTERVAL) * INTERVAL;
+                if (nextObservation < lastObservation) lastObservation = nextObservation;
+            }
+            batchSteps += (lastObservation - storedObservation) / INTERVAL + 1;
+            storedObservation = lastObservation;
         }
+        currentPrice = _getNextEMA(batchAnswer, currentPrice, batchSteps);
 
         return (currentPrice, latestResponse, true);
     }
@@ -173,20 +190,51 @@ contract ChainlinkEMA {
             observationTimestamp -= INTERVAL;
         }
 
-        // now iterate forward to calculate EMA based on the observed oracle responses
+        // now iterate forward to calculate EMA based on the observed oracle responses,
+        // applying consecutive observations with the same answer in a single step
         currentPrice = oracleResponses[idx];
         idx++;
         while (idx < MAX_LOOKBACK) {
-            currentPrice = _getNextEMA(oracleResponses[idx], currentPrice);
+            uint256 answer = oracleResponses[idx];
+            uint256 steps = 1;
             idx++;
+            while (idx < MAX_LOOKBACK && oracleResponses[idx] == answer) {
+                steps++;
+                idx++;
+            }
+            currentPrice = _getNextEMA(answer, currentPrice, steps);
         }
 
         return (currentPrice, latestResponse);
     }
 
-    /** @dev Given the latest price and the last EMA, returns the new EMA */
-    function _getNextEMA(uint256 newPrice, uint256 lastEMA) internal view returns (uint256) {
-        return ((newPrice * SMOOTHING_FACTOR) + (lastEMA * (1e18 - SMOOTHING_FACTOR))) / 1e18;
+    /**
+        @dev Given a price that was observed for `steps` consecutive intervals and the
+             last EMA, returns the new EMA. Uses the closed form
+             `newPrice + (lastEMA - newPrice) * (1 - SMOOTHING_FACTOR) ** steps`, rounding
+             down. With `steps == 1` this is identical to a single EMA update.
+     */
+    function _getNextEMA(uint256 newPrice, uint256 lastEMA, uint256 steps) internal view returns (uint256) {
+        if (steps == 0) return lastEMA;
+        uint256 decay = _getDecay(steps);
+        if (lastEMA >= newPrice) {
+            return newPrice + ((lastEMA - newPrice) * decay) / 1e18;
+        } else {
+            return newPrice - ((newPrice - lastEMA) * decay + 1e18 - 1) / 1e18;
+        }
+    }
+
+    /** @dev Returns `(1 - SMOOTHING_FACTOR) ** steps` with 1e18 precision */
+    function _getDecay(uint256 steps) internal view returns (uint256 decay) {
+        decay = 1e18;
+        uint256 base = 1e18 - SMOOTHING_FACTOR;
+        while (true) {
+            if (steps & 1 == 1) decay = (decay * base) / 1e18;
+            steps >>= 1;
+            if (steps == 0) break;
+            base = (base * base) / 1e18;
+        }
+        return decay;
     }
 
     /** @dev The timestamp of the latest oracle observation */
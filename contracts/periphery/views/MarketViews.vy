@@ -7,10 +7,12 @@
 """
 
 from vyper.interfaces import ERC20
+from vyper.interfaces import ERC20Detailed
 
 
 interface MainController:
     def markets(i: uint256) -> address: view
+    def get_market_count() -> uint256: view
     def market_contracts(market: address) -> MarketContracts: view
     def global_market_debt_ceiling() -> uint256: view
     def total_debt() -> uint256: view
@@ -38,6 +40,9 @@ interface MarketOperator:
     def debt(account: address) -> uint256: view
     def max_borrowable(collateral: uint256, n_bands: uint256) -> uint256: view
     def health(account: address, full: bool) -> int256: view
+    def liquidation_discounts(account: address) -> uint256: view
+    def loans(i: uint256) -> address: view
+    def n_loans() -> uint256: view
     def AMM() -> address: view
     def A() -> uint256: view
     def pending_account_state_calculator(
@@ -57,6 +62,7 @@ interface AMM:
     def active_band_with_skip() -> int256: view
     def p_oracle_up(n: int256) -> uint256: view
     def p_oracle_down(n: int256) -> uint256: view
+    def p_oracle_ladder(n1: int256, n2: int256) -> DynArray[uint256, MAX_LADDER_PRICES]: view
     def read_user_tick_numbers(receiver: address) -> int256[2]: view
     def get_sum_xy(account: address) -> (uint256, uint256): view
     def get_x_down(account: address) -> uint256: view
@@ -68,6 +74,7 @@ interface AMM:
     def has_liquidity(account: address) -> bool: view
     def bands_x(n: int256) -> uint256: view
     def bands_y(n: int256) -> uint256: view
+    def band_bitmap(word: int256) -> uint256: view
     def rate() -> uint256: view
     def min_band() -> int256: view
     def max_band() -> int256: view
@@ -117,6 +124,15 @@ struct AccountState:
     bands: int256[2]
     coll_conversion_range: uint256[2]
 
+struct MarketAccountState:
+    account: address
+    account_debt: uint256
+    amm_coll_balance: uint256
+    amm_stable_balance: uint256
+    health: int256
+    bands: int256[2]
+    coll_conversion_range: uint256[2]
+
 struct PendingAccountState:
     account_debt: uint256
     amm_coll_balance: uint256
@@ -144,6 +160,11 @@ struct LiquidationState:
 
 
 MAX_TICKS_UINT: constant(uint256) = 50
+MAX_ACCOUNTS: constant(uint256) = 1000
+MAX_BITMAP_WORDS: constant(uint256) = 21  # max bitmap words spanned by 5000 bands
+MAX_LADDER_BANDS: constant(int256) = 256
+MAX_LADDER_PRICES: constant(uint256) = 257
+MAX_LADDER_CHUNKS: constant(uint256) = 20  # 5000 / MAX_LADDER_BANDS, rounded up
 
 MAIN_CONTROLLER: public(immutable(MainController))
 
@@ -194,6 +215,59 @@ def get_market_states(markets: DynArray[MarketOperator, 255]) -> DynArray[Market
     return market_states
 
 
+@view
+@external
+def get_markets_by_pending_fees(
+    n: uint256,
+    min_fee_value: uint256
+) -> (DynArray[address, 255], DynArray[uint256, 255]):
+    """
+    @notice Get the markets with the largest pending fees
+    @dev Pending fees are the interest not yet stored in `MainController.total_debt`,
+         plus the stablecoin and collateral held as AMM admin fees. Collateral fees
+         are valued at the AMM oracle price, and markets where the oracle price
+         cannot be read are omitted. The returned markets can be passed to
+         `MainController.collect_fees`.
+    @param n Maximum number of markets to return (up to 255)
+    @param min_fee_value Minimum pending fee value for a market to be included
+    @return (markets, pending fee values) sorted by descending value
+    """
+    markets: DynArray[address, 255] = []
+    values: DynArray[uint256, 255] = []
+    max_len: uint256 = min(n, 255)
+    if max_len == 0:
+        return markets, values
+
+    num_markets: uint256 = MAIN_CONTROLLER.get_market_count()
+    for i in range(65536):
+        if i == num_markets:
+            break
+        market: address = MAIN_CONTROLLER.markets(i)
+        value: uint256 = self._get_pending_fee_value(market)
+        if value == 0 or value < min_fee_value:
+            continue
+
+        # keep the list sorted by descending value, dropping the smallest entry when full
+        if len(markets) == max_len:
+            if value <= values[max_len - 1]:
+                continue
+            markets.pop()
+            values.pop()
+        markets.append(market)
+        values.append(value)
+        j: uint256 = len(markets) - 1
+        for k in range(255):
+            if j == 0 or values[j - 1] >= value:
+                break
+            markets[j] = markets[j - 1]
+            values[j] = values[j - 1]
+            j -= 1
+        markets[j] = market
+        values[j] = value
+
+    return markets, values
+
+
 @view
 @external
 def get_market_amm_bands(
@@ -212,7 +286,8 @@ def get_market_amm_bands(
         is more than the total active bands, the returned data will stop at the
         highest active band.
     @param include_empty_bands If True, all bands in the given range are returned.
-        If False, results are filtered by bands with a non-zero balance.
+        If False, results are filtered by bands with a non-zero balance. Empty
+        bands are skipped using the AMM's band bitmap, 256 bands per call.
     @return Dynamic array of band data:
              * band number
              * (band lowest price, band highest price)
@@ -228,19 +303,43 @@ def get_market_amm_bands(
     n_final: int256 = min(n + convert(num_bands, int256)-1, max_band)
     bands: DynArray[Band, 5000] = []
 
-    for i in range(5000):
+    if include_empty_bands:
+        # band prices are read in chunks of up to MAX_LADDER_BANDS bands
+        n_final = min(n_final, n + 4999)
+        for i in range(MAX_LADDER_CHUNKS):
+            if n > n_final:
+                break
+            n_last: int256 = min(unsafe_add(n, MAX_LADDER_BANDS - 1), n_final)
+            prices: DynArray[uint256, MAX_LADDER_PRICES] = amm.p_oracle_ladder(n, n_last)
+            for j in range(MAX_LADDER_PRICES):
+                if n > n_last:
+                    break
+                bands.append(self._get_band(amm, n, prices[j + 1], prices[j]))
+                n = unsafe_add(n, 1)
+
+        return bands, [min_band, max_band]
+
+    for i in range(MAX_BITMAP_WORDS):
         if n > n_final:
             break
-        coll_balance: uint256 = amm.bands_y(n)
-        debt_balance: uint256 = amm.bands_x(n)
-        if include_empty_bands or coll_balance + debt_balance > 0:
-            bands.append(Band({
-                band_num: n,
-                price_range: [amm.p_oracle_down(n), amm.p_oracle_up(n)],
-                coll_balance: coll_balance,
-                debt_balance: debt_balance
-            }))
-        n = unsafe_add(n, 1)
+        word: int256 = shift(n, -8)
+        bitmap: uint256 = amm.band_bitmap(word)
+        # discard the bits for bands below `n`
+        bitmap = shift(bitmap, -convert(unsafe_sub(n, shift(word, 8)), int128))
+        for j in range(256):
+            if bitmap == 0 or n > n_final:
+                break
+            if bitmap & 1 != 0:
+                p_up: uint256 = 0
+                if len(bands) > 0 and bands[len(bands) - 1].band_num == n - 1:
+                    # p_oracle_up(n) == p_oracle_down(n - 1)
+                    p_up = bands[len(bands) - 1].price_range[0]
+                else:
+                    p_up = amm.p_oracle_up(n)
+                bands.append(self._get_band(amm, n, amm.p_oracle_down(n), p_up))
+            bitmap = shift(bitmap, -1)
+            n = unsafe_add(n, 1)
+        n = shift(word + 1, 8)
 
     return bands, [min_band, max_band]
 
@@ -282,6 +381,75 @@ def get_market_states_for_account(
     return account_states
 
 
+@view
+@external
+def get_account_states(
+    market: MarketOperator,
+    accounts: DynArray[address, MAX_ACCOUNTS]
+) -> DynArray[MarketAccountState, MAX_ACCOUNTS]:
+    """
+    @notice Get information about the loans of many accounts within one market
+    @dev Returns one item per account, in the same order as `accounts`. Items for
+         accounts without a loan are empty apart from the account address.
+    @return Array of account states:
+                Account address,
+                Account debt,
+                AMM balances (collateral, stablecoin),
+                Account health (liquidation is possible if health < 0),
+                Bands (high, low),
+                Liquidation price range (high, low)
+    """
+    c: MarketContracts = self._get_market_contracts_or_revert(market.address)
+    amm: AMM = AMM(c.amm)
+    price: uint256 = amm.price_oracle()
+    active_band: int256 = amm.active_band()
+    coll_precision: uint256 = 10 ** (18 - convert(ERC20Detailed(c.collateral).decimals(), uint256))
+
+    account_states: DynArray[MarketAccountState, MAX_ACCOUNTS] = []
+    for account in accounts:
+        account_states.append(self._get_account_state(market, amm, account, price, active_band, coll_precision))
+
+    return account_states
+
+
+@view
+@external
+def get_all_account_states(
+    market: MarketOperator,
+    start: uint256 = 0,
+    limit: uint256 = 0
+) -> DynArray[MarketAccountState, MAX_ACCOUNTS]:
+    """
+    @notice Get information about all open loans within one market
+    @dev Iterates over the market's loan list, use `start` and `limit` to page
+         through markets with more than 1000 loans
+    @param market Market to return loans for
+    @param start Loan index to start iteration from
+    @param limit Number of loans to return (leave as 0 for the maximum of 1000)
+    @return Array of account states, with the same fields as `get_account_states`
+    """
+    c: MarketContracts = self._get_market_contracts_or_revert(market.address)
+    amm: AMM = AMM(c.amm)
+    price: uint256 = amm.price_oracle()
+    active_band: int256 = amm.active_band()
+    coll_precision: uint256 = 10 ** (18 - convert(ERC20Detailed(c.collateral).decimals(), uint256))
+
+    n_loans: uint256 = market.n_loans()
+    if limit != 0:
+        n_loans = min(n_loans, start + limit)
+
+    account_states: DynArray[MarketAccountState, MAX_ACCOUNTS] = []
+    ix: uint256 = start
+    for i in range(MAX_ACCOUNTS):
+        if ix >= n_loans:
+            break
+        account: address = market.loans(ix)
+        account_states.append(self._get_account_state(market, amm, account, price, active_band, coll_precision))
+        ix = unsafe_add(ix, 1)
+
+    return account_states
+
+
 @view
 @external
 def get_pending_market_state_for_account(
@@ -371,12 +539,18 @@ def get_market_amm_bands_for_account(account: address, market: address) -> DynAr
 
     n: int256 = amm.read_user_tick_numbers(account)[0]
     account_xy: DynArray[uint256, MAX_TICKS_UINT][2] = amm.get_xy(account)
+    if len(account_xy[0]) == 0:
+        return bands
+
+    prices: DynArray[uint256, MAX_LADDER_PRICES] = amm.p_oracle_ladder(
+        n, n + convert(len(account_xy[0]), int256) - 1
+    )
     for i in range(MAX_TICKS_UINT):
         if i == len(account_xy[0]):
             break
         bands.append(Band({
             band_num: n,
-            price_range: [amm.p_oracle_down(n), amm.p_oracle_up(n)],
+            price_range: [prices[i + 1], prices[i]],
             coll_balance: account_xy[1][i],
             debt_balance: account_xy[0][i]
         }))
@@ -492,6 +666,77 @@ def _uint_plus_int(initial: uint256, adjustment: int256) -> uint256:
         return initial + convert(adjustment, uint256)
 
 
+@view
+@internal
+def _get_account_state(
+    market: MarketOperator,
+    amm: AMM,
+    account: address,
+    price: uint256,
+    active_band: int256,
+    coll_precision: uint256
+) -> MarketAccountState:
+    """
+    @dev Equivalent to `MarketOperator.health(account, True)`, using an oracle
+         price and active band that are read once per call by the caller
+    """
+    state: MarketAccountState = empty(MarketAccountState)
+    state.account = account
+    debt: uint256 = market.debt(account)
+    if debt == 0:
+        return state
+
+    state.account_debt = debt
+    state.amm_stable_balance, state.amm_coll_balance = amm.get_sum_xy(account)
+    state.bands = amm.read_user_tick_numbers(account)
+    p_up: uint256 = amm.p_oracle_up(state.bands[0])
+    state.coll_conversion_range = [p_up, amm.p_oracle_down(state.bands[1])]
+
+    health: int256 = 10**18 - convert(market.liquidation_discounts(account), int256)
+    health = unsafe_div(convert(amm.get_x_down(account), int256) * health, convert(debt, int256)) - 10**18
+    if state.bands[0] > active_band and price > p_up:
+        health += convert(unsafe_div(unsafe_sub(price, p_up) * state.amm_coll_balance * coll_precision, debt), int256)
+    state.health = health
+
+    return state
+
+
+@view
+@internal
+def _get_pending_fee_value(market: address) -> uint256:
+    # returns zero, so the market is skipped, if the AMM oracle price is unavailable
+    c: MarketContracts = MAIN_CONTROLLER.market_contracts(market)
+    amm: AMM = AMM(c.amm)
+    value: uint256 = MarketOperator(market).pending_debt() + amm.admin_fees_x()
+    fees_y: uint256 = amm.admin_fees_y()
+    if fees_y > 0:
+        success: bool = False
+        response: Bytes[32] = b""
+        success, response = raw_call(
+            c.amm,
+            method_id("price_oracle()"),
+            max_outsize=32,
+            is_static_call=True,
+            revert_on_failure=False
+        )
+        if not success or len(response) < 32:
+            return 0
+        decimals: uint256 = convert(ERC20Detailed(c.collateral).decimals(), uint256)
+        value += fees_y * convert(response, uint256) / 10 ** decimals
+    return value
+
+
+@view
+@internal
+def _get_band(amm: AMM, n: int256, p_down: uint256, p_up: uint256) -> Band:
+    return Band({
+        band_num: n,
+        price_range: [p_down, p_up],
+        coll_balance: amm.bands_y(n),
+        debt_balance: amm.bands_x(n)
+    })
+
+
 @view
 @internal
 def _get_market_contracts_or_revert(market: address) -> MarketContracts:
@@ -0,0 +1,20 @@
+#pragma version 0.3.10
+"""
+@notice Measures the gas used by repeated oracle calls within one transaction
+@dev This contract is for testing only.
+"""
+
+interface PriceOracle:
+    def price_w() -> uint256: nonpayable
+
+
+@external
+def measure_price_w(oracle: PriceOracle, num_calls: uint256) -> DynArray[uint256, 16]:
+    gas_used: DynArray[uint256, 16] = []
+    for i in range(16):
+        if i == num_calls:
+            break
+        gas_start: uint256 = msg.gas
+        oracle.price_w()
+        gas_used.append(gas_start - msg.gas)
+    return gas_used
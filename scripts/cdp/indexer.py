@@ -0,0 +1,465 @@
+"""
+Streaming indexer for `MainController`, `MarketOperator` and `AMM` event logs.
+
+Logs are read in block-range batches, decoded with the project ABIs and appended
+to a local SQLite database with one table per event. Every table has the columns
+`block_number`, `log_index`, `tx_hash` and `address`, followed by the event
+arguments. Integers wider than 64 bits are stored as decimal strings, arrays as
+JSON.
+
+Markets are discovered from the `AddMarket` logs of the controller. Indexing from
+the controller deployment block therefore covers the logs of every market and AMM.
+Each batch is written in one transaction together with the last indexed block, so
+an interrupted run resumes after the last complete batch and no log is stored twice.
+
+Logs are read from a `RpcLogSource` (any JSON-RPC node, including a local hardhat
+or anvil node), or from a `BoaLogSource`. The latter records the logs of calls made
+in a titanoboa environment, e.g. by the load generator, so the indexer can be run
+offline:
+
+    with BoaLogSource() as source:
+        contracts = deploy(config)
+        LoadGenerator(config, contracts).run(prices)
+    store = SqliteStore("events.db")
+    Indexer(source, store, contracts["controller"].address).run()
+
+Usage:
+    python -m scripts.cdp.indexer <rpc url> <controller> events.db --start-block 19000000
+    python -m scripts.cdp.indexer <rpc url> <controller> events.db --follow --confirmations 5
+"""
+
+import argparse
+import json
+import sqlite3
+import time
+from functools import lru_cache
+from pathlib import Path
+
+import eth_abi
+from eth_utils import keccak, to_checksum_address
+
+
+SOURCES = {
+    "MainController": "contracts/cdp/MainController.vy",
+    "MarketOperator": "contracts/cdp/MarketOperator.vy",
+    "AMM": "contracts/cdp/AMM.vy",
+}
+
+CONTROLLER_EVENTS = (
+    "AddMarket",
+    "CreateLoan",
+    "AdjustLoan",
+    "CloseLoan",
+    "LiquidateLoan",
+    "CollectAmmFees",
+    "CollectFees",
+)
+MARKET_EVENTS = ("UserState",)
+AMM_EVENTS = ("Deposit", "Withdraw", "TokenExchange")
+
+BUILD_PATH = Path("build/contracts")
+
+
+@lru_cache
+def load_abi(name):
+    """
+    ABI of a project contract, from the brownie build folder if it exists and
+    otherwise compiled from source.
+    """
+    build = BUILD_PATH.joinpath(f"{name}.json")
+    if build.exists():
+        return json.loads(build.read_text())["abi"]
+
+    # only required when there is no brownie build
+    import vyper
+
+    return vyper.compile_code(Path(SOURCES[name]).read_text(), output_formats=["abi"])["abi"]
+
+
+def _abi_type(item):
+    # canonical type string, expanding tuples into their components
+    if item["type"].startswith("tuple"):
+        components = ",".join(_abi_type(i) for i in item["components"])
+        return f"({components}){item['type'][5:]}"
+    return item["type"]
+
+
+def _is_dynamic(abi_type):
+    return abi_type in ("bytes", "string") or abi_type.endswith("[]") or abi_type.startswith("(")
+
+
+def _int_bits(abi_type):
+    # size of an integer type, None for other types
+    if abi_type.startswith(("uint", "int")) and "[" not in abi_type:
+        return int(abi_type.lstrip("uint") or 256)
+    return None
+
+
+def _to_sql(value, abi_type):
+    if abi_type == "address":
+        return to_checksum_address(value)
+    if abi_type == "bool":
+        return int(value)
+    bits = _int_bits(abi_type)
+    if bits is not None:
+        return value if bits <= 64 else str(value)
+    if isinstance(value, bytes):
+        return "0x" + value.hex()
+    if isinstance(value, (list, tuple)):
+        return json.dumps(value, default=str)
+    return value
+
+
+def _sql_type(abi_type):
+    bits = _int_bits(abi_type)
+    if abi_type == "bool" or (bits is not None and bits <= 64):
+        return "INTEGER"
+    return "TEXT"
+
+
+class EventDecoder:
+    """
+    Decodes logs of the given events, identified by their first topic.
+    """
+
+    def __init__(self, abi, names):
+        # topic0 -> event abi
+        self.events = {}
+        for item in abi:
+            if item["type"] == "event" and item["name"] in names:
+                signature = f"{item['name']}({','.join(_abi_type(i) for i in item['inputs'])})"
+                self.events[keccak(text=signature)] = item
+
+    @property
+    def topics(self):
+        return list(self.events)
+
+    def decode(self, log):
+        """
+        Decode `log` into (event name, {argument: value}). Indexed arguments of a
+        dynamic type are returned as the hash stored in the topic.
+        """
+        event = self.events[log["topics"][0]]
+        values = {}
+
+        indexed = [i for i in event["inputs"] if i["indexed"]]
+        for item, topic in zip(indexed, log["topics"][1:]):
+            abi_type = _abi_type(item)
+            values[item["name"]] = topic if _is_dynamic(abi_type) else eth_abi.decode([abi_type], topic)[0]
+
+        inputs = [i for i in event["inputs"] if not i["indexed"]]
+        decoded = eth_abi.decode([_abi_type(i) for i in inputs], log["data"])
+        values.update((i["name"], v) for i, v in zip(inputs, decoded))
+
+        # keep the argument order of the event
+        return event["name"], {i["name"]: values[i["name"]] for i in event["inputs"]}
+
+    def columns(self, name):
+        event = next(i for i in self.events.values() if i["name"] == name)
+        return [(i["name"], _abi_type(i)) for i in event["inputs"]]
+
+
+class RpcLogSource:
+    """
+    Logs from a JSON-RPC node.
+    """
+
+    def __init__(self, url):
+        from web3 import Web3
+
+        self.w3 = Web3(Web3.HTTPProvider(url))
+
+    def block_number(self):
+        return self.w3.eth.block_number
+
+    def get_logs(self, from_block, to_block, addresses, topics):
+        if not addresses:
+            return []
+        params = {
+            "fromBlock": from_block,
+            "toBlock": to_block,
+            "address": [to_checksum_address(i) for i in addresses],
+            "topics": [["0x" + i.hex() for i in topics]],
+        }
+        try:
+            logs = self.w3.eth.get_logs(params)
+        except ValueError:
+            # most nodes limit the number of results or the block range of a query
+            if from_block == to_block:
+                raise
+            mid = (from_block + to_block) // 2
+            return self.get_logs(from_block, mid, addresses, topics) + self.get_logs(
+                mid + 1, to_block, addresses, topics
+            )
+        return [
+            {
+                "block_number": i["blockNumber"],
+                "log_index": i["logIndex"],
+                "tx_hash": "0x" + bytes(i["transactionHash"]).hex(),
+                "address": to_checksum_address(i["address"]),
+                "topics": [bytes(t) for t in i["topics"]],
+                "data": bytes(i["data"]),
+            }
+            for i in logs
+        ]
+
+
+class BoaLogSource:
+    """
+    Logs of the calls made in a titanoboa environment while recording.
+
+    Titanoboa does not produce transaction hashes, a unique hash is generated for
+    each call instead. Logs of calls rolled back by `boa.env.anchor` are kept.
+    """
+
+    def __init__(self, env=None):
+        import boa
+
+        self.env = env or boa.env
+        self.logs = []
+        self._log_index = {}
+        self._num_calls = 0
+        self._original = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        self._original = self.env.__dict__.get("execute_code")
+        execute_code = self.env.execute_code
+
+        def recorded(*args, **kwargs):
+            computation = execute_code(*args, **kwargs)
+            self._record(computation)
+            return computation
+
+        self.env.execute_code = recorded
+
+    def stop(self):
+        if self._original is None:
+            del self.env.execute_code
+        else:
+            self.env.execute_code = self._original
+
+    def _record(self, computation):
+        block = self.env.vm.state.block_number
+        self._num_calls += 1
+        tx_hash = "0x" + keccak(self._num_calls.to_bytes(32, "big")).hex()
+        for address, topics, data in computation.get_log_entries():
+            log_index = self._log_index.get(block, 0)
+            self._log_index[block] = log_index + 1
+            self.logs.append(
+                {
+                    "block_number": block,
+                    "log_index": log_index,
+                    "tx_hash": tx_hash,
+                    "address": to_checksum_address(address),
+                    "topics": [i.to_bytes(32, "big") for i in topics],
+                    "data": data,
+                }
+            )
+
+    def block_number(self):
+        return self.env.vm.state.block_number
+
+    def get_logs(self, from_block, to_block, addresses, topics):
+        addresses = {to_checksum_address(i) for i in addresses}
+        topics = set(topics)
+        return [
+            i
+            for i in self.logs
+            if from_block <= i["block_number"] <= to_block
+            and i["address"] in addresses
+            and i["topics"]
+            and i["topics"][0] in topics
+        ]
+
+
+class SqliteStore:
+    """
+    Event tables, markets and checkpoints in a SQLite database.
+    """
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        with self.db:
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS _checkpoints (controller TEXT PRIMARY KEY, block_number INTEGER)"
+            )
+            self.db.execute(
+                "CREATE TABLE IF NOT EXISTS _markets "
+                "(controller TEXT, market TEXT, amm TEXT, collateral TEXT, block_number INTEGER, "
+                "PRIMARY KEY (controller, market))"
+            )
+
+    def close(self):
+        self.db.close()
+
+    def create_table(self, name, columns):
+        """
+        Create the table for event `name`, `columns` is a list of (name, abi type).
+        """
+        cols = ", ".join(f'"{col}" {_sql_type(abi_type)}' for col, abi_type in columns)
+        with self.db:
+            self.db.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" (block_number INTEGER, log_index INTEGER, '
+                f"tx_hash TEXT, address TEXT, {cols}, PRIMARY KEY (block_number, log_index))"
+            )
+
+    def get_checkpoint(self, controller):
+        row = self.db.execute(
+            "SELECT block_number FROM _checkpoints WHERE controller = ?", (controller,)
+        ).fetchone()
+        return None if row is None else row[0]
+
+    def get_markets(self, controller):
+        """
+        List of (market, amm) discovered for `controller`.
+        """
+        return self.db.execute(
+            "SELECT market, amm FROM _markets WHERE controller = ? ORDER BY block_number", (controller,)
+        ).fetchall()
+
+    def write(self, controller, to_block, rows, markets):
+        """
+        Append decoded logs and new markets, and move the checkpoint to `to_block`.
+
+        `rows` is a list of (event name, column names, values), `markets` a list of
+        (market, amm, collateral, block number).
+        """
+        with self.db:
+            for name, columns, values in rows:
+                cols = ", ".join(f'"{i}"' for i in columns)
+                params = ", ".join("?" * len(columns))
+                self.db.execute(f'INSERT OR IGNORE INTO "{name}" ({cols}) VALUES ({params})', values)
+            self.db.executemany(
+                "INSERT OR IGNORE INTO _markets VALUES (?, ?, ?, ?, ?)",
+                [(controller, *i) for i in markets],
+            )
+            self.db.execute(
+                "INSERT OR REPLACE INTO _checkpoints VALUES (?, ?)", (controller, to_block)
+            )
+
+
+class Indexer:
+    def __init__(self, source, store, controller, start_block=0, batch_size=2000, confirmations=0):
+        self.source = source
+        self.store = store
+        self.controller = to_checksum_address(controller)
+        self.start_block = start_block
+        self.batch_size = batch_size
+        self.confirmations = confirmations
+
+        self.controller_decoder = EventDecoder(load_abi("MainController"), CONTROLLER_EVENTS)
+        market_abi = load_abi("MarketOperator") + load_abi("AMM")
+        self.market_decoder = EventDecoder(market_abi, MARKET_EVENTS + AMM_EVENTS)
+        for decoder, names in (
+            (self.controller_decoder, CONTROLLER_EVENTS),
+            (self.market_decoder, MARKET_EVENTS + AMM_EVENTS),
+        ):
+            for name in names:
+                store.create_table(name, decoder.columns(name))
+
+        # market and AMM addresses whose logs are indexed
+        self.addresses = [i for pair in store.get_markets(self.controller) for i in pair]
+
+    @property
+    def next_block(self):
+        checkpoint = self.store.get_checkpoint(self.controller)
+        return self.start_block if checkpoint is None else checkpoint + 1
+
+    def run(self, to_block=None):
+        """
+        Index all blocks from the last checkpoint up to `to_block` (default: the
+        chain head minus `confirmations`). Returns the number of logs stored.
+        """
+        head = self.source.block_number() - self.confirmations
+        to_block = head if to_block is None else min(to_block, head)
+
+        num_logs = 0
+        from_block = self.next_block
+        while from_block <= to_block:
+            batch_end = min(from_block + self.batch_size - 1, to_block)
+            num_logs += self.index_range(from_block, batch_end)
+            from_block = batch_end + 1
+        return num_logs
+
+    def follow(self, poll_interval=12):
+        """
+        Keep indexing new blocks as they are confirmed.
+        """
+        while True:
+            num_logs = self.run()
+            if num_logs:
+                print(f"{num_logs} logs up to block {self.next_block - 1}")
+            time.sleep(poll_interval)
+
+    def index_range(self, from_block, to_block):
+        rows = []
+        markets = []
+
+        # controller logs first, so that markets added in this range are included
+        logs = self.source.get_logs(from_block, to_block, [self.controller], self.controller_decoder.topics)
+        for log in logs:
+            name, values = self.controller_decoder.decode(log)
+            rows.append(self._row(self.controller_decoder, log, name, values))
+            if name == "AddMarket":
+                market = to_checksum_address(values["market"])
+                amm = to_checksum_address(values["amm"])
+                markets.append((market, amm, to_checksum_address(values["collateral"]), log["block_number"]))
+                self.addresses += [market, amm]
+
+        logs = self.source.get_logs(from_block, to_block, self.addresses, self.market_decoder.topics)
+        for log in logs:
+            name, values = self.market_decoder.decode(log)
+            rows.append(self._row(self.market_decoder, log, name, values))
+
+        self.store.write(self.controller, to_block, rows, markets)
+        return len(rows)
+
+    @staticmethod
+    def _row(decoder, log, name, values):
+        columns = ["block_number", "log_index", "tx_hash", "address"]
+        row = [log["block_number"], log["log_index"], log["tx_hash"], log["address"]]
+        for col, abi_type in decoder.columns(name):
+            columns.append(col)
+            row.append(_to_sql(values[col], abi_type))
+        return name, columns, row
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("rpc_url")
+    parser.add_argument("controller", help="MainController address")
+    parser.add_argument("database", help="SQLite database path")
+    parser.add_argument("--start-block", type=int, default=0, help="controller deployment block")
+    parser.add_argument("--batch-size", type=int, default=2000)
+    parser.add_argument("--confirmations", type=int, default=0)
+    parser.add_argument("--follow", action="store_true", help="keep indexing new blocks")
+    args = parser.parse_args(argv)
+
+    store = SqliteStore(args.database)
+    indexer = Indexer(
+        RpcLogSource(args.rpc_url),
+        store,
+        args.controller,
+        start_block=args.start_block,
+        batch_size=args.batch_size,
+        confirmations=args.confirmations,
+    )
+    try:
+        if args.follow:
+            indexer.follow()
+        else:
+            num_logs = indexer.run()
+            print(f"{num_logs} logs up to block {indexer.next_block - 1}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
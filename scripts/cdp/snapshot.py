@@ -0,0 +1,180 @@
+"""
+Batched snapshots of peg keeper and market state.
+
+Contract addresses that do not change between snapshots (the regulator, peg keepers,
+pools, paired tokens, markets and AMMs) are resolved once and cached.
+Each snapshot then reads all regulator, peg keeper, pool, token and market state in a
+single multicall pass.
+
+Contract objects are created from locally compiled ABIs, so no block explorer lookups
+are required. This also means the module works against a local fork node. If the
+canonical multicall contract is not deployed on the active network, brownie's own
+multicall deployment is used instead.
+"""
+
+from functools import lru_cache
+
+from brownie import Contract, multicall, web3
+from brownie.project import get_loaded_projects
+
+
+CONTROLLER = "0x1337F001E280420EcCe9E7B934Fa07D67fdb62CD"
+MULTICALL = "0xcA11bde05977b3631167028862bE2a173976CA11"
+STABLE = "0x69420f9E38a4e60a62224C489be4BF7a94402496"
+
+# ABIs of external contracts are taken from the matching test contracts
+POOL_ABI = "Stableswap"
+TOKEN_ABI = "ERC20Mock"
+
+
+@lru_cache
+def get_abi(name):
+    """
+    Get the ABI for a contract in the active project.
+    """
+    return get_loaded_projects()[0][name].abi
+
+
+def get_contract(name, address):
+    """
+    Get a `Contract` object at `address`, using the locally compiled ABI of `name`.
+    """
+    return Contract.from_abi(name, address, get_abi(name), persist=False)
+
+
+@lru_cache
+def get_multicall_address():
+    if len(web3.eth.get_code(MULTICALL)):
+        return MULTICALL
+    return None
+
+
+@lru_cache
+def get_topology(controller=CONTROLLER, stable=STABLE):
+    """
+    Resolve the static contract topology of the protocol.
+
+    The result is cached, call `get_topology.cache_clear()` after a peg keeper
+    or market has been added.
+
+    Returns:
+        Dict of `controller`, `regulator` and `stable` contracts, and lists of
+        `peg_keepers` and `markets`. Each peg keeper is a dict of `peg_keeper`,
+        `pool`, `paired`, `decimals` and `name`. Each market is a dict of `market`,
+        `amm`, `collateral` and `decimals`.
+    """
+    controller = get_contract("MainController", controller)
+    stable = get_contract(TOKEN_ABI, stable)
+
+    with multicall(get_multicall_address()):
+        regulator = controller.peg_keeper_regulator()
+        markets = controller.get_all_markets()
+    regulator = get_contract("PegKeeperRegulator", regulator)
+
+    with multicall(get_multicall_address()):
+        peg_keepers = regulator.get_peg_keepers_with_debt_ceilings()[0]
+        market_contracts = [controller.market_contracts(i) for i in markets]
+
+    with multicall(get_multicall_address()):
+        pk_info = [regulator.peg_keepers(i) for i in range(len(peg_keepers))]
+    pools = [get_contract(POOL_ABI, i["pool"]) for i in pk_info]
+    collaterals = [get_contract(TOKEN_ABI, i["collateral"]) for i in market_contracts]
+
+    with multicall(get_multicall_address()):
+        paired = [i.coins(0) for i in pools]
+        names = [i.name() for i in pools]
+        coll_decimals = [i.decimals() for i in collaterals]
+    paired = [get_contract(TOKEN_ABI, i) for i in paired]
+
+    with multicall(get_multicall_address()):
+        paired_decimals = [i.decimals() for i in paired]
+
+    return {
+        "controller": controller,
+        "regulator": regulator,
+        "stable": stable,
+        "peg_keepers": [
+            {
+                "peg_keeper": get_contract("PegKeeper", info["peg_keeper"]),
+                "pool": pools[i],
+                "paired": paired[i],
+                "decimals": paired_decimals[i],
+                "name": names[i],
+            }
+            for i, info in enumerate(pk_info)
+        ],
+        "markets": [
+            {
+                "market": get_contract("MarketOperator", market),
+                "amm": get_contract("AMM", market_contracts[i]["amm"]),
+                "collateral": collaterals[i],
+                "decimals": coll_decimals[i],
+            }
+            for i, market in enumerate(markets)
+        ],
+    }
+
+
+def take_snapshot(topology=None):
+    """
+    Read the current state of all peg keepers and markets in one multicall pass.
+
+    Args:
+        topology: Protocol topology as returned by `get_topology`. Resolved
+                  (and cached) for the default controller if not given.
+
+    Returns:
+        Dict of regulator state (`active_debt`, `max_debt`), controller state
+        (`total_debt`, `global_debt_ceiling`), and lists of `peg_keepers` and
+        `markets`. Each entry extends the matching topology dict with raw (integer)
+        state values.
+    """
+    if topology is None:
+        topology = get_topology()
+
+    regulator = topology["regulator"]
+    controller = topology["controller"]
+    stable = topology["stable"]
+
+    with multicall(get_multicall_address()):
+        snapshot = {
+            "active_debt": regulator.active_debt(),
+            "max_debt": regulator.max_debt(),
+            "total_debt": controller.total_debt(),
+            "global_debt_ceiling": controller.global_market_debt_ceiling(),
+            "peg_keepers": [],
+            "markets": [],
+        }
+        for i, data in enumerate(topology["peg_keepers"]):
+            pk = data["peg_keeper"]
+            pool = data["pool"]
+            snapshot["peg_keepers"].append(
+                dict(
+                    data,
+                    amounts=[data["paired"].balanceOf(pool), stable.balanceOf(pool)],
+                    debt=pk.debt(),
+                    ceiling=regulator.peg_keepers(i),
+                    profit=regulator.estimate_caller_profit(pk),
+                    price=pool.get_p(0),
+                )
+            )
+        for data in topology["markets"]:
+            market = data["market"]
+            amm = data["amm"]
+            snapshot["markets"].append(
+                dict(
+                    data,
+                    total_debt=market.total_debt(),
+                    debt_ceiling=market.debt_ceiling(),
+                    total_coll=data["collateral"].balanceOf(amm),
+                    oracle_price=amm.price_oracle(),
+                    rate=amm.rate(),
+                )
+            )
+
+    # unpack structs once the multicall has been executed
+    for data in snapshot["peg_keepers"]:
+        data["ceiling"] = data["ceiling"]["debt_ceiling"]
+        data["profit"] = data["profit"] or 0
+
+    return snapshot
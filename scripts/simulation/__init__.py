@@ -0,0 +1,2 @@
+from scripts.simulation.llamma import LLAMMA, DetailedTrade, PathResults, Revert, simulate_paths  # noqa: F401
+from scripts.simulation.lending import LendingModel  # noqa: F401
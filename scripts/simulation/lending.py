@@ -0,0 +1,352 @@
+"""
+Off-chain reference model of debt accrual and band accounting.
+
+Replicates the bookkeeping of `contracts/cdp/MarketOperator.vy` (per-loan and total
+debt, accrued through the AMM rate multiplier) and of `contracts/cdp/AMM.vy`
+(`deposit_range` / `withdraw` band shares and the rate multiplier itself). Integer
+semantics follow the contracts, so given the same inputs every value matches the
+on-chain state exactly. Conditions that would cause the contracts to revert raise
+`Revert`, and leave the model state unchanged.
+
+Band placement (`MarketOperator._calculate_debt_n1`) depends on the oracle price
+and is not modelled: callers choose the band range of each loan, e.g. by reading
+`read_user_tick_numbers` after the matching on-chain call.
+"""
+
+from contextlib import contextmanager
+
+from scripts.simulation.llamma import DEAD_SHARES, MAX_SKIP_TICKS, MAX_TICKS, LLAMMA, Revert, _sub
+
+
+MIN_TICKS = 4
+
+
+class LendingModel:
+    """
+    Debt and band share state of a single market.
+
+    `amm` is a `LLAMMA` instance holding the band balances. Only stablecoin
+    amounts (`bands_x`) and collateral amounts (`bands_y`) are read and written
+    here, so the same instance can also be used to simulate swaps.
+    """
+
+    def __init__(self, amm, debt_ceiling=2**256 - 1, rate=0, rate_mul=10**18, rate_time=None):
+        self.amm = amm
+        self.debt_ceiling = debt_ceiling
+        self.timestamp = amm.timestamp
+
+        # AMM rate state
+        self.rate = rate
+        self.rate_mul = rate_mul
+        self.rate_time = self.timestamp if rate_time is None else rate_time
+
+        # account -> (initial_debt, rate_mul)
+        self.loans = {}
+        self.total = (0, 10**18)
+        # account -> (n1, n2, shares)
+        self.user_shares = {}
+        self.total_shares = {}
+
+        self.amm.rate_mul = self.get_rate_mul()
+
+    @contextmanager
+    def _atomic(self):
+        # restore the previous state when a call reverts part way through
+        amm = self.amm
+        state = (
+            dict(self.loans),
+            self.total,
+            dict(self.user_shares),
+            dict(self.total_shares),
+            dict(amm.bands_x),
+            dict(amm.bands_y),
+            amm.active_band,
+            amm.min_band,
+            amm.max_band,
+            amm.admin_fees_x,
+            amm.admin_fees_y,
+        )
+        try:
+            yield
+        except Revert:
+            (
+                self.loans,
+                self.total,
+                self.user_shares,
+                self.total_shares,
+                amm.bands_x,
+                amm.bands_y,
+                amm.active_band,
+                amm.min_band,
+                amm.max_band,
+                amm.admin_fees_x,
+                amm.admin_fees_y,
+            ) = state
+            raise
+
+    # --- rates ---
+
+    def time_travel(self, seconds):
+        self.timestamp += seconds
+        self.amm.timestamp = self.timestamp
+        self.amm.rate_mul = self.get_rate_mul()
+
+    def get_rate_mul(self):
+        return self.rate_mul * (10**18 + self.rate * (self.timestamp - self.rate_time)) // 10**18
+
+    def set_rate(self, rate):
+        """
+        `AMM.set_rate`, as called by the controller at the end of every loan action.
+        """
+        if self.rate_time == self.timestamp and self.rate == rate:
+            return self.rate_mul
+        self.rate_mul = self.get_rate_mul()
+        self.rate_time = self.timestamp
+        self.rate = rate
+        return self.rate_mul
+
+    # --- debt ---
+
+    def debt(self, account):
+        initial_debt, rate_mul = self.loans.get(account, (0, 0))
+        if initial_debt == 0:
+            return 0
+        return initial_debt * self.get_rate_mul() // rate_mul
+
+    def total_debt(self):
+        initial_debt, rate_mul = self.total
+        return initial_debt * self.get_rate_mul() // rate_mul
+
+    @property
+    def n_loans(self):
+        return len(self.loans)
+
+    def _increase_total_debt(self, amount, rate_mul):
+        stored_debt, stored_rate_mul = self.total
+        total_debt = stored_debt * rate_mul // stored_rate_mul
+        if amount > 0:
+            total_debt += amount
+            if total_debt > self.debt_ceiling:
+                raise Revert("DFM:M Exceeds debt ceiling")
+        self.total = (total_debt, rate_mul)
+        return total_debt - stored_debt
+
+    def _decrease_total_debt(self, amount, rate_mul):
+        stored_debt, stored_rate_mul = self.total
+        total_debt = stored_debt * rate_mul // stored_rate_mul
+        total_debt = total_debt - amount if total_debt > amount else 0
+        self.total = (total_debt, rate_mul)
+        return total_debt - stored_debt
+
+    # --- loans ---
+
+    def create_loan(self, account, coll_amount, debt_amount, n1, n2):
+        """
+        `MarketOperator.create_loan`, depositing into bands `[n1, n2]`.
+        Returns the increase in total debt.
+        """
+        if self.loans.get(account, (0, 0))[0] != 0:
+            raise Revert("DFM:M Loan already exists")
+        n_bands = n2 - n1 + 1
+        if n_bands < MIN_TICKS:
+            raise Revert("DFM:M Need more ticks")
+        if n_bands > MAX_TICKS:
+            raise Revert("DFM:M Need less ticks")
+        if debt_amount == 0:
+            raise Revert()
+
+        with self._atomic():
+            rate_mul = self.get_rate_mul()
+            self.loans[account] = (debt_amount, rate_mul)
+            debt_increase = self._increase_total_debt(debt_amount, rate_mul)
+            self.deposit_range(account, coll_amount, n1, n2)
+        return debt_increase
+
+    def adjust_loan(self, account, coll_change, debt_change, n1=None):
+        """
+        `MarketOperator.adjust_loan`. When the loan is not in liquidation its
+        collateral is redeposited starting at band `n1` (default: unchanged).
+        Returns the change in total debt.
+        """
+        rate_mul = self.get_rate_mul()
+        account_debt = self.debt(account)
+        if account_debt == 0:
+            raise Revert("DFM:M Loan doesn't exist")
+        account_debt += debt_change
+        if account_debt < 0:
+            raise Revert("Integer underflow")
+        if account_debt == 0:
+            raise Revert("DFM:M No remaining debt")
+
+        ns0, ns1, _ = self.user_shares[account]
+        with self._atomic():
+            if ns0 > self.active_band_with_skip():
+                coll_amount = self.withdraw(account, 10**18)[1] + coll_change
+                if coll_amount < 0:
+                    raise Revert("Integer underflow")
+                if n1 is None:
+                    n1 = ns0
+                self.deposit_range(account, coll_amount, n1, n1 + ns1 - ns0)
+            elif debt_change >= 0 or coll_change != 0:
+                raise Revert("DFM:M Unhealthy loan, repay only")
+
+            self.loans[account] = (account_debt, rate_mul)
+            if debt_change < 0:
+                return self._decrease_total_debt(-debt_change, rate_mul)
+            return self._increase_total_debt(debt_change, rate_mul)
+
+    def close_loan(self, account):
+        """
+        `MarketOperator.close_loan`.
+        Returns (change in total debt, debt repaid, [x, y] withdrawn).
+        """
+        rate_mul = self.get_rate_mul()
+        account_debt = self.debt(account)
+        if account_debt == 0:
+            raise Revert("DFM:M Loan doesn't exist")
+
+        with self._atomic():
+            xy = self.withdraw(account, 10**18)
+            del self.loans[account]
+            debt_adjustment = self._decrease_total_debt(account_debt, rate_mul)
+            if not self.loans:
+                # the last loan zeroes the total debt to avoid rounding dust
+                debt_adjustment -= self.total[0]
+                self.total = (0, self.total[1])
+        return debt_adjustment, account_debt, xy
+
+    # --- band accounting ---
+
+    def deposit_range(self, account, amount, n1, n2):
+        """
+        `AMM.deposit_range`, including band shares.
+        """
+        amm = self.amm
+        n_bands = n2 - n1 + 1
+        if not n2 < 2**127 or not n1 > -(2**127) or n_bands > MAX_TICKS:
+            raise Revert()
+        y_per_band = amount * amm.COLLATERAL_PRECISION // n_bands
+        if y_per_band <= 100:
+            raise Revert("DFM:A Amount too low")
+        if account in self.user_shares:
+            raise Revert("DFM:A User must have no liquidity")
+
+        shares = []
+        for i in range(n_bands):
+            band = n1 + i
+            if amm.bands_x.get(band, 0) != 0:
+                raise Revert("DFM:A Band not empty")
+            y = y_per_band
+            if i == 0:
+                y = amount * amm.COLLATERAL_PRECISION - y * (n_bands - 1)
+            s = self.total_shares.get(band, 0)
+            ds = (s + DEAD_SHARES) * y // (amm.bands_y.get(band, 0) + 1)
+            if ds == 0:
+                raise Revert("DFM:A Amount too low")
+            if s + ds > 2**128 - 1:
+                raise Revert()
+            shares.append(ds)
+
+        with self._atomic():
+            amm.deposit_range(amount, n1, n2)
+            for band, ds in zip(range(n1, n2 + 1), shares):
+                self.total_shares[band] = self.total_shares.get(band, 0) + ds
+            self.user_shares[account] = (n1, n2, shares)
+
+    def withdraw(self, account, frac):
+        """
+        `AMM.withdraw`. Returns `[x, y]` withdrawn, in native token decimals.
+        """
+        if account not in self.user_shares:
+            raise Revert("DFM:A No deposits")
+        amm = self.amm
+        ns0, ns1, user_shares = self.user_shares[account]
+        user_shares = list(user_shares)
+
+        total_x = total_y = 0
+        min_band = amm.min_band
+        old_max_band = amm.max_band
+        max_band = ns0 - 1
+        for i, n in enumerate(range(ns0, ns1 + 1)):
+            x = amm.bands_x.get(n, 0)
+            y = amm.bands_y.get(n, 0)
+            ds = frac * user_shares[i] // 10**18
+            user_shares[i] -= ds
+            s = self.total_shares.get(n, 0)
+            new_shares = _sub(s, ds)
+            self.total_shares[n] = new_shares
+            s += DEAD_SHARES
+            dx = (x + 1) * ds // s
+            dy = (y + 1) * ds // s
+            x -= dx
+            y -= dy
+
+            if new_shares == 0:
+                # the last withdrawal from a band moves dust to admin fees
+                amm.admin_fees_x += x
+                amm.admin_fees_y += y // amm.COLLATERAL_PRECISION
+                x = y = 0
+
+            if n == min_band and x == 0 and y == 0:
+                min_band += 1
+            if x > 0 or y > 0:
+                max_band = n
+            self._write_band(n, x, y)
+            total_x += dx
+            total_y += dy
+
+        if frac == 10**18:
+            del self.user_shares[account]
+        else:
+            self.user_shares[account] = (ns0, ns1, user_shares)
+
+        amm.min_band = min_band
+        if old_max_band <= ns1:
+            amm.max_band = max_band
+
+        return [total_x, total_y // amm.COLLATERAL_PRECISION]
+
+    def _write_band(self, n, x, y):
+        for bands, value in ((self.amm.bands_x, x), (self.amm.bands_y, y)):
+            if value:
+                bands[n] = value
+            else:
+                bands.pop(n, None)
+
+    def active_band_with_skip(self):
+        amm = self.amm
+        n0 = n = amm.active_band
+        for i in range(MAX_SKIP_TICKS):
+            if n < amm.min_band:
+                return n0 - MAX_SKIP_TICKS
+            if amm.bands_x.get(n, 0) != 0:
+                break
+            n -= 1
+        return n
+
+    def read_user_tick_numbers(self, account):
+        n1, n2, _ = self.user_shares.get(account, (0, 0, None))
+        return [n1, n2]
+
+    def get_sum_xy(self, account):
+        """
+        `AMM.get_sum_xy`: amounts of `[stablecoin, collateral]` owned by `account`.
+        """
+        if account not in self.user_shares:
+            return [0, 0]
+        amm = self.amm
+        ns0, ns1, user_shares = self.user_shares[account]
+        x = y = 0
+        for n, ds in zip(range(ns0, ns1 + 1), user_shares):
+            total_shares = self.total_shares.get(n, 0) + DEAD_SHARES
+            x += (amm.bands_x.get(n, 0) + 1) * ds // total_shares
+            y += (amm.bands_y.get(n, 0) + 1) * ds // total_shares
+        return [x, y // amm.COLLATERAL_PRECISION]
+
+    @classmethod
+    def for_market(cls, A=100, base_price=3000 * 10**18, collateral_precision=1, timestamp=0, **kwargs):
+        """
+        Create a model for an empty market.
+        """
+        amm = LLAMMA(A, base_price, 0, collateral_precision=collateral_precision, timestamp=timestamp)
+        return cls(amm, **kwargs)
@@ -0,0 +1,861 @@
+"""
+Off-chain replica of the LLAMMA swap math in `contracts/cdp/AMM.vy`.
+
+All integer operations follow the semantics used by the contract: truncating
+(signed) division, wrapping `unsafe_*` / `shift` operations, and reverting
+checked subtractions. Given the same state, every method here returns exactly
+the same value as its on-chain counterpart. Conditions that would cause the
+contract to revert raise `Revert`.
+
+Token amounts follow the on-chain conventions: `bands_x` is denominated in the
+stablecoin (18 decimals) and `bands_y` in collateral scaled up to 18 decimals.
+Amounts passed to or returned from `get_dxdy`, `get_dydx`, `exchange` and
+`get_amount_for_price` use native token decimals.
+"""
+
+import copy
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from functools import lru_cache
+from math import isqrt
+
+import numpy as np
+
+
+MAX_TICKS = 50
+MAX_SKIP_TICKS = 1024
+DEAD_SHARES = 1000
+PREV_P_O_DELAY = 2 * 60
+MAX_P_O_CHG = 12500 * 10**14
+
+_UINT256 = 2**256
+
+
+class Revert(Exception):
+    pass
+
+
+@dataclass
+class DetailedTrade:
+    in_amount: int = 0
+    out_amount: int = 0
+    n1: int = 0
+    n2: int = 0
+    ticks_in: list = field(default_factory=list)
+    last_tick_j: int = 0
+    admin_fee: int = 0
+
+
+def _sub(a, b):
+    # checked uint256 subtraction
+    if b > a:
+        raise Revert("Integer underflow")
+    return a - b
+
+
+def _sdiv(a, b):
+    # EVM signed division, rounds toward zero
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+
+def _shift(x, bits):
+    if bits >= 0:
+        return (x << bits) % _UINT256
+    return x >> -bits
+
+
+@lru_cache(maxsize=None)
+def amm_constants(A):
+    """
+    Immutables computed in the `AMM` constructor for a given `A`.
+
+    Returns (SQRT_BAND_RATIO, LOG_A_RATIO, MAX_ORACLE_DN_POW)
+    """
+    sqrt_band_ratio = isqrt(10**36 * A // (A - 1))
+
+    x = 10**18 * A // (A - 1)
+    res = 0
+    for i in range(8):
+        t = 2 ** (7 - i)
+        p = 2**t
+        if x >= p * 10**18:
+            x //= p
+            res += t * 10**18
+    d = 10**18
+    for i in range(59):
+        if x >= 2 * 10**18:
+            res += d
+            x //= 2
+        x = x * x // 10**18
+        d //= 2
+    log_a_ratio = res * 10**18 // 1442695040888963328
+
+    pow_ = 10**18
+    for i in range(50):
+        pow_ = pow_ * A // (A - 1)
+
+    return sqrt_band_ratio, log_a_ratio, pow_
+
+
+@lru_cache(maxsize=65536)
+def exp_band(n, log_a_ratio):
+    """
+    `((A - 1) / A) ** n` as calculated within `AMM._p_oracle_up`, before
+    multiplying by the base price.
+    """
+    power = -n * log_a_ratio
+    if not -41446531673892821376 < power < 135305999368893231589:
+        raise Revert("Power out of range")
+
+    x = _sdiv(power * 2**96, 10**18)
+    k = _sdiv(_sdiv(x * 2**96, 54916777467707473351141471128) + 2**95, 2**96)
+    x = x - k * 54916777467707473351141471128
+
+    y = x + 1346386616545796478920950773328
+    y = _sdiv(y * x, 2**96) + 57155421227552351082224309758442
+    p = y + x - 94201549194550492254356042504812
+    p = _sdiv(p * y, 2**96) + 28719021644029726153956944680412240
+    p = p * x + (4385272521454847904659076985693276 * 2**96)
+
+    q = x - 2855989394907223263936484059900
+    q = _sdiv(q * x, 2**96) + 50020603652535783019961831881945
+    q = _sdiv(q * x, 2**96) - 533845033583426703283633433725380
+    q = _sdiv(q * x, 2**96) + 3604857256930695427073651918091429
+    q = _sdiv(q * x, 2**96) - 14423608567350463180887372962807573
+    q = _sdiv(q * x, 2**96) + 26449188498355588339934803723976023
+
+    pq = _sdiv(p, q)
+    if pq < 0:
+        raise Revert("Integer underflow")
+    result = _shift((pq * 3822833074963236453042738258902158003155416615667) % _UINT256, k - 195)
+    if result <= 1000:
+        raise Revert("Precision too low")
+    return result
+
+
+class LLAMMA:
+    """
+    In-memory LLAMMA state and swap math.
+
+    Only the state relevant to pricing and swaps is modelled: band balances,
+    the active band range, fees and the oracle price limiter. User shares and
+    token balances are not tracked.
+    """
+
+    def __init__(
+        self,
+        A,
+        base_price,
+        fee,
+        admin_fee=0,
+        collateral_precision=1,
+        oracle_price=None,
+        timestamp=0,
+    ):
+        self.A = A
+        self.Aminus1 = A - 1
+        self.A2 = A**2
+        self.Aminus12 = (A - 1) ** 2
+        self.SQRT_BAND_RATIO, self.LOG_A_RATIO, self.MAX_ORACLE_DN_POW = amm_constants(A)
+
+        self.BASE_PRICE = base_price
+        self.COLLATERAL_PRECISION = collateral_precision
+        self.rate_mul = 10**18
+
+        self.fee = fee
+        self.admin_fee = admin_fee
+        self.admin_fees_x = 0
+        self.admin_fees_y = 0
+
+        self.active_band = 0
+        self.min_band = 0
+        self.max_band = 0
+        self.bands_x = {}
+        self.bands_y = {}
+
+        self.timestamp = timestamp
+        self.prev_p_o_time = timestamp
+        self.old_p_o = base_price if oracle_price is None else oracle_price
+        self.old_dfee = 0
+
+    @classmethod
+    def from_contract(cls, amm, collateral_decimals=18, timestamp=0):
+        """
+        Create a simulator from the current state of a deployed `AMM`.
+
+        Works with both brownie and titanoboa contract objects. The oracle
+        limiter state is private within the contract, so the simulator starts
+        with it settled at the current `price_oracle`.
+        """
+        sim = cls(
+            amm.A(),
+            amm.get_base_price(),
+            amm.fee(),
+            amm.admin_fee(),
+            10 ** (18 - collateral_decimals),
+            amm.price_oracle(),
+            timestamp,
+        )
+        sim.prev_p_o_time = timestamp - PREV_P_O_DELAY
+        sim.active_band = amm.active_band()
+        sim.min_band = amm.min_band()
+        sim.max_band = amm.max_band()
+        for n in range(sim.min_band, sim.max_band + 1):
+            x, y = amm.bands_x(n), amm.bands_y(n)
+            if x:
+                sim.bands_x[n] = x
+            if y:
+                sim.bands_y[n] = y
+        return sim
+
+    def copy(self):
+        return copy.deepcopy(self)
+
+    # --- prices ---
+
+    @property
+    def base_price(self):
+        return self.BASE_PRICE * self.rate_mul // 10**18
+
+    def p_oracle_up(self, n):
+        """
+        Upper oracle price of band `n`. Accepts a single band or an array of
+        bands, in which case an array of python ints is returned.
+        """
+        if isinstance(n, (int, np.integer)):
+            return self.base_price * exp_band(int(n), self.LOG_A_RATIO) // 10**18
+        return self._p_oracle_up_vec(np.asarray(n, dtype=object))
+
+    def p_oracle_down(self, n):
+        return self.p_oracle_up(n + 1)
+
+    def band_prices(self, n1=None, n2=None):
+        """
+        Upper and lower oracle prices for every band in `[n1, n2]`
+        (default: every band with liquidity).
+
+        Returns (bands, p_oracle_up, p_oracle_down) as numpy arrays.
+        """
+        n1 = self.min_band if n1 is None else n1
+        n2 = self.max_band if n2 is None else n2
+        bands = np.arange(n1, n2 + 2, dtype=object)
+        prices = self.p_oracle_up(bands)
+        return bands[:-1].astype(np.int64), prices[:-1], prices[1:]
+
+    def _p_oracle_up_vec(self, bands):
+        base_price = self.base_price
+        log_a_ratio = self.LOG_A_RATIO
+        f = np.frompyfunc(lambda n: base_price * exp_band(int(n), log_a_ratio) // 10**18, 1, 1)
+        return f(bands)
+
+    def limit_p_o(self, p):
+        """
+        Limited oracle price and dynamic fee, as `AMM.limit_p_o`.
+        """
+        p_new = p
+        dt = PREV_P_O_DELAY - min(PREV_P_O_DELAY, _sub(self.timestamp, self.prev_p_o_time))
+        ratio = 0
+
+        if dt > 0:
+            old_p_o = self.old_p_o
+            old_ratio = self.old_dfee
+            if p > old_p_o:
+                ratio = old_p_o * 10**18 // p
+                if ratio < 10**36 // MAX_P_O_CHG:
+                    p_new = old_p_o * MAX_P_O_CHG // 10**18
+                    ratio = 10**36 // MAX_P_O_CHG
+            else:
+                ratio = p * 10**18 // old_p_o
+                if ratio < 10**36 // MAX_P_O_CHG:
+                    p_new = old_p_o * 10**18 // MAX_P_O_CHG
+                    ratio = 10**36 // MAX_P_O_CHG
+
+            ratio = min((10**18 + old_ratio - ratio**3 // 10**36) * dt // PREV_P_O_DELAY, 10**18 - 1)
+
+        return [p_new, ratio]
+
+    def price_oracle_w(self, p):
+        """
+        Apply the oracle price `p` at the current timestamp, as
+        `AMM._price_oracle_w`. Returns `[price_oracle, dynamic_fee]`.
+        """
+        p_o = self.limit_p_o(p)
+        self.prev_p_o_time = self.timestamp
+        self.old_p_o, self.old_dfee = p_o
+        return p_o
+
+    def get_dynamic_fee(self, p_o, p_o_up):
+        p_c_d = (p_o**2 // p_o_up) * p_o // p_o_up
+        p_c_u = (p_c_d * self.A // self.Aminus1) * self.A // self.Aminus1
+        if p_o < p_c_d:
+            return (p_c_d - p_o) * (10**18 // 4) // p_c_d
+        if p_o > p_c_u:
+            return (p_o - p_c_u) * (10**18 // 4) // p_o
+        return 0
+
+    def get_y0(self, x, y, p_o, p_o_up):
+        if p_o == 0:
+            raise Revert()
+        A = self.A
+        b = 0
+        if x != 0:
+            b = p_o_up * self.Aminus1 * x // p_o
+        if y != 0:
+            b += A * p_o**2 // p_o_up * y // 10**18
+        if x > 0 and y > 0:
+            D = b**2 + ((4 * A) * p_o) * y // 10**18 * x
+            return (b + isqrt(D)) * 10**18 // (2 * A * p_o)
+
+        return b * 10**18 // (A * p_o)
+
+    def get_p(self, p_o, n=None):
+        """
+        Current AMM price in band `n` (default: the active band), as `AMM._get_p`.
+        """
+        n = self.active_band if n is None else n
+        x, y = self.bands_x.get(n, 0), self.bands_y.get(n, 0)
+        A, Aminus1 = self.A, self.Aminus1
+        p_o_up = self.p_oracle_up(n)
+        if p_o_up == 0:
+            raise Revert()
+
+        if x == 0:
+            if y == 0:
+                return ((p_o**2 // p_o_up) * p_o // p_o_up) * A // Aminus1
+            return (p_o**2 // p_o_up) * p_o // p_o_up
+        if y == 0:
+            p_o_up = p_o_up * Aminus1 // A
+            return p_o**2 // p_o_up * p_o // p_o_up
+
+        y0 = self.get_y0(x, y, p_o, p_o_up)
+        f = A * y0 * p_o // p_o_up * p_o
+        g = Aminus1 * y0 * p_o_up // p_o
+        return (f + x * 10**18) // (g + y)
+
+    # --- swap math ---
+
+    def _band_invariant(self, x, y, p_o, p_o_up, fee):
+        y0 = self.get_y0(x, y, p_o, p_o_up)
+        f = self.A * y0 * p_o // p_o_up * p_o // 10**18
+        g = self.Aminus1 * y0 * p_o_up // p_o
+        Inv = (f + x) * (g + y)
+        dynamic_fee = max(self.get_dynamic_fee(p_o, p_o_up), fee)
+        return f, g, Inv, dynamic_fee
+
+    def calc_swap_out(self, pump, in_amount, p_o, in_precision, out_precision):
+        """
+        Port of `AMM.calc_swap_out`. `in_amount` is given with 18 decimals.
+        """
+        A, Aminus1 = self.A, self.Aminus1
+        out = DetailedTrade(n2=self.active_band)
+        p_o_up = self.p_oracle_up(out.n2)
+        x = self.bands_x.get(out.n2, 0)
+        y = self.bands_y.get(out.n2, 0)
+
+        in_amount_left = in_amount
+        fee = max(self.fee, p_o[1])
+        admin_fee = self.admin_fee
+        j = MAX_TICKS
+
+        for i in range(MAX_TICKS + MAX_SKIP_TICKS):
+            f = g = Inv = 0
+            dynamic_fee = fee
+
+            if x > 0 or y > 0:
+                if j == MAX_TICKS:
+                    out.n1 = out.n2
+                    j = 0
+                f, g, Inv, dynamic_fee = self._band_invariant(x, y, p_o[0], p_o_up, fee)
+
+            antifee = 10**36 // (10**18 - min(dynamic_fee, 10**18 - 1))
+
+            if j != MAX_TICKS:
+                out.ticks_in.append(x if pump else y)
+
+            p_ratio = p_o_up * 10**18 // p_o[0]
+
+            if pump:
+                if y != 0 and g != 0:
+                    x_dest = _sub(Inv // g - f, x)
+                    dx = x_dest * antifee // 10**18
+                    if dx >= in_amount_left:
+                        x_dest = in_amount_left * 10**18 // antifee
+                        out.last_tick_j = min(_sub(Inv // (f + (x + x_dest)), g) + 1, y)
+                        x_dest = (in_amount_left - x_dest) * admin_fee // 10**18
+                        x += in_amount_left
+                        out.out_amount += _sub(y, out.last_tick_j)
+                        out.ticks_in[j] = _sub(x, x_dest)
+                        out.in_amount = in_amount
+                        out.admin_fee += x_dest
+                        break
+
+                    dx = max(dx, 1)
+                    x_dest = (dx - x_dest) * admin_fee // 10**18
+                    in_amount_left = _sub(in_amount_left, dx)
+                    out.ticks_in[j] = _sub(x + dx, x_dest)
+                    out.in_amount += dx
+                    out.out_amount += y
+                    out.admin_fee += x_dest
+
+                if i != MAX_TICKS + MAX_SKIP_TICKS - 1:
+                    if out.n2 == self.max_band:
+                        break
+                    if j == MAX_TICKS - 1:
+                        break
+                    if p_ratio < 10**36 // self.MAX_ORACLE_DN_POW:
+                        break
+                    out.n2 += 1
+                    p_o_up = p_o_up * Aminus1 // A
+                    x = 0
+                    y = self.bands_y.get(out.n2, 0)
+
+            else:
+                if x != 0 and f != 0:
+                    y_dest = _sub(Inv // f - g, y)
+                    dy = y_dest * antifee // 10**18
+                    if dy >= in_amount_left:
+                        y_dest = in_amount_left * 10**18 // antifee
+                        out.last_tick_j = min(_sub(Inv // (g + (y + y_dest)), f) + 1, x)
+                        y_dest = (in_amount_left - y_dest) * admin_fee // 10**18
+                        y += in_amount_left
+                        out.out_amount += _sub(x, out.last_tick_j)
+                        out.ticks_in[j] = _sub(y, y_dest)
+                        out.in_amount = in_amount
+                        out.admin_fee += y_dest
+                        break
+
+                    dy = max(dy, 1)
+                    y_dest = (dy - y_dest) * admin_fee // 10**18
+                    in_amount_left = _sub(in_amount_left, dy)
+                    out.ticks_in[j] = _sub(y + dy, y_dest)
+                    out.in_amount += dy
+                    out.out_amount += x
+                    out.admin_fee += y_dest
+
+                if i != MAX_TICKS + MAX_SKIP_TICKS - 1:
+                    if out.n2 == self.min_band:
+                        break
+                    if j == MAX_TICKS - 1:
+                        break
+                    if p_ratio > self.MAX_ORACLE_DN_POW:
+                        break
+                    out.n2 -= 1
+                    p_o_up = p_o_up * A // Aminus1
+                    x = self.bands_x.get(out.n2, 0)
+                    y = 0
+
+            if j != MAX_TICKS:
+                j += 1
+
+        out.in_amount = (out.in_amount + in_precision - 1) // in_precision * in_precision
+        out.out_amount = out.out_amount // out_precision * out_precision
+        return out
+
+    def calc_swap_in(self, pump, out_amount, p_o, in_precision, out_precision):
+        """
+        Port of `AMM.calc_swap_in`. `out_amount` is given with 18 decimals.
+        """
+        A, Aminus1 = self.A, self.Aminus1
+        out = DetailedTrade(n2=self.active_band)
+        p_o_up = self.p_oracle_up(out.n2)
+        x = self.bands_x.get(out.n2, 0)
+        y = self.bands_y.get(out.n2, 0)
+
+        out_amount_left = out_amount
+        fee = max(self.fee, p_o[1])
+        admin_fee = self.admin_fee
+        j = MAX_TICKS
+
+        for i in range(MAX_TICKS + MAX_SKIP_TICKS):
+            f = g = Inv = 0
+            dynamic_fee = fee
+
+            if x > 0 or y > 0:
+                if j == MAX_TICKS:
+                    out.n1 = out.n2
+                    j = 0
+                f, g, Inv, dynamic_fee = self._band_invariant(x, y, p_o[0], p_o_up, fee)
+
+            antifee = 10**36 // (10**18 - min(dynamic_fee, 10**18 - 1))
+
+            if j != MAX_TICKS:
+                out.ticks_in.append(x if pump else y)
+
+            p_ratio = p_o_up * 10**18 // p_o[0]
+
+            if pump:
+                if y != 0 and g != 0:
+                    if y >= out_amount_left:
+                        out.last_tick_j = y - out_amount_left
+                        x_dest = _sub(_sub(Inv // (g + out.last_tick_j), f), x)
+                        dx = x_dest * antifee // 10**18
+                        out.out_amount = out_amount
+                        out.in_amount += dx
+                        x_dest = (dx - x_dest) * admin_fee // 10**18
+                        out.ticks_in[j] = _sub(x + dx, x_dest)
+                        out.admin_fee += x_dest
+                        break
+
+                    x_dest = _sub(Inv // g - f, x)
+                    dx = max(x_dest * antifee // 10**18, 1)
+                    out_amount_left -= y
+                    out.in_amount += dx
+                    out.out_amount += y
+                    x_dest = (dx - x_dest) * admin_fee // 10**18
+                    out.ticks_in[j] = _sub(x + dx, x_dest)
+                    out.admin_fee += x_dest
+
+                if i != MAX_TICKS + MAX_SKIP_TICKS - 1:
+                    if out.n2 == self.max_band:
+                        break
+                    if j == MAX_TICKS - 1:
+                        break
+                    if p_ratio < 10**36 // self.MAX_ORACLE_DN_POW:
+                        break
+                    out.n2 += 1
+                    p_o_up = p_o_up * Aminus1 // A
+                    x = 0
+                    y = self.bands_y.get(out.n2, 0)
+
+            else:
+                if x != 0 and f != 0:
+                    if x >= out_amount_left:
+                        out.last_tick_j = x - out_amount_left
+                        y_dest = _sub(_sub(Inv // (f + out.last_tick_j), g), y)
+                        dy = y_dest * antifee // 10**18
+                        out.out_amount = out_amount
+                        out.in_amount += dy
+                        y_dest = (dy - y_dest) * admin_fee // 10**18
+                        out.ticks_in[j] = _sub(y + dy, y_dest)
+                        out.admin_fee += y_dest
+                        break
+
+                    y_dest = _sub(Inv // f - g, y)
+                    dy = max(y_dest * antifee // 10**18, 1)
+                    out_amount_left -= x
+                    out.in_amount += dy
+                    out.out_amount += x
+                    y_dest = (dy - y_dest) * admin_fee // 10**18
+                    out.ticks_in[j] = _sub(y + dy, y_dest)
+                    out.admin_fee += y_dest
+
+                if i != MAX_TICKS + MAX_SKIP_TICKS - 1:
+                    if out.n2 == self.min_band:
+                        break
+                    if j == MAX_TICKS - 1:
+                        break
+                    if p_ratio > self.MAX_ORACLE_DN_POW:
+                        break
+                    out.n2 -= 1
+                    p_o_up = p_o_up * A // Aminus1
+                    x = self.bands_x.get(out.n2, 0)
+                    y = 0
+
+            if j != MAX_TICKS:
+                j += 1
+
+        out.in_amount = (out.in_amount + in_precision - 1) // in_precision * in_precision
+        out.out_amount = out.out_amount // out_precision * out_precision
+        return out
+
+    def _precisions(self, i):
+        if i == 0:
+            return 1, self.COLLATERAL_PRECISION
+        return self.COLLATERAL_PRECISION, 1
+
+    def _get_dxdy(self, i, j, amount, is_in, p_o):
+        if (i, j) not in ((0, 1), (1, 0)):
+            raise Revert("DFM:A Invalid coin index")
+        out = DetailedTrade()
+        if amount != 0:
+            in_precision, out_precision = self._precisions(i)
+            if is_in:
+                out = self.calc_swap_out(i == 0, amount * in_precision, p_o, in_precision, out_precision)
+            else:
+                out = self.calc_swap_in(i == 0, amount * out_precision, p_o, in_precision, out_precision)
+            out.in_amount //= in_precision
+            out.out_amount //= out_precision
+        return out
+
+    def get_dxdy(self, i, j, in_amount, p_o):
+        out = self._get_dxdy(i, j, in_amount, True, p_o)
+        return out.in_amount, out.out_amount
+
+    def get_dydx(self, i, j, out_amount, p_o):
+        out = self._get_dxdy(i, j, out_amount, False, p_o)
+        return out.out_amount, out.in_amount
+
+    def get_amount_for_price(self, p, p_o):
+        """
+        Port of `AMM.get_amount_for_price`. Returns (amount, is_pump).
+        """
+        A, Aminus1 = self.A, self.Aminus1
+        n = self.active_band
+        p_o_up = self.p_oracle_up(n)
+        p_down = (p_o[0] ** 2 // p_o_up) * p_o[0] // p_o_up
+        p_up = p_down * self.A2 // self.Aminus12
+        amount = 0
+        f = g = Inv = 0
+        j = MAX_TICKS
+        pump = True
+
+        fee = max(self.fee, p_o[1])
+
+        for i in range(MAX_TICKS + MAX_SKIP_TICKS):
+            if p_o_up == 0:
+                raise Revert()
+            x = self.bands_x.get(n, 0)
+            y = self.bands_y.get(n, 0)
+            if i == 0 and p < self.get_p(p_o[0], n):
+                pump = False
+            dynamic_fee = fee
+            not_empty = x > 0 or y > 0
+
+            if not_empty:
+                y0 = self.get_y0(x, y, p_o[0], p_o_up)
+                f = (A * y0 * p_o[0] // p_o_up) * p_o[0] // 10**18
+                g = Aminus1 * y0 * p_o_up // p_o[0]
+                Inv = (f + x) * (g + y)
+                if j == MAX_TICKS:
+                    j = 0
+                dynamic_fee = max(self.get_dynamic_fee(p_o[0], p_o_up), fee)
+
+            antifee = 10**36 // (10**18 - min(dynamic_fee, 10**18 - 1))
+
+            if p_down <= p <= p_up:
+                if not_empty:
+                    ynew = max(isqrt(Inv * 10**18 // p), g) - g
+                    xnew = max(Inv // (g + ynew), f) - f
+                    if pump:
+                        amount += (max(xnew, x) - x) * antifee // 10**18
+                    else:
+                        amount += (max(ynew, y) - y) * antifee // 10**18
+                break
+
+            p_ratio = p_o_up * 10**18 // p_o[0]
+
+            if pump:
+                if not_empty:
+                    amount += _sub(Inv // g - f, x) * antifee // 10**18
+                if n == self.max_band:
+                    break
+                if j == MAX_TICKS - 1:
+                    break
+                if p_ratio < 10**36 // self.MAX_ORACLE_DN_POW:
+                    break
+                n += 1
+                p_down = p_up
+                p_up = p_up * self.A2 // self.Aminus12
+                p_o_up = p_o_up * Aminus1 // A
+
+            else:
+                if not_empty:
+                    amount += _sub(Inv // f - g, y) * antifee // 10**18
+                if n == self.min_band:
+                    break
+                if j == MAX_TICKS - 1:
+                    break
+                if p_ratio > self.MAX_ORACLE_DN_POW:
+                    break
+                n -= 1
+                p_up = p_down
+                p_down = p_down * self.Aminus12 // self.A2
+                p_o_up = p_o_up * A // Aminus1
+
+            if j != MAX_TICKS:
+                j += 1
+
+        if amount == 0:
+            return 0, pump
+
+        if not pump:
+            amount = (amount - 1) // self.COLLATERAL_PRECISION + 1
+
+        return amount, pump
+
+    # --- state changes ---
+
+    def deposit_range(self, amount, n1, n2):
+        """
+        Deposit collateral evenly into bands `[n1, n2]`, as `AMM.deposit_range`.
+        Shares are not tracked.
+        """
+        n_bands = n2 - n1 + 1
+        if not n2 < 2**127 or not n1 > -(2**127) or n_bands > MAX_TICKS:
+            raise Revert()
+        y_per_band = amount * self.COLLATERAL_PRECISION // n_bands
+        if y_per_band <= 100:
+            raise Revert("DFM:A Amount too low")
+
+        n0 = self.active_band
+        for i in range(MAX_SKIP_TICKS + 1):
+            if n1 > n0:
+                if i != 0:
+                    self.active_band = n0
+                break
+            if self.bands_x.get(n0, 0) != 0 or i >= MAX_SKIP_TICKS:
+                raise Revert("DFM:A Deposit below current band")
+            n0 -= 1
+
+        for i in range(n_bands):
+            band = n1 + i
+            if self.bands_x.get(band, 0) != 0:
+                raise Revert("DFM:A Band not empty")
+            y = y_per_band
+            if i == 0:
+                y = amount * self.COLLATERAL_PRECISION - y * (n_bands - 1)
+            self.bands_y[band] = self.bands_y.get(band, 0) + y
+
+        self.min_band = min(self.min_band, n1)
+        self.max_band = max(self.max_band, n2)
+
+    def exchange(self, i, j, amount, p_o, minmax_amount=0, use_in_amount=True):
+        """
+        Port of `AMM._exchange`, applying the trade to the band state.
+
+        `p_o` should be the result of `price_oracle_w` for the current price.
+        Returns `[in_amount, out_amount]`.
+        """
+        if (i, j) not in ((0, 1), (1, 0)):
+            raise Revert("DFM:A Invalid coin index")
+        if amount == 0:
+            return [0, 0]
+
+        in_precision, out_precision = self._precisions(i)
+        if use_in_amount:
+            out = self.calc_swap_out(i == 0, amount * in_precision, p_o, in_precision, out_precision)
+        else:
+            amount_to_swap = _UINT256 - 1
+            if amount < amount_to_swap:
+                amount_to_swap = amount * out_precision
+            out = self.calc_swap_in(i == 0, amount_to_swap, p_o, in_precision, out_precision)
+        in_amount_done = out.in_amount // in_precision
+        out_amount_done = out.out_amount // out_precision
+        if use_in_amount:
+            if out_amount_done < minmax_amount:
+                raise Revert("DFM:A Slippage")
+        elif in_amount_done > minmax_amount or (
+            out_amount_done != amount and amount != _UINT256 - 1
+        ):
+            raise Revert("DFM:A Slippage")
+        if out_amount_done == 0 or in_amount_done == 0:
+            return [0, 0]
+
+        if i == 0:
+            self.admin_fees_x += out.admin_fee // in_precision
+        else:
+            self.admin_fees_y += out.admin_fee // in_precision
+
+        n = min(out.n1, out.n2)
+        n_diff = abs(out.n2 - out.n1)
+        for k in range(n_diff + 1):
+            x = y = 0
+            if i == 0:
+                x = out.ticks_in[k]
+                if n == out.n2:
+                    y = out.last_tick_j
+            else:
+                y = out.ticks_in[n_diff - k]
+                if n == out.n2:
+                    x = out.last_tick_j
+            self.bands_x[n] = x
+            self.bands_y[n] = y
+            n += 1
+
+        self.active_band = out.n2
+        return [in_amount_done, out_amount_done]
+
+    def arbitrage(self, price):
+        """
+        Apply oracle price `price` at the current timestamp and trade the AMM
+        to the same price, as an external arbitrageur would.
+
+        Returns `[in_amount, out_amount, is_pump]`.
+        """
+        p_o = self.price_oracle_w(price)
+        amount, pump = self.get_amount_for_price(price, p_o)
+        i = 0 if pump else 1
+        return self.exchange(i, 1 - i, amount, p_o) + [pump]
+
+    def totals(self):
+        """
+        Total stablecoin and collateral held in the bands (18 decimal precision).
+        """
+        return sum(self.bands_x.values()), sum(self.bands_y.values())
+
+
+@dataclass
+class PathResults:
+    """
+    Per-step results of `simulate_paths`. Every array has the shape
+    `(num_paths, num_steps)`. Token amounts are numpy arrays of python ints.
+    """
+
+    active_band: np.ndarray
+    price: np.ndarray
+    x: np.ndarray
+    y: np.ndarray
+    admin_fees_x: np.ndarray
+    admin_fees_y: np.ndarray
+
+
+def _simulate_path(amm, prices, interval):
+    sim = amm.copy()
+    steps = len(prices)
+    result = np.empty((6, steps), dtype=object)
+    for k, price in enumerate(prices):
+        sim.timestamp += interval
+        sim.arbitrage(int(price))
+        x, y = sim.totals()
+        result[:, k] = (
+            sim.active_band,
+            sim.get_p(sim.old_p_o),
+            x,
+            y,
+            sim.admin_fees_x,
+            sim.admin_fees_y,
+        )
+    return result
+
+
+def _simulate_chunk(args):
+    amm, paths, interval = args
+    return [_simulate_path(amm, prices, interval) for prices in paths]
+
+
+def simulate_paths(amm, paths, interval=PREV_P_O_DELAY, processes=None):
+    """
+    Replay many oracle price paths against the same starting AMM state.
+
+    At each step the oracle price is updated and the AMM is arbitraged to that
+    price. The starting state is left unmodified.
+
+    @param amm `LLAMMA` instance holding the starting state
+    @param paths Array-like of shape (num_paths, num_steps) holding oracle
+                 prices with 18 decimals
+    @param interval Seconds between each step
+    @param processes If given, split the paths across this many processes
+    @return PathResults
+    """
+    paths = np.asarray(paths, dtype=object)
+    if paths.ndim == 1:
+        paths = paths[None, :]
+
+    if processes and processes > 1 and len(paths) > 1:
+        chunks = np.array_split(paths, processes)
+        with ProcessPoolExecutor(processes) as executor:
+            results = executor.map(_simulate_chunk, [(amm, i, interval) for i in chunks])
+            results = [path for chunk in results for path in chunk]
+    else:
+        results = _simulate_chunk((amm, paths, interval))
+
+    stacked = np.stack(results, axis=1)
+    return PathResults(
+        active_band=stacked[0].astype(np.int64),
+        price=stacked[1],
+        x=stacked[2],
+        y=stacked[3],
+        admin_fees_x=stacked[4],
+        admin_fees_y=stacked[5],
+    )
@@ -0,0 +1,396 @@
+"""
+Titanoboa load generator for `MainController`.
+
+Deploys the CDP stack in the same way as `tests/titanoboa/conftest.py` and drives
+many accounts through `create_loan`, `adjust_loan`, `close_loan` and `liquidate`
+along an oracle price path. After every price move the AMM is arbitraged to the
+new oracle price with `exchange`, as an external arbitrageur would.
+
+The price path is either generated (geometric brownian motion) or replayed from a
+file, so recorded mainnet prices can be run against the current contracts. With
+`--fork-url` the stack is deployed on top of a forked chain instead of an empty one.
+
+At the end a report is printed with the achieved tx/s, gas percentiles per
+operation, the number of reverted calls and how the market state grew.
+
+Usage:
+    python -m scripts.simulation.load --accounts 2000 --steps 500
+    python -m scripts.simulation.load --prices prices.csv --interval 600 --json report.json
+"""
+
+import argparse
+import json
+import random
+import time
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+
+import boa
+import numpy as np
+from boa.vyper.contract import BoaError
+
+
+OPERATIONS = ("create_loan", "adjust_loan", "close_loan")
+PERCENTILES = (50, 90, 99)
+
+
+@dataclass
+class LoadConfig:
+    num_accounts: int = 1000
+    num_steps: int = 200
+    ops_per_step: int = 20
+    interval: int = 600  # seconds between price steps
+    start_price: int = 3000
+    volatility: float = 0.8  # annualized, for generated price paths
+    seed: int = 0
+    A: int = 100
+    collateral_decimals: int = 18
+    debt_ceiling: int = 10**12 * 10**18
+    min_bands: int = 4
+    max_bands: int = 50
+    coll_range: tuple = (1, 50)  # collateral per loan, in whole tokens
+    max_ltv: float = 0.9  # fraction of `max_borrowable` taken when creating a loan
+    op_weights: dict = field(
+        default_factory=lambda: {"create_loan": 5, "adjust_loan": 3, "close_loan": 2}
+    )
+    max_liquidations: int = 50  # per step
+    prices: list = None  # replayed price path, overrides the generated one
+    fork_url: str = None
+
+
+def generate_price_path(config):
+    """
+    Geometric brownian motion price path with 18 decimals, one price per step.
+    """
+    rng = np.random.default_rng(config.seed)
+    dt = config.interval / (365 * 86400)
+    returns = rng.normal(-0.5 * config.volatility**2 * dt, config.volatility * dt**0.5, config.num_steps)
+    path = config.start_price * np.exp(np.cumsum(returns))
+    return [int(p * 10**18) for p in path]
+
+
+def load_price_path(path):
+    """
+    Load a recorded price path. Accepts a JSON list or a file with one price per
+    line (CSV files use the last column). Prices are given as decimal numbers.
+    """
+    path = Path(path)
+    text = path.read_text()
+    if path.suffix == ".json":
+        values = json.loads(text)
+    else:
+        values = [i.split(",")[-1] for i in text.splitlines() if i.strip()]
+        # skip a header row, if present
+        try:
+            float(values[0])
+        except ValueError:
+            values = values[1:]
+    return [int(float(i) * 10**18) for i in values]
+
+
+def deploy(config):
+    """
+    Deploy the stack used by the load test.
+
+    Returns a dict of `admin`, `core`, `stablecoin`, `collateral`, `oracle`,
+    `policy`, `controller`, `market` and `amm` contracts.
+    """
+    admin = boa.env.generate_address()
+    fee_receiver = boa.env.generate_address()
+    price = config.prices[0] if config.prices else config.start_price * 10**18
+
+    with boa.env.prank(admin):
+        core = boa.load("contracts/testing/CoreOwnerMock.vy", admin, fee_receiver)
+        stablecoin = boa.load("contracts/testing/ERC20Mock.vy", "Stablecoin", "STB", 18)
+        collateral = boa.load(
+            "contracts/testing/ERC20Mock.vy", "Collateral", "COLL", config.collateral_decimals
+        )
+        oracle = boa.load("contracts/testing/PriceOracleMock.vy", price)
+        policy = boa.load("contracts/testing/ConstantMonetaryPolicy.vy", admin)
+        policy.set_rate(int(1e18 * 0.1 / 365 / 86400))
+
+        controller = boa.load(
+            "contracts/cdp/MainController.vy", core, stablecoin, [policy.address], 2**256 - 1
+        )
+        stablecoin.setMinter(controller, True)
+        operator_impl = boa.load("contracts/cdp/MarketOperator.vy", core, controller, config.A)
+        amm_impl = boa.load("contracts/cdp/AMM.vy", controller, stablecoin, config.A)
+        controller.set_implementations(config.A, operator_impl, amm_impl)
+        controller.add_market(
+            collateral, config.A, 10**16, 0, oracle, 0, 5 * 10**16, 2 * 10**16, config.debt_ceiling
+        )
+
+    market = boa.load_partial("contracts/cdp/MarketOperator.vy").at(controller.get_market(collateral))
+    amm = boa.load_partial("contracts/cdp/AMM.vy").at(controller.get_amm(collateral))
+
+    return {
+        "admin": admin,
+        "core": core,
+        "stablecoin": stablecoin,
+        "collateral": collateral,
+        "oracle": oracle,
+        "policy": policy,
+        "controller": controller,
+        "market": market,
+        "amm": amm,
+    }
+
+
+def _gas_used(contract):
+    # gas used by the last call to `contract`, with the EIP-3529 refund cap applied
+    computation = contract._computation
+    used = computation.get_gas_used()
+    return used - min(computation.get_gas_refund(), used // 5)
+
+
+class LoadGenerator:
+    def __init__(self, config, contracts):
+        self.config = config
+        self.c = contracts
+        self.rng = random.Random(config.seed)
+        self.accounts = [boa.env.generate_address() for _ in range(config.num_accounts)]
+        self.borrowers = set()
+        self.arbitrageur = boa.env.generate_address()
+        self.liquidator = boa.env.generate_address()
+        self.gas = defaultdict(list)
+        self.reverts = defaultdict(int)
+        self.state = []
+
+        stablecoin, collateral = self.c["stablecoin"], self.c["collateral"]
+        for acct in self.accounts + [self.arbitrageur, self.liquidator]:
+            with boa.env.prank(acct):
+                for token in (stablecoin, collateral):
+                    token.approve(self.c["controller"], 2**256 - 1)
+                    token.approve(self.c["amm"], 2**256 - 1)
+
+    def _call(self, name, contract, fn, *args, sender):
+        try:
+            with boa.env.prank(sender):
+                result = fn(*args)
+        except BoaError:
+            self.reverts[name] += 1
+            return None
+        self.gas[name].append(_gas_used(contract))
+        return result
+
+    # --- loan operations ---
+
+    def create_loan(self):
+        idle = [i for i in self.accounts if i not in self.borrowers]
+        if not idle:
+            return
+        acct = self.rng.choice(idle)
+        precision = 10**self.config.collateral_decimals
+        coll = self.rng.randint(*self.config.coll_range) * precision
+        n_bands = self.rng.randint(self.config.min_bands, self.config.max_bands)
+        debt = int(self.c["market"].max_borrowable(coll, n_bands) * self.rng.uniform(0.1, self.config.max_ltv))
+        if debt == 0:
+            return
+
+        self.c["collateral"]._mint_for_testing(acct, coll)
+        controller = self.c["controller"]
+        args = (acct, self.c["market"], coll, debt, n_bands)
+        if self._call("create_loan", controller, controller.create_loan, *args, sender=acct) is not None:
+            self.borrowers.add(acct)
+
+    def adjust_loan(self):
+        if not self.borrowers:
+            return
+        acct = self.rng.choice(sorted(self.borrowers))
+        market = self.c["market"]
+        controller = self.c["controller"]
+        action = self.rng.choice(("add_coll", "repay", "borrow"))
+
+        coll_change = debt_change = 0
+        if action == "add_coll":
+            coll_change = self.rng.randint(*self.config.coll_range) * 10**self.config.collateral_decimals
+            self.c["collateral"]._mint_for_testing(acct, coll_change)
+        elif action == "repay":
+            debt_change = -int(market.debt(acct) * self.rng.uniform(0.05, 0.5))
+        else:
+            debt_change = int(market.debt(acct) * self.rng.uniform(0.01, 0.1))
+        if coll_change == debt_change == 0:
+            return
+
+        args = (acct, market, coll_change, debt_change)
+        self._call("adjust_loan", controller, controller.adjust_loan, *args, sender=acct)
+
+    def close_loan(self):
+        if not self.borrowers:
+            return
+        acct = self.rng.choice(sorted(self.borrowers))
+        stablecoin = self.c["stablecoin"]
+        # interest accrues, so the borrower may not hold enough to repay
+        shortfall = self.c["market"].debt(acct) - stablecoin.balanceOf(acct)
+        if shortfall > 0:
+            stablecoin._mint_for_testing(acct, shortfall)
+
+        controller = self.c["controller"]
+        args = (acct, self.c["market"])
+        if self._call("close_loan", controller, controller.close_loan, *args, sender=acct) is not None:
+            self.borrowers.discard(acct)
+
+    def liquidate(self):
+        market = self.c["market"]
+        controller = self.c["controller"]
+        stablecoin = self.c["stablecoin"]
+        for position in market.users_to_liquidate(0, self.config.max_liquidations):
+            acct = position[0]
+            stablecoin._mint_for_testing(self.liquidator, position[3])
+            args = (market, acct, 0)
+            if self._call("liquidate", controller, controller.liquidate, *args, sender=self.liquidator) is not None:
+                if market.debt(acct) == 0:
+                    self.borrowers.discard(acct)
+
+    # --- price moves ---
+
+    def arbitrage(self, price):
+        amm = self.c["amm"]
+        amount, pump = amm.get_amount_for_price(price)
+        if amount == 0:
+            return
+        if pump:
+            self.c["stablecoin"]._mint_for_testing(self.arbitrageur, amount)
+            i, j = 0, 1
+        else:
+            self.c["collateral"]._mint_for_testing(self.arbitrageur, amount)
+            i, j = 1, 0
+        self._call("exchange", amm, amm.exchange, i, j, amount, 0, sender=self.arbitrageur)
+
+    def record_state(self, step, price):
+        amm = self.c["amm"]
+        min_band, max_band = amm.min_band(), amm.max_band()
+        occupied = 0
+        if self.borrowers:
+            for word in range(min_band >> 8, (max_band >> 8) + 1):
+                occupied += bin(amm.band_bitmap(word)).count("1")
+        self.state.append(
+            {
+                "step": step,
+                "price": price,
+                "n_loans": self.c["market"].n_loans(),
+                "total_debt": self.c["controller"].total_debt(),
+                "band_span": max_band - min_band + 1 if self.borrowers else 0,
+                "occupied_bands": occupied,
+            }
+        )
+
+    def run(self, prices):
+        ops = list(self.config.op_weights)
+        weights = [self.config.op_weights[i] for i in ops]
+        start = time.perf_counter()
+        for step, price in enumerate(prices):
+            boa.env.time_travel(self.config.interval)
+            with boa.env.prank(self.c["admin"]):
+                self.c["oracle"].set_price(price)
+            self.arbitrage(price)
+            self.liquidate()
+            for op in self.rng.choices(ops, weights, k=self.config.ops_per_step):
+                getattr(self, op)()
+            self.record_state(step, price)
+        return time.perf_counter() - start
+
+    def report(self, elapsed):
+        num_calls = sum(len(i) for i in self.gas.values()) + sum(self.reverts.values())
+        gas = {}
+        for name, values in sorted(self.gas.items()):
+            pct = np.percentile(values, PERCENTILES).astype(int).tolist()
+            gas[name] = {
+                "count": len(values),
+                "reverts": self.reverts.get(name, 0),
+                "mean": int(np.mean(values)),
+                "max": max(values),
+                **{f"p{p}": v for p, v in zip(PERCENTILES, pct)},
+            }
+        return {
+            "elapsed": elapsed,
+            "calls": num_calls,
+            "tx_per_second": num_calls / elapsed if elapsed else 0,
+            "gas": gas,
+            "state_initial": self.state[0] if self.state else None,
+            "state_final": self.state[-1] if self.state else None,
+            "state_peak": {
+                key: max(i[key] for i in self.state)
+                for key in ("n_loans", "total_debt", "band_span", "occupied_bands")
+            }
+            if self.state
+            else None,
+        }
+
+
+def run_load(config):
+    """
+    Deploy the stack and run the load test described by `config`.
+
+    Returns (report dict, per-step state list).
+    """
+    if config.fork_url:
+        boa.env.fork(config.fork_url)
+    prices = config.prices or generate_price_path(config)
+    with boa.env.anchor():
+        contracts = deploy(config)
+        generator = LoadGenerator(config, contracts)
+        elapsed = generator.run(prices)
+        return generator.report(elapsed), generator.state
+
+
+def print_report(report):
+    print(f"{report['calls']} calls in {report['elapsed']:.1f}s ({report['tx_per_second']:.1f} tx/s)")
+    print()
+    header = f"{'operation':<12}{'count':>8}{'reverts':>9}{'mean':>10}" + "".join(
+        f"{'p' + str(p):>10}" for p in PERCENTILES
+    ) + f"{'max':>10}"
+    print(header)
+    for name, data in report["gas"].items():
+        row = f"{name:<12}{data['count']:>8}{data['reverts']:>9}{data['mean']:>10}"
+        row += "".join(f"{data['p' + str(p)]:>10}" for p in PERCENTILES)
+        print(row + f"{data['max']:>10}")
+    if report["state_final"]:
+        print()
+        print(f"{'state':<16}{'initial':>24}{'final':>24}{'peak':>24}")
+        for key in ("n_loans", "total_debt", "band_span", "occupied_bands"):
+            values = (report["state_initial"][key], report["state_final"][key], report["state_peak"][key])
+            print(f"{key:<16}" + "".join(f"{v:>24}" for v in values))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--accounts", type=int, default=LoadConfig.num_accounts)
+    parser.add_argument("--steps", type=int, default=LoadConfig.num_steps)
+    parser.add_argument("--ops-per-step", type=int, default=LoadConfig.ops_per_step)
+    parser.add_argument("--interval", type=int, default=LoadConfig.interval, help="seconds per price step")
+    parser.add_argument("--start-price", type=int, default=LoadConfig.start_price)
+    parser.add_argument("--volatility", type=float, default=LoadConfig.volatility)
+    parser.add_argument("--seed", type=int, default=LoadConfig.seed)
+    parser.add_argument("--A", type=int, default=LoadConfig.A)
+    parser.add_argument("--debt-ceiling", type=int, default=LoadConfig.debt_ceiling // 10**18)
+    parser.add_argument("--prices", help="replay a recorded price path (.json or .csv)")
+    parser.add_argument("--fork-url", help="deploy on top of a forked chain")
+    parser.add_argument("--json", help="write the report and per-step state to this file")
+    args = parser.parse_args(argv)
+
+    config = LoadConfig(
+        num_accounts=args.accounts,
+        num_steps=args.steps,
+        ops_per_step=args.ops_per_step,
+        interval=args.interval,
+        start_price=args.start_price,
+        volatility=args.volatility,
+        seed=args.seed,
+        A=args.A,
+        debt_ceiling=args.debt_ceiling * 10**18,
+        prices=load_price_path(args.prices) if args.prices else None,
+        fork_url=args.fork_url,
+    )
+    report, state = run_load(config)
+    print_report(report)
+
+    if args.json:
+        data = {"config": asdict(config), "report": report, "state": state}
+        data["config"]["prices"] = None
+        Path(args.json).write_text(json.dumps(data, indent=2, default=str) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+import brownie
+import pytest
+from brownie import ZERO_ADDRESS
+
+CREATE = 1
+ADJUST = 2
+CLOSE = 4
+
+
+def _op(action, market, coll_change=0, debt_change=0, n_bands=0, max_active_band=2**255 - 1):
+    return (action, market, coll_change, debt_change, n_bands, max_active_band)
+
+
+def _mints_and_burns(tx, stable):
+    return [
+        i
+        for i in tx.events["Transfer"]
+        if i.address == stable and ZERO_ADDRESS in (i["from"], i["to"])
+    ]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup(collateral_list, alice, controller, market_list):
+    for collateral in collateral_list:
+        collateral._mint_for_testing(alice, 100 * 10**18)
+        collateral.approve(controller, 2**256 - 1, {"from": alice})
+
+
+def test_create_many(market_list, amm_list, collateral_list, stable, controller, alice):
+    ops = [_op(CREATE, i, 50 * 10**18, 1000 * 10**18, 5) for i in market_list]
+    tx = controller.execute(alice, ops, {"from": alice})
+
+    assert tx.return_value == 3000 * 10**18
+    assert stable.balanceOf(alice) == 3000 * 10**18
+    assert controller.total_debt() == 3000 * 10**18
+    assert len(_mints_and_burns(tx, stable)) == 1
+    assert len(tx.events["CreateLoan"]) == 3
+
+    for market, amm, collateral in zip(market_list, amm_list, collateral_list):
+        assert collateral.balanceOf(amm) == 50 * 10**18
+        assert market.user_state(alice)[:3] == (50 * 10**18, 0, 1000 * 10**18)
+
+
+def test_close_and_create(market, market2, stable, controller, alice, bob):
+    controller.create_loan(alice, market, 50 * 10**18, 1000 * 10**18, 5, {"from": alice})
+    stable.transfer(bob, 1000 * 10**18, {"from": alice})
+
+    # the debt minted in the second market repays the first
+    ops = [_op(CLOSE, market), _op(CREATE, market2, 50 * 10**18, 1500 * 10**18, 5)]
+    tx = controller.execute(alice, ops, {"from": alice})
+
+    assert tx.return_value == 500 * 10**18
+    assert stable.balanceOf(alice) == 500 * 10**18
+    assert controller.total_debt() == 1500 * 10**18
+    assert len(_mints_and_burns(tx, stable)) == 1
+    assert market.user_state(alice)[:3] == (0, 0, 0)
+    assert market2.user_state(alice)[:3] == (50 * 10**18, 0, 1500 * 10**18)
+
+
+def test_rate_updated_once(market, amm, stable, controller, alice):
+    ops = [
+        _op(CREATE, market, 50 * 10**18, 1000 * 10**18, 5),
+        _op(ADJUST, market, 10 * 10**18, 200 * 10**18),
+        _op(ADJUST, market, 0, -300 * 10**18),
+    ]
+    tx = controller.execute(alice, ops, {"from": alice})
+
+    assert tx.return_value == 900 * 10**18
+    assert stable.balanceOf(alice) == 900 * 10**18
+    assert market.user_state(alice)[:3] == (60 * 10**18, 0, 900 * 10**18)
+    assert len(tx.events["SetRate"]) == 1
+    assert len(tx.events["AdjustLoan"]) == 2
+
+
+def test_matches_single_operations(market, market2, controller, stable, alice):
+    controller.execute(alice, [_op(CREATE, market, 50 * 10**18, 1000 * 10**18, 5)], {"from": alice})
+    controller.create_loan(alice, market2, 50 * 10**18, 1000 * 10**18, 5, {"from": alice})
+
+    assert market.user_state(alice) == market2.user_state(alice)
+    assert controller.minted() == 2000 * 10**18
+
+
+def test_paused_close_only(market, market2, controller, deployer, alice):
+    controller.create_loan(alice, market, 50 * 10**18, 1000 * 10**18, 5, {"from": alice})
+    controller.create_loan(alice, market2, 50 * 10**18, 1000 * 10**18, 5, {"from": alice})
+    controller.set_protocol_enabled(False, {"from": deployer})
+
+    with brownie.reverts("DFM:C Protocol pause, close only"):
+        controller.execute(alice, [_op(ADJUST, market, 10 * 10**18, 0)], {"from": alice})
+
+    controller.execute(alice, [_op(CLOSE, market), _op(CLOSE, market2)], {"from": alice})
+    assert controller.total_debt() == 0
+
+
+def test_invalid_operations(market, controller, alice):
+    with brownie.reverts("DFM:C 0 coll or debt"):
+        controller.execute(alice, [_op(CREATE, market, 50 * 10**18, 0, 5)], {"from": alice})
+
+    controller.create_loan(alice, market, 50 * 10**18, 1000 * 10**18, 5, {"from": alice})
+    with brownie.reverts("DFM:C No change"):
+        controller.execute(alice, [_op(ADJUST, market)], {"from": alice})
+
+
+def test_delegate_not_approved(market, controller, alice, bob):
+    with brownie.reverts("DFM:C Delegate not approved"):
+        controller.execute(alice, [_op(CREATE, market, 50 * 10**18, 1000 * 10**18, 5)], {"from": bob})
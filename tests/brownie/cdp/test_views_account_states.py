@@ -0,0 +1,51 @@
+import pytest
+from brownie import ZERO_ADDRESS
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup(collateral, controller, market, accounts):
+    for i, acct in enumerate(accounts[:6]):
+        collateral._mint_for_testing(acct, 100 * 10**18)
+        collateral.approve(controller, 2**256 - 1, {"from": acct})
+        controller.create_loan(
+            acct, market, 10 * 10**18, (i + 1) * 2_000 * 10**18, 4 + i * 7, {"from": acct}
+        )
+
+
+def test_account_states_match_single_account_view(views, market, accounts):
+    states = views.get_account_states(market, accounts[:6])
+
+    assert len(states) == 6
+    for acct, state in zip(accounts[:6], states):
+        expected = views.get_market_states_for_account(acct, [market])[0]
+        assert state["account"] == acct
+        assert state["account_debt"] == expected["account_debt"]
+        assert state["amm_coll_balance"] == expected["amm_coll_balance"]
+        assert state["amm_stable_balance"] == expected["amm_stable_balance"]
+        assert state["health"] == market.health(acct, True)
+        assert state["bands"] == expected["bands"]
+        assert state["coll_conversion_range"] == expected["coll_conversion_range"]
+
+
+def test_account_states_no_loan(views, market, accounts):
+    states = views.get_account_states(market, [accounts[7], accounts[0], ZERO_ADDRESS])
+
+    assert states[0] == (accounts[7], 0, 0, 0, 0, (0, 0), (0, 0))
+    assert states[1]["account_debt"] > 0
+    assert states[2]["account"] == ZERO_ADDRESS
+    assert states[2]["account_debt"] == 0
+
+
+def test_all_account_states(views, market, accounts):
+    states = views.get_all_account_states(market)
+
+    assert [i["account"] for i in states] == [market.loans(i) for i in range(6)]
+    assert states == views.get_account_states(market, accounts[:6])
+
+
+@pytest.mark.parametrize("start,limit", [(0, 2), (2, 3), (4, 0), (5, 10), (6, 1)])
+def test_all_account_states_paged(views, market, start, limit):
+    states = views.get_all_account_states(market, start, limit)
+    end = 6 if limit == 0 else min(6, start + limit)
+
+    assert [i["account"] for i in states] == [market.loans(i) for i in range(start, end)]
@@ -0,0 +1,71 @@
+import pytest
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup(collateral, controller, market, accounts):
+    # loans of different sizes and band counts leave gaps of empty bands
+    for i, acct in enumerate(accounts[:4]):
+        collateral._mint_for_testing(acct, 100 * 10**18)
+        collateral.approve(controller, 2**256 - 1, {"from": acct})
+        controller.create_loan(
+            acct, market, (i + 1) * 10**18, (4 - i) * 2_000 * 10**18, 4 + i * 9, {"from": acct}
+        )
+
+
+def _non_empty(bands):
+    return [i for i in bands if i["coll_balance"] + i["debt_balance"] > 0]
+
+
+def _bitmap_bit(amm, n):
+    return (amm.band_bitmap(n >> 8) >> (n & 255)) & 1
+
+
+def test_bitmap_matches_bands(amm):
+    for n in range(amm.min_band() - 2, amm.max_band() + 3):
+        is_set = amm.bands_x(n) + amm.bands_y(n) > 0
+        assert _bitmap_bit(amm, n) == is_set
+
+
+def test_skip_empty_bands(views, market):
+    all_bands, minmax = views.get_market_amm_bands(market)
+    bands, minmax2 = views.get_market_amm_bands(market, -(2**255), 5000, False)
+
+    assert minmax == minmax2
+    assert len(bands) > 0
+    assert bands == _non_empty(all_bands)
+
+
+@pytest.mark.parametrize("offset,num_bands", [(0, 1), (3, 10), (5, 300), (-10, 20)])
+def test_skip_empty_bands_range(views, market, amm, offset, num_bands):
+    lower = amm.min_band() + offset
+    all_bands = views.get_market_amm_bands(market, lower, num_bands)[0]
+    bands = views.get_market_amm_bands(market, lower, num_bands, False)[0]
+
+    assert bands == _non_empty(all_bands)
+
+
+@pytest.mark.parametrize("include_empty", [True, False])
+def test_band_prices(views, market, amm, include_empty):
+    bands = views.get_market_amm_bands(market, -(2**255), 5000, include_empty)[0]
+    for band in bands:
+        n = band["band_num"]
+        assert band["price_range"] == (amm.p_oracle_down(n), amm.p_oracle_up(n))
+
+
+def test_account_band_prices(views, market, amm, accounts):
+    for acct in accounts[:5]:
+        bands = views.get_market_amm_bands_for_account(acct, market)
+        if acct == accounts[4]:
+            assert bands == []
+        for band in bands:
+            n = band["band_num"]
+            assert band["price_range"] == (amm.p_oracle_down(n), amm.p_oracle_up(n))
+
+
+def test_bitmap_cleared_on_close(views, controller, market, amm, accounts):
+    for acct in accounts[:4]:
+        controller.close_loan(acct, market, {"from": acct})
+
+    assert views.get_market_amm_bands(market, -(2**255), 5000, False)[0] == []
+    for n in range(amm.min_band() - 2, amm.max_band() + 3):
+        assert _bitmap_bit(amm, n) == 0
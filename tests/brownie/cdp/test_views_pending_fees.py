@@ -0,0 +1,98 @@
+import pytest
+from brownie import chain
+
+
+def _accrue_collateral_fees(controller, market, amm, collateral, oracle, stable, bob):
+    # a large loan puts collateral of `market` within range of the exchanges below
+    collateral._mint_for_testing(bob, 100 * 10**18)
+    collateral.approve(controller, 2**256 - 1, {"from": bob})
+    collateral.approve(amm, 2**256 - 1, {"from": bob})
+    stable.approve(amm, 2**256 - 1, {"from": bob})
+    controller.create_loan(bob, market, 50 * 10**18, 100_000 * 10**18, 5, {"from": bob})
+    oracle.set_price(500 * 10**18, {"from": bob})
+    amm.exchange(0, 1, 20_000 * 10**18, 0, {"from": bob})
+    controller.collect_fees([market], {"from": bob})
+
+    # only collateral fees are pending from the second exchange
+    amm.exchange(1, 0, 20 * 10**18, 0, {"from": bob})
+    fees_y = amm.admin_fees_y()
+    assert fees_y > 0
+    return fees_y
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup(collateral, collateral2, collateral3, alice, controller, policy, market_list):
+    policy.set_rate(1e18 / 365 / 86400, {"from": alice})
+
+    # market2 has the largest debt, then market3, then market
+    for coll, mkt, amount in zip([collateral, collateral2, collateral3], market_list, [1, 3, 2]):
+        coll._mint_for_testing(alice, 100 * 10**18)
+        coll.approve(controller, 2**256 - 1, {"from": alice})
+        controller.create_loan(alice, mkt, 50 * 10**18, amount * 1000 * 10**18, 5, {"from": alice})
+
+    chain.mine(timedelta=86400)
+
+
+def test_ranked_by_pending_fees(views, market, market2, market3):
+    markets, values = views.get_markets_by_pending_fees(255, 0)
+
+    assert markets == [market2, market3, market]
+    assert values == [i.pending_debt() for i in (market2, market3, market)]
+    assert values[0] > values[1] > values[2] > 0
+
+
+def test_max_markets(views, market2, market3):
+    assert views.get_markets_by_pending_fees(2, 0)[0] == [market2, market3]
+    assert views.get_markets_by_pending_fees(1, 0)[0] == [market2]
+    assert views.get_markets_by_pending_fees(0, 0) == ([], [])
+
+
+def test_min_fee_value(views, market, market2, market3):
+    min_fee_value = market3.pending_debt()
+
+    assert views.get_markets_by_pending_fees(255, min_fee_value)[0] == [market2, market3]
+    assert views.get_markets_by_pending_fees(255, min_fee_value + 1)[0] == [market2]
+    assert views.get_markets_by_pending_fees(255, 2**256 - 1) == ([], [])
+
+
+def test_ranked_by_admin_fees(views, controller, market, amm, market2, collateral, oracle, stable, bob):
+    fees_y = _accrue_collateral_fees(controller, market, amm, collateral, oracle, stable, bob)
+
+    markets, values = views.get_markets_by_pending_fees(255, 0)
+    fee_value = market.pending_debt() + amm.admin_fees_x()
+
+    assert markets[0] == market
+    assert values[0] == fee_value + fees_y * amm.price_oracle() // 10**18
+    assert fee_value < values[1] == market2.pending_debt()
+
+
+def test_collect_ranked_markets(views, controller, market, market2, market3, alice):
+    pending = market.pending_debt()
+    total_debt = controller.total_debt()
+
+    markets = views.get_markets_by_pending_fees(2, 0)[0]
+    tx = controller.collect_fees(markets, {"from": alice})
+
+    assert [i["market"] for i in tx.events["CollectAmmFees"]] == [market2, market3]
+    assert market2.pending_debt() == 0
+    assert market3.pending_debt() == 0
+    assert market.pending_debt() >= pending > 0
+    assert controller.total_debt() > total_debt
+
+
+def test_collect_ranked_admin_fees(views, controller, market, amm, collateral, oracle, stable, bob):
+    fees_y = _accrue_collateral_fees(controller, market, amm, collateral, oracle, stable, bob)
+
+    markets = views.get_markets_by_pending_fees(1, 0)[0]
+    tx = controller.collect_fees(markets, {"from": bob})
+
+    assert tx.events["CollectAmmFees"]["market"] == market
+    assert tx.events["CollectAmmFees"]["amm_coll_fees"] == fees_y
+    assert amm.admin_fees_y() == 0
+
+
+def test_below_min_fee_value(views, controller, market_list, alice):
+    controller.collect_fees(market_list, {"from": alice})
+
+    # only a few seconds of interest has accrued since the last collection
+    assert views.get_markets_by_pending_fees(255, 10**18) == ([], [])
@@ -0,0 +1,47 @@
+import pytest
+
+
+@pytest.fixture(scope="module")
+def gas_tester(OracleGasTester, deployer):
+    return OracleGasTester.deploy({"from": deployer})
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup(chained_oracle, curve, curve2, curve3, deployer):
+    calldata = curve.price_oracle.encode_input(0)
+    for c, price in zip([curve, curve2, curve3], [3000 * 10**18, 3100 * 10**18, 3200 * 10**18]):
+        c.set_price(0, price, {"from": deployer})
+        chained_oracle.addCallPath([(c, 18, True, calldata, calldata)], {"from": deployer})
+
+
+def test_price_w_stores_block(chained_oracle, deployer):
+    tx = chained_oracle.price_w({"from": deployer})
+
+    assert chained_oracle.storedPriceBlock() == tx.block_number
+    assert chained_oracle.storedPrice() == 3100 * 10**18
+    assert chained_oracle.price() == 3100 * 10**18
+
+
+def test_recalculated_in_new_block(chained_oracle, curve, deployer):
+    chained_oracle.price_w({"from": deployer})
+    curve.set_price(0, 2700 * 10**18, {"from": deployer})
+
+    assert chained_oracle.price() == 3000 * 10**18
+    chained_oracle.price_w({"from": deployer})
+    assert chained_oracle.storedPrice() == 3000 * 10**18
+
+
+def test_call_path_change_clears_cache(chained_oracle, deployer):
+    chained_oracle.price_w({"from": deployer})
+    chained_oracle.removeCallPath(2, {"from": deployer})
+
+    assert chained_oracle.storedPriceBlock() == 0
+    assert chained_oracle.price() == 3050 * 10**18
+
+
+def test_repeated_price_w_gas(chained_oracle, gas_tester):
+    gas_used = gas_tester.measure_price_w.call(chained_oracle, 5)
+
+    # only the first call within a block evaluates the call paths
+    for gas in gas_used[1:]:
+        assert gas_used[0] > gas * 5
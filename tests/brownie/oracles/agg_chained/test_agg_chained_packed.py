@@ -0,0 +1,89 @@
+import pytest
+
+from brownie import ZERO_ADDRESS
+
+
+@pytest.fixture(scope="module")
+def gas_tester(OracleGasTester, deployer):
+    return OracleGasTester.deploy({"from": deployer})
+
+
+@pytest.fixture(scope="module")
+def hop_oracles(PriceOracleMock, deployer):
+    prices = [3000 * 10**18, 2 * 10**18, 5 * 10**17]
+    return [PriceOracleMock.deploy(i, {"from": deployer}) for i in prices]
+
+
+def _call_path(oracles, padding=b""):
+    # appending unused bytes to the calldata prevents the path from being packed
+    return [
+        (i, 18, True, i.price.encode_input() + padding.hex(), i.price_w.encode_input() + padding.hex())
+        for i in oracles
+    ]
+
+
+def test_selector_only_path_is_packed(chained_oracle, hop_oracles, deployer):
+    chained_oracle.addCallPath(_call_path(hop_oracles), {"from": deployer})
+
+    assert chained_oracle.isCallPathPacked(0)
+    assert chained_oracle.price() == 3000 * 10**18
+    assert chained_oracle.price_w.call() == 3000 * 10**18
+
+
+def test_path_with_arguments_not_packed(chained_oracle, curve, deployer):
+    calldata = curve.price_oracle.encode_input(0)
+    curve.set_price(0, 10**20, {"from": deployer})
+    chained_oracle.addCallPath([(curve, 18, True, calldata, calldata)], {"from": deployer})
+
+    assert not chained_oracle.isCallPathPacked(0)
+    assert chained_oracle.price() == 10**20
+
+
+def test_packed_read_write_selectors(chained_oracle, dummy_oracle, deployer):
+    chained_oracle.addCallPath(_call_path([dummy_oracle]), {"from": deployer})
+    dummy_oracle.set_price_w(2000 * 10**18, {"from": deployer})
+
+    assert chained_oracle.getCallPathResult(0) == 3000 * 10**18
+    assert chained_oracle.getCallPathResultWrite.call(0) == 2000 * 10**18
+
+
+def test_packed_division(chained_oracle, hop_oracles, deployer):
+    path = _call_path(hop_oracles[:2])
+    path[1] = (path[1][0], 18, False, path[1][3], path[1][4])
+    chained_oracle.addCallPath(path, {"from": deployer})
+
+    assert chained_oracle.isCallPathPacked(0)
+    assert chained_oracle.price() == 1500 * 10**18
+
+
+def test_remove_moves_packed_path(chained_oracle, curve, hop_oracles, deployer):
+    calldata = curve.price_oracle.encode_input(0)
+    curve.set_price(0, 10**20, {"from": deployer})
+    chained_oracle.addCallPath([(curve, 18, True, calldata, calldata)], {"from": deployer})
+    chained_oracle.addCallPath(_call_path(hop_oracles[:1]), {"from": deployer})
+
+    chained_oracle.removeCallPath(0, {"from": deployer})
+
+    assert chained_oracle.isCallPathPacked(0)
+    assert chained_oracle.price() == 3000 * 10**18
+
+
+@pytest.mark.parametrize("hops", [1, 2, 3])
+def test_packed_gas(
+    AggregateChainedOracle, core, gas_tester, hop_oracles, deployer, hops, record_property
+):
+    packed = AggregateChainedOracle.deploy(core, ZERO_ADDRESS, {"from": deployer})
+    packed.addCallPath(_call_path(hop_oracles[:hops]), {"from": deployer})
+    unpacked = AggregateChainedOracle.deploy(core, ZERO_ADDRESS, {"from": deployer})
+    unpacked.addCallPath(_call_path(hop_oracles[:hops], b"\x00" * 32), {"from": deployer})
+
+    assert packed.isCallPathPacked(0)
+    assert not unpacked.isCallPathPacked(0)
+    assert packed.price() == unpacked.price()
+
+    gas_packed = gas_tester.measure_price_w.call(packed, 1)[0]
+    gas_unpacked = gas_tester.measure_price_w.call(unpacked, 1)[0]
+    record_property("gas_packed", gas_packed)
+    record_property("gas_unpacked", gas_unpacked)
+
+    assert gas_packed < gas_unpacked
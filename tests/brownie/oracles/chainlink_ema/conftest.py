@@ -1,3 +1,5 @@
+from itertools import groupby
+
 from brownie import chain
 import pytest
 
@@ -6,13 +8,29 @@ import pytest
 def ema_calc(observations):
     smoothing = 2 * 10**18 // (observations + 1)
 
+    def decay(steps):
+        result, base = 10**18, 10**18 - smoothing
+        while True:
+            if steps & 1:
+                result = result * base // 10**18
+            steps >>= 1
+            if steps == 0:
+                return result
+            base = base * base // 10**18
+
     def func(new_observations, last):
+        # consecutive observations of the same value are applied in closed form,
+        # matching the rounding of `ChainlinkEMA._getNextEMA`
         last *= 10**18
         if not isinstance(new_observations, list):
             new_observations = [new_observations]
-        for value in new_observations:
+        for value, group in groupby(new_observations):
             value *= 10**18
-            last = int((value * smoothing) + (last * (10**18 - smoothing))) // 10**18
+            delta = abs(last - value) * decay(len(list(group)))
+            if last >= value:
+                last = value + delta // 10**18
+            else:
+                last = value - -(-delta // 10**18)
 
         return last
 
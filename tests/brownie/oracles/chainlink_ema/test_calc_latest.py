@@ -96,3 +96,18 @@ def test_calc_latest_complex(oracle, chainlink, ema_calc, deployer, new_phase):
 
     observations = [3000, 3200, 3200, 3200, 3550, 3550, 3410, 2900, 2900]
     assert oracle.price() == ema_calc(observations, 3000)
+
+
+def test_calc_latest_fast_forward_matches_stepwise(oracle, chainlink, observations, deployer):
+    stored = oracle.storedObservationTimestamp()
+    chain.mine(timestamp=stored + 50)
+    chainlink.add_round(3600, {"from": deployer})
+    chain.mine(timestamp=stored + 100 * (observations * 2 - 1) + 2)
+
+    # the closed form result only differs from applying each observation individually by rounding
+    smoothing = 2 * 10**18 // (observations + 1)
+    expected = 3000 * 10**18
+    for _ in range(observations * 2 - 1):
+        expected = (3600 * 10**18 * smoothing + expected * (10**18 - smoothing)) // 10**18
+
+    assert oracle.price() == pytest.approx(expected, rel=1e-15)
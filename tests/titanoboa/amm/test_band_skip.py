@@ -0,0 +1,110 @@
+# Band skipping through `band_bitmap` matches a band-by-band search
+
+import boa
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+
+MAX_SKIP_TICKS = 1024
+OFFSETS = [0, 1, 2, 255, 256, 257, 1022, 1023, 1024, 1025]
+
+
+def _read_bands(amm):
+    return {n: (amm.bands_x(n), amm.bands_y(n)) for n in range(amm.min_band(), amm.max_band() + 1)}
+
+
+def _can_skip_bands(bands, active_band, n_end):
+    n = active_band
+    for i in range(MAX_SKIP_TICKS):
+        x, y = bands.get(n, (0, 0))
+        if n_end > n:
+            if y != 0:
+                return False
+            n += 1
+        else:
+            if x != 0:
+                return False
+            n -= 1
+        if n == n_end:
+            break
+    return True
+
+
+def _active_band_with_skip(bands, active_band, min_band):
+    n = active_band
+    for i in range(MAX_SKIP_TICKS):
+        if n < min_band:
+            return active_band - MAX_SKIP_TICKS
+        if bands.get(n, (0, 0))[0] != 0:
+            break
+        n -= 1
+    return n
+
+
+def _setup(amm, collateral_token, borrowed_token, admin, accounts, deposits, amount):
+    # deposit from the lowest band upwards, so that every deposit is above the active band
+    with boa.env.prank(admin):
+        for user, (n1, dn) in zip(accounts[1:6], sorted(deposits)):
+            amm.deposit_range(user, 10**18 * (dn + 1), n1, n1 + dn)
+            collateral_token._mint_for_testing(amm.address, 10**18 * (dn + 1))
+
+    # convert part of the collateral to stablecoin, leaving bands with x below the active band
+    trader = accounts[7]
+    borrowed_token._mint_for_testing(trader, amount)
+    with boa.env.prank(trader):
+        amm.exchange(0, 1, amount, 0)
+
+
+deposits = st.lists(
+    st.tuples(st.integers(min_value=-600, max_value=600), st.integers(min_value=0, max_value=20)),
+    min_size=1,
+    max_size=5,
+    unique_by=lambda i: i[0],
+)
+
+
+@given(deposits=deposits, amount=st.integers(min_value=0, max_value=10**5 * 10**18))
+@settings(max_examples=20)
+def test_can_skip_bands(amm, collateral_token, borrowed_token, admin, accounts, deposits, amount):
+    with boa.env.anchor():
+        _setup(amm, collateral_token, borrowed_token, admin, accounts, deposits, amount)
+        bands = _read_bands(amm)
+        active_band = amm.active_band()
+
+        ends = {active_band + i for i in OFFSETS} | {active_band - i for i in OFFSETS}
+        for n1, dn in deposits:
+            ends |= {n1 - 1, n1, n1 + dn, n1 + dn + 1}
+        for n_end in sorted(ends):
+            assert amm.can_skip_bands(n_end) == _can_skip_bands(bands, active_band, n_end)
+
+
+@given(deposits=deposits, amount=st.integers(min_value=0, max_value=10**5 * 10**18))
+@settings(max_examples=20)
+def test_active_band_with_skip(amm, collateral_token, borrowed_token, admin, accounts, deposits, amount):
+    with boa.env.anchor():
+        _setup(amm, collateral_token, borrowed_token, admin, accounts, deposits, amount)
+        bands = _read_bands(amm)
+        expected = _active_band_with_skip(bands, amm.active_band(), amm.min_band())
+        assert amm.active_band_with_skip() == expected
+
+
+@given(deposits=deposits, amount=st.integers(min_value=0, max_value=10**5 * 10**18))
+@settings(max_examples=20)
+def test_deposit_autoskip(amm, collateral_token, borrowed_token, admin, accounts, deposits, amount):
+    user = accounts[8]
+    with boa.env.anchor():
+        _setup(amm, collateral_token, borrowed_token, admin, accounts, deposits, amount)
+        bands = _read_bands(amm)
+        active_band = amm.active_band()
+
+        for offset in OFFSETS:
+            n1 = active_band - offset
+            has_x = any(bands.get(n, (0, 0))[0] for n in range(n1, active_band + 1))
+            with boa.env.anchor():
+                with boa.env.prank(admin):
+                    if has_x or offset >= MAX_SKIP_TICKS:
+                        with boa.reverts("DFM:A Deposit below current band"):
+                            amm.deposit_range(user, 10**18, n1, n1 + 4)
+                    else:
+                        amm.deposit_range(user, 10**18, n1, n1 + 4)
+                        assert amm.active_band() == n1 - 1
@@ -0,0 +1,154 @@
+# Differential tests of the off-chain LLAMMA simulator against `AMM.vy`
+
+import boa
+import pytest
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from scripts.simulation import LLAMMA, simulate_paths
+from scripts.simulation.llamma import amm_constants
+
+
+@pytest.fixture(scope="module")
+def amm(collateral_token, borrowed_token, get_amm, admin):
+    amm = get_amm(collateral_token, borrowed_token)
+    with boa.env.prank(admin):
+        amm.set_admin_fee(3 * 10**17)
+    return amm
+
+
+def _deposit(amm, collateral_token, admin, accounts, amounts, ns, dns):
+    with boa.env.prank(admin):
+        for user, amount, n1, dn in zip(accounts[1:6], amounts, ns, dns):
+            if amount // (dn + 1) > 100:
+                amm.deposit_range(user, amount, n1, n1 + dn)
+                collateral_token._mint_for_testing(amm.address, amount)
+
+
+def _assert_state(amm, sim):
+    assert amm.active_band() == sim.active_band
+    assert amm.min_band() == sim.min_band
+    assert amm.max_band() == sim.max_band
+    for n in range(sim.min_band, sim.max_band + 1):
+        assert amm.bands_x(n) == sim.bands_x.get(n, 0)
+        assert amm.bands_y(n) == sim.bands_y.get(n, 0)
+
+
+@pytest.mark.parametrize("A", [10, 50, 100, 1000])
+def test_p_oracle_up(admin, price_oracle, collateral_token, borrowed_token, A):
+    with boa.env.prank(admin):
+        amm = boa.load("contracts/cdp/AMM.vy", admin, borrowed_token, A)
+        amm.initialize(admin, price_oracle, collateral_token, 3000 * 10**18, 10**16, 0)
+
+    sim = LLAMMA.from_contract(amm)
+    assert sim.LOG_A_RATIO == amm_constants(A)[1]
+    bands, p_up, p_down = sim.band_prices(-200, 200)
+    for i in range(0, len(bands), 7):
+        assert amm.p_oracle_up(int(bands[i])) == p_up[i]
+        assert amm.p_oracle_down(int(bands[i])) == p_down[i]
+
+
+@given(
+    amounts=st.lists(st.integers(min_value=10**16, max_value=10**6 * 10**18), min_size=5, max_size=5),
+    ns=st.lists(st.integers(min_value=1, max_value=20), min_size=5, max_size=5),
+    dns=st.lists(st.integers(min_value=0, max_value=20), min_size=5, max_size=5),
+    amount=st.integers(min_value=0, max_value=10**9 * 10**18),
+    out_amount=st.integers(min_value=0, max_value=10**6 * 10**18),
+)
+@settings(max_examples=50)
+def test_get_dxdy(amm, collateral_token, admin, accounts, amounts, ns, dns, amount, out_amount):
+    with boa.env.anchor():
+        _deposit(amm, collateral_token, admin, accounts, amounts, ns, dns)
+        sim = LLAMMA.from_contract(amm)
+        p_o = [amm.price_oracle(), amm.dynamic_fee()]
+
+        assert sim.get_p(p_o[0]) == amm.get_p()
+        assert sim.get_dxdy(0, 1, amount, p_o) == amm.get_dxdy(0, 1, amount)
+        assert sim.get_dydx(0, 1, out_amount, p_o) == amm.get_dydx(0, 1, out_amount)
+
+
+@given(
+    amounts=st.lists(st.integers(min_value=10**16, max_value=10**6 * 10**18), min_size=5, max_size=5),
+    ns=st.lists(st.integers(min_value=1, max_value=20), min_size=5, max_size=5),
+    dns=st.lists(st.integers(min_value=0, max_value=20), min_size=5, max_size=5),
+    amount=st.integers(min_value=10**6, max_value=10**9 * 10**18),
+    price_shift=st.floats(min_value=0.7, max_value=1.3),
+)
+@settings(max_examples=50)
+def test_exchange(
+    amm,
+    collateral_token,
+    borrowed_token,
+    price_oracle,
+    admin,
+    accounts,
+    amounts,
+    ns,
+    dns,
+    amount,
+    price_shift,
+):
+    trader = accounts[7]
+    with boa.env.anchor():
+        _deposit(amm, collateral_token, admin, accounts, amounts, ns, dns)
+        sim = LLAMMA.from_contract(amm)
+        p_o = [amm.price_oracle(), amm.dynamic_fee()]
+
+        # pump into the bands, then dump back down
+        borrowed_token._mint_for_testing(trader, amount)
+        with boa.env.prank(trader):
+            result = amm.exchange(0, 1, amount, 0)
+        assert sim.exchange(0, 1, amount, p_o) == list(result)
+        _assert_state(amm, sim)
+
+        dump = collateral_token.balanceOf(trader) // 2
+        with boa.env.prank(trader):
+            result = amm.exchange(1, 0, dump, 0)
+        assert sim.exchange(1, 0, dump, p_o) == list(result)
+        _assert_state(amm, sim)
+
+        # move the oracle and arbitrage the AMM to the new price
+        price = int(price_oracle.price() * price_shift)
+        with boa.env.prank(admin):
+            price_oracle.set_price(price)
+        sim = LLAMMA.from_contract(amm)
+        p_o = [amm.price_oracle(), amm.dynamic_fee()]
+        target = amm.price_oracle()
+
+        expected, pump = amm.get_amount_for_price(target)
+        assert sim.get_amount_for_price(target, p_o) == (expected, pump)
+
+        if expected > 0:
+            token = borrowed_token if pump else collateral_token
+            token._mint_for_testing(trader, expected)
+            i = 0 if pump else 1
+            with boa.env.prank(trader):
+                result = amm.exchange(i, 1 - i, expected, 0)
+            assert sim.exchange(i, 1 - i, expected, p_o) == list(result)
+            _assert_state(amm, sim)
+
+
+def test_simulate_paths(amm, collateral_token, admin, accounts):
+    with boa.env.anchor():
+        _deposit(amm, collateral_token, admin, accounts, [10**20] * 5, [1, 4, 8, 12, 16], [10] * 5)
+        sim = LLAMMA.from_contract(amm)
+
+    start = sim.old_p_o
+    paths = [[start * (400 - k * i) // 400 for k in range(1, 25)] for i in range(4)]
+    results = simulate_paths(sim, paths)
+
+    assert results.active_band.shape == (4, 24)
+    assert sim.active_band == 0
+    # a flat path never trades, falling prices convert collateral to stablecoin
+    assert (results.x[0] == 0).all()
+    assert results.y[3][-1] < results.y[2][-1] < results.y[1][-1] < results.y[0][-1]
+    assert (results.x[1:, -1] > 0).all()
+    assert (results.active_band[1:, -1] > 0).all()
+
+    # every step of a path matches sequential replay
+    replay = sim.copy()
+    for k, price in enumerate(paths[2]):
+        replay.timestamp += 120
+        replay.arbitrage(price)
+        assert replay.active_band == results.active_band[2][k]
+        assert replay.totals() == (results.x[2][k], results.y[2][k])
@@ -1,5 +1,9 @@
+import math
+
 import boa
 import pytest
+from hypothesis import given, settings
+from hypothesis import strategies as st
 from ..conftest import PRICE, approx
 
 
@@ -68,3 +72,37 @@ def test_ema_sleep(ema_price_oracle, price_oracle, admin):
         ema_price_oracle.price_w()
         boa.env.time_travel(1000000)
         assert (ema_price_oracle.price() - p // 2) < p / 10
+
+
+@pytest.fixture(scope="module", params=[2, 10, 100, 1000, 10000])  # MIN_A .. MAX_A
+def amm_for_A(request, admin, price_oracle, collateral_token, borrowed_token):
+    with boa.env.prank(admin):
+        amm = boa.load("contracts/cdp/AMM.vy", admin, borrowed_token, request.param)
+        amm.initialize(admin, price_oracle, collateral_token, 3000 * 10**18, 10**16, 0)
+        # accrue interest so that the base price differs from the initial price
+        amm.set_rate(10**10)
+    boa.env.time_travel(86400 * 365)
+    return amm
+
+
+@given(data=st.data())
+@settings(max_examples=20)
+def test_p_oracle_ladder(amm_for_A, data):
+    A = amm_for_A.A()
+    # stay well within the range of the `exp` implementation
+    limit = min(1000, int(20 / math.log(A / (A - 1))))
+    n1 = data.draw(st.integers(min_value=-limit, max_value=limit - 1))
+    n2 = data.draw(st.integers(min_value=n1, max_value=min(n1 + 255, limit)))
+
+    ladder = amm_for_A.p_oracle_ladder(n1, n2)
+    assert len(ladder) == n2 - n1 + 2
+    for i, n in enumerate(range(n1, n2 + 1)):
+        assert ladder[i] == amm_for_A.p_oracle_up(n)
+        assert ladder[i + 1] == amm_for_A.p_oracle_down(n)
+
+
+def test_p_oracle_ladder_range(amm_for_A):
+    with boa.reverts(dev="invalid band range"):
+        amm_for_A.p_oracle_ladder(0, 256)
+    with boa.reverts(dev="invalid band range"):
+        amm_for_A.p_oracle_ladder(1, 0)
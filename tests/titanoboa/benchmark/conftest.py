@@ -0,0 +1,160 @@
+"""
+Gas benchmarks for `MainController` entry points.
+
+Every benchmark records the gas used by a single call under a stable key, e.g.
+`create_loan[bands=10,hooks=1]`. At the end of the session all measurements are
+written to `GAS_RESULTS` (default: `gas_results.json` in this directory).
+
+Each measurement is compared against the stored `gas_baseline.json`. A benchmark
+fails when it uses more than `GAS_TOLERANCE` (default: 1%) above its baseline.
+Run with `GAS_BASELINE_UPDATE=1` to rewrite the baseline from the current results.
+
+When running with `pytest-xdist`, each worker merges its measurements into the
+shared results file while holding an exclusive lock.
+"""
+
+import fcntl
+import json
+import os
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+import boa
+import pytest
+from eth.db.backends.memory import MemoryDB
+from eth.db.journal import JournalDB
+
+
+BASELINE_PATH = Path(__file__).parent.joinpath("gas_baseline.json")
+RESULTS_PATH = Path(os.getenv("GAS_RESULTS", Path(__file__).parent.joinpath("gas_results.json")))
+TOLERANCE = float(os.getenv("GAS_TOLERANCE", "0.01"))
+UPDATE_BASELINE = os.getenv("GAS_BASELINE_UPDATE", "0") not in ("", "0")
+
+BAND_COUNTS = [4, 10, 25, 50]
+HOOK_COUNTS = [0, 1, 4]
+MARKET_COUNTS = [1, 16, 255]
+
+_results = {}
+_session_start = time.time()
+
+
+def gas_used(contract) -> int:
+    """
+    Gas used by the last call to `contract`, excluding the intrinsic transaction
+    cost and applying the EIP-3529 refund cap.
+    """
+    computation = contract._computation
+    used = computation.get_gas_used()
+    return used - min(computation.get_gas_refund(), used // 5)
+
+
+class GasBenchmark:
+    def __init__(self, baseline):
+        self.baseline = baseline
+
+    @contextmanager
+    def measure(self, name: str, contract):
+        """
+        Record the gas used by the last call to `contract` made within the context.
+
+        Calls within the context use a fresh warm/cold access journal, so that
+        each measured call is priced as the first call of a new transaction.
+        The original journal is restored afterwards to keep `boa.env.anchor`
+        checkpoints intact.
+        """
+        account_db = boa.env.vm.state._account_db
+        accessed_state = account_db._journal_accessed_state
+        account_db._journal_accessed_state = JournalDB(MemoryDB())
+        try:
+            yield
+        finally:
+            account_db._journal_accessed_state = accessed_state
+        self.record(name, contract)
+
+    def record(self, name: str, contract) -> int:
+        gas = gas_used(contract)
+        _results[name] = gas
+        if not UPDATE_BASELINE and name in self.baseline:
+            limit = int(self.baseline[name] * (1 + TOLERANCE))
+            assert gas <= limit, f"{name}: {gas} gas, baseline {self.baseline[name]} (+{TOLERANCE:.2%})"
+        return gas
+
+
+def pytest_sessionfinish(session, exitstatus):
+    if not _results:
+        return
+    with _locked(RESULTS_PATH):
+        results = {}
+        # another xdist worker already wrote results during this run
+        if RESULTS_PATH.exists() and RESULTS_PATH.stat().st_mtime >= _session_start:
+            results = json.loads(RESULTS_PATH.read_text())
+        results.update(_results)
+        RESULTS_PATH.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n")
+
+        if UPDATE_BASELINE:
+            baseline = _load_baseline()
+            baseline.update(_results)
+            BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+@contextmanager
+def _locked(path):
+    with open(path.with_suffix(".lock"), "w") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _load_baseline():
+    if BASELINE_PATH.exists():
+        return json.loads(BASELINE_PATH.read_text())
+    return {}
+
+
+@pytest.fixture(scope="session")
+def gas_benchmark():
+    return GasBenchmark(_load_baseline())
+
+
+@pytest.fixture(scope="module")
+def hook_interface():
+    return boa.load_partial("contracts/testing/ControllerHookTester.vy")
+
+
+@pytest.fixture(scope="module")
+def hooks(admin, hook_interface):
+    # validation-only hooks that are active on every hook point
+    contracts = []
+    with boa.env.prank(admin):
+        for _ in range(max(HOOK_COUNTS)):
+            hook = hook_interface.deploy()
+            hook.set_configuration(0, [True, True, True, True])
+            contracts.append(hook)
+    return contracts
+
+
+@pytest.fixture(scope="module")
+def add_hooks(admin, controller, market, hooks):
+    def f(num_hooks):
+        with boa.env.prank(admin):
+            for hook in hooks[:num_hooks]:
+                controller.add_market_hook(market, hook)
+
+    return f
+
+
+@pytest.fixture(scope="module")
+def borrower(accounts, collateral_token):
+    account = accounts[0]
+    collateral_token._mint_for_testing(account, 10**24)
+    return account
+
+
+@pytest.fixture(scope="module")
+def liquidator(accounts, stablecoin):
+    account = accounts[1]
+    stablecoin._mint_for_testing(account, 10**30)
+    return account
@@ -0,0 +1,39 @@
+import boa
+import pytest
+
+from .conftest import BAND_COUNTS, gas_used
+
+
+A_VALUES = [2, 100, 10000]  # MIN_A, default, MAX_A
+
+
+@pytest.fixture(scope="module")
+def deploy_amm(admin, price_oracle, collateral_token, stablecoin):
+    def f(A):
+        with boa.env.prank(admin):
+            amm = boa.load("contracts/cdp/AMM.vy", admin, stablecoin, A)
+            amm.initialize(admin, price_oracle, collateral_token, 3000 * 10**18, 10**16, 0)
+            amm.set_rate(10**10)
+        boa.env.time_travel(3600)
+        return amm
+
+    return f
+
+
+@pytest.mark.parametrize("A", A_VALUES)
+def test_band_prices(gas_benchmark, deploy_amm, A):
+    with boa.env.anchor():
+        amm = deploy_amm(A)
+
+        with gas_benchmark.measure(f"p_oracle_up[A={A}]", amm):
+            amm.p_oracle_up(-10)
+        single = gas_used(amm)
+
+        for num_bands in BAND_COUNTS:
+            n1 = -(num_bands // 2)
+            with gas_benchmark.measure(f"p_oracle_ladder[A={A},bands={num_bands}]", amm):
+                amm.p_oracle_ladder(n1, n1 + num_bands - 1)
+            ladder = gas_used(amm)
+
+            # one call for every band edge, as used to be made by `MarketViews`
+            assert ladder < single * (num_bands + 1)
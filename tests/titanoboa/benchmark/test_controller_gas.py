@@ -0,0 +1,182 @@
+import boa
+import pytest
+
+from .conftest import BAND_COUNTS, HOOK_COUNTS, MARKET_COUNTS, gas_used
+
+
+COLL_AMOUNT = 10 * 10**18
+RATE = int(1e18 * 1.0 / 365 / 86400)  # 100% APR
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup(admin, monetary_policy, borrower, liquidator):
+    with boa.env.prank(admin):
+        monetary_policy.set_rate(RATE)
+
+
+def _create_loan(controller, market, account, n_bands):
+    debt = market.max_borrowable(COLL_AMOUNT, n_bands)
+    with boa.env.prank(account):
+        controller.create_loan(account, market, COLL_AMOUNT, debt, n_bands)
+    return debt
+
+
+@pytest.mark.parametrize("num_hooks", HOOK_COUNTS)
+@pytest.mark.parametrize("n_bands", BAND_COUNTS)
+def test_create_loan(gas_benchmark, controller, market, borrower, add_hooks, n_bands, num_hooks):
+    with boa.env.anchor():
+        add_hooks(num_hooks)
+        debt = market.max_borrowable(COLL_AMOUNT, n_bands)
+        with gas_benchmark.measure(f"create_loan[bands={n_bands},hooks={num_hooks}]", controller):
+            with boa.env.prank(borrower):
+                controller.create_loan(borrower, market, COLL_AMOUNT, debt, n_bands)
+
+
+@pytest.mark.parametrize("num_hooks", HOOK_COUNTS)
+@pytest.mark.parametrize("n_bands", BAND_COUNTS)
+def test_adjust_loan_add_collateral(
+    gas_benchmark, controller, market, borrower, add_hooks, n_bands, num_hooks
+):
+    with boa.env.anchor():
+        add_hooks(num_hooks)
+        _create_loan(controller, market, borrower, n_bands)
+        with gas_benchmark.measure(f"adjust_loan[coll,bands={n_bands},hooks={num_hooks}]", controller):
+            with boa.env.prank(borrower):
+                controller.adjust_loan(borrower, market, COLL_AMOUNT, 0)
+
+
+def test_create_loan_inactive_hooks(gas_benchmark, admin, controller, market, borrower, hooks):
+    # hooks which are only active on liquidation are not visited when creating a loan
+    gas = []
+    debt = market.max_borrowable(COLL_AMOUNT, 10)
+    for num_hooks in range(len(hooks) + 1):
+        with boa.env.anchor():
+            with boa.env.prank(admin):
+                for hook in hooks[:num_hooks]:
+                    hook.set_configuration(0, [False, False, False, True])
+                    controller.add_market_hook(market, hook)
+            name = f"create_loan[bands=10,liquidation_hooks={num_hooks}]"
+            with gas_benchmark.measure(name, controller):
+                with boa.env.prank(borrower):
+                    controller.create_loan(borrower, market, COLL_AMOUNT, debt, 10)
+            gas.append(gas_used(controller))
+
+    assert len(set(gas)) == 1
+
+
+@pytest.mark.parametrize("price_drop", [10, 50, 90])
+def test_create_loan_after_price_drop(
+    gas_benchmark, admin, controller, market, price_oracle, borrower, price_drop
+):
+    # the new loan is placed far above the active band, `can_skip_bands`
+    # has to confirm that every band in between is empty
+    with boa.env.anchor():
+        with boa.env.prank(admin):
+            price_oracle.set_price(price_oracle.price() * (100 - price_drop) // 100)
+        boa.env.time_travel(3600)
+        debt = market.max_borrowable(COLL_AMOUNT, 10)
+        with gas_benchmark.measure(f"create_loan[bands=10,price_drop={price_drop}%]", controller):
+            with boa.env.prank(borrower):
+                controller.create_loan(borrower, market, COLL_AMOUNT, debt, 10)
+
+
+@pytest.mark.parametrize("same_block", [True, False])
+def test_adjust_loan_rate_unchanged(
+    gas_benchmark, accounts, controller, market, collateral_token, borrower, same_block
+):
+    # the rate is only written to the AMM once per block if it does not change
+    other = accounts[2]
+    with boa.env.anchor():
+        collateral_token._mint_for_testing(other, COLL_AMOUNT)
+        _create_loan(controller, market, borrower, 10)
+        _create_loan(controller, market, other, 10)
+        if not same_block:
+            boa.env.time_travel(12)
+        key = "same_block" if same_block else "new_block"
+        with gas_benchmark.measure(f"adjust_loan[coll,bands=10,{key}]", controller):
+            with boa.env.prank(borrower):
+                controller.adjust_loan(borrower, market, COLL_AMOUNT, 0)
+
+
+@pytest.mark.parametrize("num_hooks", HOOK_COUNTS)
+@pytest.mark.parametrize("n_bands", BAND_COUNTS)
+def test_adjust_loan_repay(
+    gas_benchmark, controller, market, borrower, add_hooks, n_bands, num_hooks
+):
+    with boa.env.anchor():
+        add_hooks(num_hooks)
+        debt = _create_loan(controller, market, borrower, n_bands)
+        with gas_benchmark.measure(f"adjust_loan[debt,bands={n_bands},hooks={num_hooks}]", controller):
+            with boa.env.prank(borrower):
+                controller.adjust_loan(borrower, market, 0, -(debt // 2))
+
+
+@pytest.mark.parametrize("num_hooks", HOOK_COUNTS)
+@pytest.mark.parametrize("n_bands", BAND_COUNTS)
+def test_close_loan(
+    gas_benchmark, controller, market, stablecoin, borrower, add_hooks, n_bands, num_hooks
+):
+    with boa.env.anchor():
+        add_hooks(num_hooks)
+        _create_loan(controller, market, borrower, n_bands)
+        boa.env.time_travel(86400)
+        stablecoin._mint_for_testing(borrower, market.debt(borrower))
+        with gas_benchmark.measure(f"close_loan[bands={n_bands},hooks={num_hooks}]", controller):
+            with boa.env.prank(borrower):
+                controller.close_loan(borrower, market)
+
+
+@pytest.mark.parametrize("num_hooks", HOOK_COUNTS)
+@pytest.mark.parametrize("n_bands", BAND_COUNTS)
+def test_liquidate(
+    gas_benchmark, controller, market, borrower, liquidator, add_hooks, n_bands, num_hooks
+):
+    with boa.env.anchor():
+        add_hooks(num_hooks)
+        _create_loan(controller, market, borrower, n_bands)
+        # interest accrual pushes the loan below the liquidation threshold
+        boa.env.time_travel(60 * 86400)
+        assert market.health(borrower) < 0
+        with gas_benchmark.measure(f"liquidate[bands={n_bands},hooks={num_hooks}]", controller):
+            with boa.env.prank(liquidator):
+                controller.liquidate(market, borrower, 0)
+
+
+@pytest.mark.parametrize("num_targets", [1, 4, 8])
+def test_liquidate_many(
+    gas_benchmark, accounts, controller, market, collateral_token, liquidator, num_targets
+):
+    targets = accounts[2 : 2 + num_targets]
+    with boa.env.anchor():
+        for acct in targets:
+            collateral_token._mint_for_testing(acct, COLL_AMOUNT)
+            _create_loan(controller, market, acct, 10)
+        boa.env.time_travel(60 * 86400)
+        with gas_benchmark.measure(f"liquidate_many[bands=10,targets={num_targets}]", controller):
+            with boa.env.prank(liquidator):
+                controller.liquidate_many(market, targets, [0] * num_targets, [10**18] * num_targets)
+
+
+@pytest.fixture(scope="module")
+def fee_markets(admin, controller, market, collateral_token, price_oracle, borrower):
+    markets = [market.address]
+    with boa.env.prank(admin):
+        for _ in range(max(MARKET_COUNTS) - 1):
+            markets.append(
+                controller.add_market(
+                    collateral_token, 100, 10**16, 0, price_oracle, 0, 5 * 10**16, 2 * 10**16, 10**24
+                )[0]
+            )
+    with boa.env.prank(borrower):
+        for addr in markets:
+            controller.create_loan(borrower, addr, 10**18, 10**20, 10)
+    boa.env.time_travel(86400)
+    return markets
+
+
+@pytest.mark.parametrize("num_markets", MARKET_COUNTS)
+def test_collect_fees(gas_benchmark, controller, fee_markets, num_markets):
+    with boa.env.anchor():
+        with gas_benchmark.measure(f"collect_fees[markets={num_markets}]", controller):
+            controller.collect_fees(fee_markets[:num_markets])
+
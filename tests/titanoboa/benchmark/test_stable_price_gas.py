@@ -0,0 +1,65 @@
+import boa
+import pytest
+
+from .conftest import gas_used
+
+
+PAIR_COUNTS = [1, 4, 8]
+POOL_AMOUNT = 500_000 * 10**18
+
+
+@pytest.fixture(scope="module")
+def stable_pools(admin, stablecoin):
+    pools = []
+    with boa.env.prank(admin):
+        stablecoin._mint_for_testing(admin, POOL_AMOUNT * max(PAIR_COUNTS))
+        for i in range(max(PAIR_COUNTS)):
+            coin = boa.load("contracts/testing/ERC20Mock.vy", f"USD{i}", f"USD{i}", 18)
+            pool = boa.load(
+                "contracts/testing/Stableswap.vy",
+                f"Swap {i}",
+                f"S{i}",
+                [coin.address, stablecoin.address],
+                [10**18, 10**18],
+                100,
+                0,
+            )
+            coin._mint_for_testing(admin, POOL_AMOUNT)
+            coin.approve(pool, 2**256 - 1)
+            stablecoin.approve(pool, 2**256 - 1)
+            pool.add_liquidity([POOL_AMOUNT, POOL_AMOUNT], 0)
+            pools.append(pool)
+    return pools
+
+
+@pytest.fixture(scope="module")
+def deploy_stable_price(admin, core, stablecoin, stable_pools):
+    def f(num_pairs):
+        with boa.env.prank(admin):
+            agg = boa.load(
+                "contracts/cdp/oracles/AggregateStablePrice.vy", core, stablecoin, 10**15
+            )
+            for pool in stable_pools[:num_pairs]:
+                agg.add_price_pair(pool)
+        boa.env.time_travel(3600)
+        return agg
+
+    return f
+
+
+@pytest.mark.parametrize("num_pairs", PAIR_COUNTS)
+def test_stable_price(gas_benchmark, deploy_stable_price, num_pairs):
+    with boa.env.anchor():
+        agg = deploy_stable_price(num_pairs)
+
+        with gas_benchmark.measure(f"stable_price[pairs={num_pairs}]", agg):
+            p = agg.price()
+        uncached = gas_used(agg)
+
+        with gas_benchmark.measure(f"stable_price_w[pairs={num_pairs}]", agg):
+            agg.price_w()
+
+        # later reads within the same block return the price stored by `price_w`
+        with gas_benchmark.measure(f"stable_price[pairs={num_pairs},cached]", agg):
+            assert agg.price() == p
+        assert gas_used(agg) < uncached
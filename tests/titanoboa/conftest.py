@@ -1,12 +1,15 @@
 import os
 from datetime import timedelta
 from math import log
+from pathlib import Path
 from typing import Any, Callable
 
 import boa
 import pytest
 from hypothesis import settings, Phase
 
+from .gas_profile import PROFILE_DIR, GasProfiler, profile_path
+
 
 PRICE = 3000
 
@@ -14,6 +17,9 @@ PRICE = 3000
 settings.register_profile("default", deadline=timedelta(seconds=1000))
 settings.load_profile(os.getenv("HYPOTHESIS_PROFILE", "default"))
 
+# compiled contracts are cached on disk, set to an empty string to disable
+boa.interpret.set_cache_dir(os.getenv("TITANOBOA_CACHE_DIR", "~/.cache/titanoboa") or None)
+
 
 def approx(x1: int, x2: int, precision: int, abs_precision=None):
     if precision >= 1:
@@ -30,6 +36,34 @@ def approx(x1: int, x2: int, precision: int, abs_precision=None):
     return result or (abs(log(x1 / x2)) <= precision)
 
 
+@pytest.fixture(scope="module", autouse=True)
+def module_isolation():
+    """
+    Every test module runs inside an anchor, so that module-scoped fixtures and
+    tests always start from the same state. Session-scoped contracts requested
+    by a module are deployed before the anchor is entered.
+    """
+    with boa.env.anchor():
+        yield
+
+
+@pytest.fixture(autouse=True)
+def gas_profile(request):
+    """
+    Profile the gas used by each test when `GAS_PROFILE_DIR` is set.
+    """
+    if not PROFILE_DIR:
+        yield None
+        return
+    Path(PROFILE_DIR).mkdir(parents=True, exist_ok=True)
+    with GasProfiler() as profiler:
+        yield profiler
+    if profiler.total_gas:
+        path = profile_path(request.node.nodeid)
+        profiler.write_folded(path.with_suffix(".folded"))
+        profiler.write_report(path.with_suffix(".txt"))
+
+
 @pytest.fixture(scope="session")
 def accounts():
     return [boa.env.generate_address() for _ in range(10)]
@@ -40,7 +74,7 @@ def admin():
     return boa.env.generate_address()
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def fee_receiver():
     return "000000000000000000000000000000000000fee5"
 
@@ -63,41 +97,41 @@ def get_borrowed_token(admin) -> Callable[[int], Any]:
     return f
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def collateral_token(get_collateral_token):
     return get_collateral_token(18)
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def price_oracle(admin):
     with boa.env.prank(admin):
         oracle = boa.load("contracts/testing/PriceOracleMock.vy", PRICE * 10**18)
         return oracle
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def core(admin, fee_receiver):
     with boa.env.prank(admin):
         return boa.load("contracts/testing/CoreOwnerMock.vy", admin, fee_receiver)
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def stablecoin(admin):
     with boa.env.prank(admin):
         return boa.load("contracts/testing/ERC20Mock.vy", "Curve USD", "crvUSD", 18)
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def operator_interface():
     return boa.load_partial("contracts/cdp/MarketOperator.vy")
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def amm_interface():
     return boa.load_partial("contracts/cdp/AMM.vy")
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def controller(core, stablecoin, admin, monetary_policy):
     with boa.env.prank(admin):
         contract = boa.load(
@@ -114,7 +148,7 @@ def controller(core, stablecoin, admin, monetary_policy):
     return contract
 
 
-@pytest.fixture(scope="module")
+@pytest.fixture(scope="session")
 def monetary_policy(admin):
     with boa.env.prank(admin):
         policy = boa.load("contracts/testing/ConstantMonetaryPolicy.vy", admin)
@@ -0,0 +1,224 @@
+"""
+Per-line and per-function gas profiler for contracts executed under titanoboa.
+
+The profiler wraps the opcode table of the py-evm computation class used by boa.
+Every executed opcode is attributed to the source line and function it belongs to.
+Internal function calls are tracked per call frame, and external calls nest under
+the calling frame. The gas of each opcode is its own cost: gas forwarded to a
+sub-call is attributed to the callee.
+
+Results can be written as:
+  * folded stacks (`<frame>;<frame>;... <gas>` per line), which can be rendered
+    with `flamegraph.pl`, inferno or speedscope
+  * a table of the most expensive source lines
+
+Set `GAS_PROFILE_DIR` to profile every test in the titanoboa suite, including
+the benchmarks. One `.folded` and one `.txt` file per test is written to that
+directory. Outside of pytest, use the `GasProfiler` context manager:
+
+    with GasProfiler() as profile:
+        controller.create_loan(...)
+    profile.write_folded("create_loan.folded")
+
+Gas refunds are not included. Opcodes of contracts without a Vyper source map,
+such as Solidity oracles or precompiles, are attributed to the contract address.
+"""
+
+import os
+import re
+from collections import defaultdict
+from pathlib import Path
+
+import boa
+from vyper import ast as vy_ast
+
+
+PROFILE_DIR = os.getenv("GAS_PROFILE_DIR", "")
+
+
+class _Frame:
+    def __init__(self, computation, label, source):
+        self.computation = computation
+        self.label = label
+        self.source = source
+        # stack of internal functions, outermost (external) function first
+        self.functions = []
+
+    def enter(self, function):
+        if not self.functions or self.functions[-1] == function:
+            if not self.functions:
+                self.functions.append(function)
+            return
+        if function in self.functions:
+            # returned from one or more internal calls
+            del self.functions[self.functions.index(function) + 1 :]
+        else:
+            self.functions.append(function)
+
+    def stack(self):
+        return [f"{self.label}:{i}" for i in self.functions] or [self.label]
+
+
+class _SourceInfo:
+    """
+    Maps program counters of a Vyper contract to (function name, line number).
+    """
+
+    def __init__(self, contract):
+        self._ast_map = contract.source_map.get("pc_raw_ast_map", {})
+        self._cache = {}
+
+    def lookup(self, pc):
+        if pc not in self._cache:
+            node = self._ast_map.get(pc)
+            if node is None:
+                self._cache[pc] = (None, None)
+            else:
+                fn = node if isinstance(node, vy_ast.FunctionDef) else node.get_ancestor(vy_ast.FunctionDef)
+                self._cache[pc] = (fn.name if fn is not None else None, node.lineno)
+        return self._cache[pc]
+
+
+class GasProfiler:
+    def __init__(self, env=None):
+        self.env = env or boa.env
+        # ";"-joined stack -> gas
+        self.stacks = defaultdict(int)
+        # (contract, line) -> gas
+        self.lines = defaultdict(int)
+        self._frames = []
+        self._sources = {}
+        self._total = 0
+        self._computation_class = None
+        self._original_opcodes = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        cls = self.env.vm.state.computation_class
+        self._computation_class = cls
+        self._original_opcodes = cls.__dict__.get("opcodes")
+        opcodes = cls.opcodes
+        cls.opcodes = {k: self._wrap(v) for k, v in opcodes.items()}
+
+    def stop(self):
+        cls = self._computation_class
+        if self._original_opcodes is None:
+            # the opcode table was inherited, remove the override
+            del cls.opcodes
+        else:
+            cls.opcodes = self._original_opcodes
+        self._frames.clear()
+
+    @property
+    def total_gas(self):
+        return self._total
+
+    def _wrap(self, opcode_fn):
+        def profiled(computation):
+            # the program counter has already moved past the opcode
+            pc = computation.code.program_counter - 1
+            gas_before = computation.get_gas_remaining()
+            total_before = self._total
+            try:
+                opcode_fn(computation=computation)
+            finally:
+                cost = gas_before - computation.get_gas_remaining()
+                # gas used by sub-calls has already been recorded for the callee
+                cost -= self._total - total_before
+                self._record(computation, pc, cost)
+
+        return profiled
+
+    def _get_frame(self, computation):
+        # one frame per call depth, frames left over from returned calls or
+        # previous transactions are dropped
+        depth = computation.msg.depth
+        if len(self._frames) > depth and self._frames[depth].computation is computation:
+            del self._frames[depth + 1 :]
+            return self._frames[depth]
+        del self._frames[depth:]
+
+        address = computation.msg.code_address
+        label, source = self._get_source(address)
+        frame = _Frame(computation, label, source)
+        self._frames.append(frame)
+        return frame
+
+    def _get_source(self, address):
+        if address not in self._sources:
+            contract = None
+            try:
+                contract = self.env.lookup_contract(address)
+            except Exception:
+                pass
+            if contract is not None and hasattr(contract, "source_map"):
+                name = Path(getattr(contract, "filename", None) or contract.compiler_data.contract_name).name
+                self._sources[address] = (name, _SourceInfo(contract))
+            else:
+                self._sources[address] = (f"0x{address.hex()}", None)
+        return self._sources[address]
+
+    def _record(self, computation, pc, cost):
+        self._total += cost
+        frame = self._get_frame(computation)
+        line = None
+        if frame.source is not None:
+            function, line = frame.source.lookup(pc)
+            if function is not None:
+                frame.enter(function)
+
+        stack = [i for f in self._frames for i in f.stack()]
+        if line is not None:
+            stack.append(f"{frame.label}#L{line}")
+            self.lines[(frame.label, line)] += cost
+        self.stacks[";".join(stack)] += cost
+
+    def folded(self):
+        """
+        Folded stack lines, as consumed by `flamegraph.pl`.
+        """
+        return [f"{stack} {gas}" for stack, gas in sorted(self.stacks.items()) if gas > 0]
+
+    def functions(self):
+        """
+        Inclusive gas per `contract:function`, most expensive first.
+        """
+        result = defaultdict(int)
+        for stack, gas in self.stacks.items():
+            frames = [i for i in stack.split(";") if "#L" not in i]
+            for name in set(frames):
+                result[name] += gas
+        return sorted(result.items(), key=lambda i: -i[1])
+
+    def line_table(self, limit=50):
+        """
+        The `limit` most expensive source lines, formatted as a table.
+        """
+        rows = sorted(self.lines.items(), key=lambda i: -i[1])[:limit]
+        total = self._total or 1
+        out = [f"{'gas':>10} {'share':>7}  location"]
+        for (label, line), gas in rows:
+            out.append(f"{gas:>10} {gas / total:>7.2%}  {label}:{line}")
+        return "\n".join(out)
+
+    def write_folded(self, path):
+        Path(path).write_text("\n".join(self.folded()) + "\n")
+
+    def write_report(self, path, limit=50):
+        out = [f"total gas: {self._total}", "", f"{'gas':>10}  function"]
+        out += [f"{gas:>10}  {name}" for name, gas in self.functions()[:limit]]
+        out += ["", self.line_table(limit)]
+        Path(path).write_text("\n".join(out) + "\n")
+
+
+def profile_path(nodeid):
+    """
+    File name stem for the profile of the test with the given node id.
+    """
+    return Path(PROFILE_DIR).joinpath(re.sub(r"[^\w\-=,\[\]]+", "_", nodeid))
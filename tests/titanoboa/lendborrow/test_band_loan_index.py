@@ -0,0 +1,136 @@
+import boa
+import pytest
+
+
+COLL_AMOUNT = 10**18
+
+
+@pytest.fixture(scope="module")
+def borrowers(accounts, collateral_token, stablecoin):
+    for acct in accounts[:6]:
+        collateral_token._mint_for_testing(acct, 10 * COLL_AMOUNT)
+        stablecoin._mint_for_testing(acct, 10**24)
+    return accounts[:6]
+
+
+def _band_index(market, amm, accounts):
+    """Return {band: set(accounts)} from the market's band index, and check its consistency."""
+    index = {}
+    for acct in accounts:
+        if not market.loan_exists(acct):
+            continue
+        n1 = amm.read_user_tick_numbers(acct)[0]
+        ix = market.band_loan_ix(acct)
+        assert market.band_loans(n1, ix) == acct
+        assert ix < market.band_n_loans(n1)
+        index.setdefault(n1, set()).add(acct)
+
+    for n1, loans in index.items():
+        assert market.band_n_loans(n1) == len(loans)
+    return index
+
+
+def test_create_loan(controller, market, amm, borrowers):
+    with boa.env.anchor():
+        for i, acct in enumerate(borrowers):
+            debt = market.max_borrowable(COLL_AMOUNT, 5) * (i % 3 + 1) // 3
+            with boa.env.prank(acct):
+                controller.create_loan(acct, market, COLL_AMOUNT, debt, 5)
+
+        index = _band_index(market, amm, borrowers)
+        assert sum(len(i) for i in index.values()) == len(borrowers)
+        assert len(index) == 3
+
+
+def test_adjust_loan_moves_band(controller, market, amm, borrowers):
+    a, b = borrowers[:2]
+    with boa.env.anchor():
+        for acct in (a, b):
+            with boa.env.prank(acct):
+                controller.create_loan(acct, market, COLL_AMOUNT, 10**20, 5)
+
+        n1 = amm.read_user_tick_numbers(a)[0]
+        assert market.band_n_loans(n1) == 2
+
+        with boa.env.prank(a):
+            controller.adjust_loan(a, market, 0, market.max_borrowable(COLL_AMOUNT, 5) // 2)
+
+        new_n1 = amm.read_user_tick_numbers(a)[0]
+        assert new_n1 < n1
+        assert market.band_n_loans(n1) == 1
+        assert market.band_loans(n1, 0) == b
+        assert market.band_n_loans(new_n1) == 1
+        assert market.band_loans(new_n1, 0) == a
+        _band_index(market, amm, borrowers)
+
+
+def test_close_loan(controller, market, amm, borrowers):
+    with boa.env.anchor():
+        for acct in borrowers:
+            with boa.env.prank(acct):
+                controller.create_loan(acct, market, COLL_AMOUNT, 10**20, 5)
+        n1 = amm.read_user_tick_numbers(borrowers[0])[0]
+        assert market.band_n_loans(n1) == len(borrowers)
+
+        for i in [0, 3, 5]:
+            with boa.env.prank(borrowers[i]):
+                controller.close_loan(borrowers[i], market)
+
+        assert market.band_n_loans(n1) == len(borrowers) - 3
+        assert market.band_loan_ix(borrowers[0]) == 0
+        _band_index(market, amm, borrowers)
+
+
+def test_liquidate(admin, controller, market, amm, monetary_policy, borrowers):
+    a, b, liquidator = borrowers[:3]
+    with boa.env.anchor():
+        with boa.env.prank(admin):
+            monetary_policy.set_rate(int(1e18 * 1.0 / 365 / 86400))
+        for acct in (a, b):
+            debt = market.max_borrowable(COLL_AMOUNT, 5)
+            with boa.env.prank(acct):
+                controller.create_loan(acct, market, COLL_AMOUNT, debt, 5)
+        boa.env.time_travel(80 * 86400)
+        n1 = amm.read_user_tick_numbers(a)[0]
+
+        with boa.env.prank(liquidator):
+            controller.liquidate(market, a, 0, 10**17)
+            assert market.band_n_loans(n1) == 2
+            controller.liquidate(market, a, 0)
+            assert market.band_n_loans(n1) == 1
+            assert market.band_loans(n1, 0) == b
+
+
+def test_users_to_liquidate_by_band(
+    admin, controller, market, amm, price_oracle, monetary_policy, borrowers
+):
+    with boa.env.anchor():
+        with boa.env.prank(admin):
+            monetary_policy.set_rate(int(1e18 * 1.0 / 365 / 86400))
+        for i, acct in enumerate(borrowers):
+            debt = market.max_borrowable(COLL_AMOUNT, 5) * (5 + i) // 10
+            with boa.env.prank(acct):
+                controller.create_loan(acct, market, COLL_AMOUNT, debt, 5)
+
+        assert market.users_to_liquidate_by_band() == []
+
+        # trade into the bands of the riskiest loans and let interest accrue
+        top = amm.read_user_tick_numbers(borrowers[-1])[0]
+        with boa.env.prank(borrowers[0]):
+            amm.exchange_dy(0, 1, COLL_AMOUNT * 2 // 5, 2**255)
+        with boa.env.prank(admin):
+            monetary_policy.set_rate(0)
+        boa.env.time_travel(120 * 86400)
+
+        assert amm.active_band() >= top
+        full_scan = market.users_to_liquidate()
+        by_band = market.users_to_liquidate_by_band()
+        assert len(by_band) > 0
+        assert sorted(by_band) == sorted(
+            i for i in full_scan if amm.read_user_tick_numbers(i[0])[0] <= amm.active_band()
+        )
+
+        # widening the search to every band finds every unhealthy loan
+        assert sorted(market.users_to_liquidate_by_band(1000)) == sorted(full_scan)
+
+        assert len(market.users_to_liquidate_by_band(1000, 1)) <= 1
@@ -0,0 +1,89 @@
+# Indexing the logs of a load generator run with `scripts/cdp/indexer.py`
+
+import boa
+import pytest
+
+from scripts.cdp.indexer import BoaLogSource, Indexer, SqliteStore
+from scripts.simulation.load import LoadConfig, LoadGenerator, deploy, generate_price_path
+
+
+CONFIG = LoadConfig(num_accounts=30, num_steps=15, ops_per_step=8, seed=7)
+
+
+@pytest.fixture(scope="module")
+def load_run():
+    with boa.env.anchor():
+        with BoaLogSource() as source:
+            contracts = deploy(CONFIG)
+            generator = LoadGenerator(CONFIG, contracts)
+            generator.run(generate_price_path(CONFIG))
+        yield source, contracts, generator
+
+
+def _index(load_run, path, **kwargs):
+    source, contracts, _ = load_run
+    store = SqliteStore(path)
+    return store, Indexer(source, store, contracts["controller"].address, **kwargs)
+
+
+def _dump(store, tables):
+    return {i: store.db.execute(f'SELECT * FROM "{i}" ORDER BY block_number, log_index').fetchall() for i in tables}
+
+
+def _count(store, table):
+    return store.db.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+
+
+def test_index_load_run(load_run, tmp_path):
+    source, contracts, generator = load_run
+    store, indexer = _index(load_run, tmp_path / "events.db", batch_size=100)
+    indexer.run()
+
+    assert store.get_markets(indexer.controller) == [
+        (contracts["market"].address, contracts["amm"].address)
+    ]
+    for name, table in [
+        ("create_loan", "CreateLoan"),
+        ("adjust_loan", "AdjustLoan"),
+        ("close_loan", "CloseLoan"),
+        ("liquidate", "LiquidateLoan"),
+        ("exchange", "TokenExchange"),
+    ]:
+        assert _count(store, table) == len(generator.gas[name])
+
+    # every loan action logs the new user state
+    assert _count(store, "Deposit") >= _count(store, "CreateLoan")
+    assert _count(store, "UserState") >= _count(store, "CreateLoan") + _count(store, "AdjustLoan")
+
+    # amounts are stored without loss of precision
+    rows = store.db.execute(
+        'SELECT c.debt_amount, u.debt FROM "CreateLoan" c JOIN "UserState" u ON c.tx_hash = u.tx_hash'
+    ).fetchall()
+    assert len(rows) == _count(store, "CreateLoan")
+    for debt_amount, debt in rows:
+        assert int(debt_amount) == int(debt) > 2**64
+
+
+def test_resume(load_run, tmp_path):
+    source = load_run[0]
+    tables = ["CreateLoan", "AdjustLoan", "CloseLoan", "Deposit", "Withdraw", "UserState"]
+    head = source.block_number()
+
+    store, indexer = _index(load_run, tmp_path / "full.db", batch_size=10**9)
+    indexer.run()
+    expected = _dump(store, tables)
+
+    # stop part way through, then resume with a new indexer
+    store, indexer = _index(load_run, tmp_path / "resumed.db", batch_size=37)
+    indexer.run(to_block=head // 2)
+    assert store.get_checkpoint(indexer.controller) == head // 2
+    store.close()
+
+    store, indexer = _index(load_run, tmp_path / "resumed.db", batch_size=37)
+    assert indexer.next_block == head // 2 + 1
+    indexer.run()
+    assert _dump(store, tables) == expected
+
+    # indexing the same range again does not duplicate rows
+    indexer.index_range(0, head)
+    assert _dump(store, tables) == expected
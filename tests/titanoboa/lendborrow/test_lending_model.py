@@ -0,0 +1,249 @@
+# Differential fuzzing of the off-chain lending model against `MarketOperator.vy` / `AMM.vy`
+#
+# The model is cheap to step, so `test_model_fuzz` explores long random sequences
+# of loan actions with invariants checked in pure python. `test_differential`
+# applies the same kind of sequences to both the contracts and the model, and
+# only compares the full state at sampled checkpoints.
+
+import random
+
+import boa
+import pytest
+from boa.vyper.contract import BoaError
+from hypothesis import given, settings
+from hypothesis import strategies as st
+
+from scripts.simulation import LLAMMA, LendingModel, Revert
+
+
+MODEL_STEPS = 20_000
+CHAIN_STEPS = 200
+CHECKPOINT_INTERVAL = 25
+MAX_RATE = 43959106799  # `MainController.MAX_RATE`
+
+
+def _random_action(rng, model, accounts):
+    """
+    Pick a random action for the accounts in `model`. Returns (name, args).
+    """
+    borrowers = [i for i in accounts if model.debt(i) > 0]
+    idle = [i for i in accounts if model.debt(i) == 0]
+    actions = ["time_travel", "change_rate"]
+    if idle:
+        actions.append("create_loan")
+    if borrowers:
+        actions += ["adjust_loan", "close_loan"]
+    action = rng.choice(actions)
+
+    if action == "time_travel":
+        return action, (rng.choice([0, 1, 60, 3600, 86400, rng.randint(0, 86400 * 30)]),)
+    if action == "change_rate":
+        return action, (rng.choice([0, rng.randint(0, MAX_RATE)]),)
+    if action == "create_loan":
+        # occasionally too little collateral to fill the bands
+        coll = rng.choice([rng.randint(10**15, 10**21), rng.randint(1, 10**4)])
+        return action, (rng.choice(idle), coll, rng.randint(1, coll * 2000), rng.randint(4, 50))
+
+    account = rng.choice(borrowers)
+    if action == "close_loan":
+        return action, (account,)
+    coll_change = rng.choice([0, rng.randint(1, 10**20), -rng.randint(0, model.get_sum_xy(account)[1] // 2)])
+    debt = model.debt(account)
+    debt_change = rng.choice([0, rng.randint(0, debt), -rng.randint(0, debt)])
+    return action, (account, coll_change, debt_change)
+
+
+def _apply_model(model, name, args, rate, n1=None):
+    # `n1` is the lowest band of the loan after creating or adjusting it
+    if name == "time_travel":
+        model.time_travel(*args)
+        return None
+    if name == "change_rate":
+        return None
+    if name == "create_loan":
+        account, coll, debt, n_bands = args
+        result = model.create_loan(account, coll, debt, n1, n1 + n_bands - 1)
+    elif name == "adjust_loan":
+        result = model.adjust_loan(*args, n1=n1)
+    else:
+        result = model.close_loan(*args)
+    # the controller updates the rate at the end of every loan action
+    model.set_rate(rate)
+    return result
+
+
+class _Ledger:
+    """
+    Collateral deposited into and withdrawn from the model, and an upper bound on
+    the rounding error between the sum of all debts and the total debt.
+    """
+
+    def __init__(self):
+        self.deposited = 0
+        self.withdrawn = 0
+        # every loan action rounds the stored debts down by less than 1 wei at the
+        # current rate multiplier, which then accrues interest
+        self.rounding = 0
+
+    def record(self, model, name, args, result):
+        if name in ("create_loan", "adjust_loan"):
+            self.deposited += args[1]
+        elif name == "close_loan":
+            self.withdrawn += result[2][1]
+        if name in ("create_loan", "adjust_loan", "close_loan"):
+            self.rounding = self.rounding + 10**36 // model.rate_mul + 1 if model.n_loans else 0
+
+    def max_debt_error(self, model, accounts):
+        return len(accounts) + self.rounding * model.get_rate_mul() // 10**36 + 1
+
+
+def _check_invariants(model, accounts, ledger):
+    amm = model.amm
+    debt_error = abs(sum(model.debt(i) for i in accounts) - model.total_debt())
+    assert debt_error <= ledger.max_debt_error(model, accounts)
+
+    shares = {}
+    for n1, n2, user_shares in model.user_shares.values():
+        for n, ds in zip(range(n1, n2 + 1), user_shares):
+            shares[n] = shares.get(n, 0) + ds
+    assert shares == {k: v for k, v in model.total_shares.items() if v}
+
+    for n in amm.bands_y:
+        assert amm.min_band <= n <= amm.max_band
+        assert model.total_shares.get(n, 0) > 0
+    assert sum(amm.bands_y.values()) + amm.admin_fees_y + ledger.withdrawn == ledger.deposited
+
+
+@given(seed=st.integers(min_value=0, max_value=2**32))
+@settings(max_examples=10)
+def test_model_fuzz(accounts, seed):
+    rng = random.Random(seed)
+    model = LendingModel.for_market()
+    ledger = _Ledger()
+    rate = 0
+    rate_mul = model.get_rate_mul()
+
+    for step in range(MODEL_STEPS):
+        name, args = _random_action(rng, model, accounts)
+        if name == "change_rate":
+            rate = args[0]
+        # bands above the active band, occasionally at or below it
+        n1 = model.amm.active_band + rng.randint(-2, 30)
+        try:
+            result = _apply_model(model, name, args, rate, n1)
+        except Revert:
+            continue
+        ledger.record(model, name, args, result)
+
+        assert model.get_rate_mul() >= rate_mul
+        rate_mul = model.get_rate_mul()
+        if step % 100 == 0:
+            _check_invariants(model, accounts, ledger)
+
+    _check_invariants(model, accounts, ledger)
+
+
+@pytest.fixture(scope="module")
+def borrowers(accounts, collateral_token, stablecoin, controller):
+    for acct in accounts:
+        with boa.env.prank(acct):
+            collateral_token.approve(controller, 2**256 - 1)
+            stablecoin.approve(controller, 2**256 - 1)
+    return accounts
+
+
+def _load_model(market, amm):
+    sim = LLAMMA.from_contract(amm, timestamp=boa.env.vm.state.timestamp)
+    return LendingModel(
+        sim,
+        debt_ceiling=market.debt_ceiling(),
+        rate=amm.rate(),
+        rate_mul=amm.eval("self.rate_mul"),
+        rate_time=amm.eval("self.rate_time"),
+    )
+
+
+def _assert_state(model, market, amm, accounts):
+    assert amm.get_rate_mul() == model.get_rate_mul()
+    assert market.total_debt() == model.total_debt()
+    assert market.n_loans() == model.n_loans
+
+    for acct in accounts:
+        assert market.debt(acct) == model.debt(acct)
+        if model.debt(acct):
+            assert amm.read_user_tick_numbers(acct) == model.read_user_tick_numbers(acct)
+            assert amm.get_sum_xy(acct) == model.get_sum_xy(acct)
+
+    sim = model.amm
+    assert amm.active_band() == sim.active_band
+    assert amm.min_band() == sim.min_band
+    assert amm.max_band() == sim.max_band
+    assert amm.admin_fees_y() == sim.admin_fees_y
+    for n in range(sim.min_band, sim.max_band + 1):
+        assert amm.bands_x(n) == sim.bands_x.get(n, 0)
+        assert amm.bands_y(n) == sim.bands_y.get(n, 0)
+
+
+def _apply_chain(name, args, controller, market, collateral_token, stablecoin, monetary_policy, admin):
+    if name == "time_travel":
+        boa.env.time_travel(args[0])
+    elif name == "change_rate":
+        with boa.env.prank(admin):
+            monetary_policy.set_rate(args[0])
+    elif name == "create_loan":
+        account, coll, debt, n_bands = args
+        collateral_token._mint_for_testing(account, coll)
+        with boa.env.prank(account):
+            controller.create_loan(account, market, coll, debt, n_bands)
+    elif name == "adjust_loan":
+        account, coll_change, debt_change = args
+        if coll_change > 0:
+            collateral_token._mint_for_testing(account, coll_change)
+        if debt_change < 0:
+            stablecoin._mint_for_testing(account, -debt_change)
+        with boa.env.prank(account):
+            controller.adjust_loan(account, market, coll_change, debt_change)
+    else:
+        account = args[0]
+        stablecoin._mint_for_testing(account, market.debt(account))
+        with boa.env.prank(account):
+            controller.close_loan(account, market)
+
+
+@given(seed=st.integers(min_value=0, max_value=2**32))
+@settings(max_examples=10)
+def test_differential(
+    controller, market, amm, monetary_policy, collateral_token, stablecoin, borrowers, admin, seed
+):
+    rng = random.Random(seed)
+    with boa.env.anchor():
+        model = _load_model(market, amm)
+        rate = monetary_policy.rate(market)
+
+        for step in range(CHAIN_STEPS):
+            name, args = _random_action(rng, model, borrowers)
+            if name == "create_loan":
+                # bound the requested debt by what the market allows
+                account, coll, _, n_bands = args
+                debt = market.max_borrowable(coll, n_bands) * rng.randint(1, 100) // 100
+                args = (account, coll, debt, n_bands)
+
+            try:
+                _apply_chain(
+                    name, args, controller, market, collateral_token, stablecoin, monetary_policy, admin
+                )
+            except BoaError:
+                # reverted on chain, e.g. for band placement which is not modelled
+                continue
+
+            if name == "change_rate":
+                rate = args[0]
+            n1 = None
+            if name in ("create_loan", "adjust_loan"):
+                n1 = amm.read_user_tick_numbers(args[0])[0]
+            _apply_model(model, name, args, rate, n1)
+
+            if step % CHECKPOINT_INTERVAL == 0:
+                _assert_state(model, market, amm, borrowers)
+
+        _assert_state(model, market, amm, borrowers)
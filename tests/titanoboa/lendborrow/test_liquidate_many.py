@@ -0,0 +1,115 @@
+import boa
+import pytest
+
+
+N = 5
+COLL_AMOUNT = 10**18
+
+
+@pytest.fixture(scope="module")
+def liquidator(accounts, stablecoin):
+    account = accounts[9]
+    stablecoin._mint_for_testing(account, 10**30)
+    return account
+
+
+@pytest.fixture(scope="module")
+def unhealthy_loans(accounts, admin, collateral_token, controller, market, monetary_policy):
+    borrowers = accounts[:4]
+    with boa.env.prank(admin):
+        monetary_policy.set_rate(int(1e18 * 1.0 / 365 / 86400))  # 100% APY
+
+    for i, acct in enumerate(borrowers):
+        collateral_token._mint_for_testing(acct, COLL_AMOUNT)
+        debt = market.max_borrowable(COLL_AMOUNT, N + i)
+        with boa.env.prank(acct):
+            controller.create_loan(acct, market, COLL_AMOUNT, debt, N + i)
+
+    boa.env.time_travel(80 * 86400)
+    with boa.env.prank(admin):
+        monetary_policy.set_rate(0)
+    for acct in borrowers:
+        assert market.health(acct) < 0
+
+    return borrowers
+
+
+def _balances(account, stablecoin, collateral_token, controller):
+    return (
+        stablecoin.balanceOf(account),
+        collateral_token.balanceOf(account),
+        stablecoin.totalSupply(),
+        controller.total_debt(),
+        controller.redeemed(),
+    )
+
+
+@pytest.mark.parametrize("frac", [10**18, 4 * 10**17])
+def test_matches_sequential_liquidations(
+    controller, market, stablecoin, collateral_token, liquidator, unhealthy_loans, frac
+):
+    targets = unhealthy_loans
+    fracs = [frac] * len(targets)
+
+    with boa.env.anchor():
+        with boa.env.prank(liquidator):
+            expected_return = [0, 0]
+            for target in targets:
+                debt_change, coll = controller.liquidate(market, target, 0, frac)
+                expected_return[0] += debt_change
+                expected_return[1] += coll
+        expected = _balances(liquidator, stablecoin, collateral_token, controller)
+        expected_debts = [market.debt(i) for i in targets]
+
+    with boa.env.anchor():
+        with boa.env.prank(liquidator):
+            result = controller.liquidate_many(market, targets, [0] * len(targets), fracs)
+        assert list(result) == expected_return
+        assert _balances(liquidator, stablecoin, collateral_token, controller) == expected
+        assert [market.debt(i) for i in targets] == expected_debts
+        if frac == 10**18:
+            assert market.n_loans() == 0
+
+
+def test_emits_event_per_target(controller, market, liquidator, unhealthy_loans):
+    with boa.env.anchor():
+        with boa.env.prank(liquidator):
+            controller.liquidate_many(market, unhealthy_loans, [0] * 4, [10**18] * 4)
+        logs = controller.get_logs(include_child_logs=False)
+        logs = [i for i in logs if i.event_type.name == "LiquidateLoan"]
+        assert [i.topics[2] for i in logs] == unhealthy_loans
+
+
+def test_length_mismatch(controller, market, liquidator, unhealthy_loans):
+    with boa.env.prank(liquidator):
+        with boa.reverts("DFM:C Array length mismatch"):
+            controller.liquidate_many(market, unhealthy_loans, [0] * 3, [10**18] * 4)
+        with boa.reverts("DFM:C Array length mismatch"):
+            controller.liquidate_many(market, unhealthy_loans, [0] * 4, [10**18] * 5)
+
+
+def test_frac_too_high(controller, market, liquidator, unhealthy_loans):
+    with boa.env.prank(liquidator):
+        with boa.reverts("DFM:C frac too high"):
+            controller.liquidate_many(market, unhealthy_loans[:2], [0, 0], [10**18, 10**18 + 1])
+
+
+def test_reverts_on_healthy_target(
+    accounts, controller, market, collateral_token, liquidator, unhealthy_loans
+):
+    healthy = accounts[5]
+    collateral_token._mint_for_testing(healthy, COLL_AMOUNT)
+    with boa.env.anchor():
+        with boa.env.prank(healthy):
+            controller.create_loan(healthy, market, COLL_AMOUNT, 10**20, N)
+        with boa.env.prank(liquidator):
+            with boa.reverts("DFM:M Not enough rekt"):
+                controller.liquidate_many(
+                    market, unhealthy_loans + [healthy], [0] * 5, [10**18] * 5
+                )
+
+
+def test_invalid_market(controller, liquidator, unhealthy_loans):
+    with boa.env.prank(liquidator):
+        with boa.reverts("DFM:C Invalid market"):
+            controller.liquidate_many(liquidator, unhealthy_loans, [0] * 4, [10**18] * 4)
@@ -0,0 +1,64 @@
+import boa
+import pytest
+
+
+RATE = int(1e18 * 0.04 / 365 / 86400)
+
+
+@pytest.fixture(scope="module", autouse=True)
+def setup(admin, monetary_policy, collateral_token, accounts):
+    with boa.env.prank(admin):
+        monetary_policy.set_rate(RATE)
+    collateral_token._mint_for_testing(accounts[0], 10**24)
+
+
+@pytest.fixture(autouse=True)
+def isolate():
+    with boa.env.anchor():
+        yield
+
+
+def _set_rate_logs(controller):
+    logs = controller.get_logs()
+    return [i for i in logs if i.event_type.name == "SetRate"]
+
+
+def test_same_rate_same_block_is_noop(controller, market, amm, accounts):
+    with boa.env.prank(accounts[0]):
+        controller.create_loan(accounts[0], market, 10**18, 10**20, 10)
+        assert amm.rate() == RATE
+        rate_mul = amm.get_rate_mul()
+
+        controller.adjust_loan(accounts[0], market, 10**18, 0)
+        assert not _set_rate_logs(controller)
+        assert amm.rate() == RATE
+        assert amm.get_rate_mul() == rate_mul
+
+
+def test_changed_rate_same_block(controller, market, amm, monetary_policy, admin, accounts):
+    with boa.env.prank(accounts[0]):
+        controller.create_loan(accounts[0], market, 10**18, 10**20, 10)
+    rate_mul = amm.get_rate_mul()
+
+    with boa.env.prank(admin):
+        monetary_policy.set_rate(RATE * 2)
+    with boa.env.prank(accounts[0]):
+        controller.adjust_loan(accounts[0], market, 10**18, 0)
+
+    assert len(_set_rate_logs(controller)) == 1
+    assert amm.rate() == RATE * 2
+    assert amm.get_rate_mul() == rate_mul
+
+
+def test_same_rate_new_block(controller, market, amm, accounts):
+    with boa.env.prank(accounts[0]):
+        controller.create_loan(accounts[0], market, 10**18, 10**20, 10)
+    boa.env.time_travel(3600)
+    rate_mul = amm.get_rate_mul()
+
+    with boa.env.prank(accounts[0]):
+        controller.adjust_loan(accounts[0], market, 10**18, 0)
+
+    assert len(_set_rate_logs(controller)) == 1
+    assert amm.rate() == RATE
+    assert amm.eval("self.rate_mul") == rate_mul
@@ -1,3 +1,5 @@
+from math import isqrt
+
 import boa
 import pytest
 from hypothesis import strategies as st, given
@@ -93,6 +95,7 @@ def test_debt_limit(peg_keepers, mock_peg_keepers, pk_regulator, agg, admin, sta
     for pk in all_pks:
         pk.eval("self.debt = 0")
         stablecoin.eval(f"self.balanceOf[{pk.address}] = {10 ** 18}")
+        pk_regulator.sync_debt_ratio(pk.address)
     for pk in all_pks:
         assert pk_regulator.get_max_provide(pk.address) == alpha**2 // 10**18
 
@@ -100,10 +103,37 @@ def test_debt_limit(peg_keepers, mock_peg_keepers, pk_regulator, agg, admin, sta
     for pk in all_pks[:2]:
         pk.eval("self.debt = 10 ** 18")
         stablecoin.eval(f"self.balanceOf[{pk.address}] = 0")
+        pk_regulator.sync_debt_ratio(pk.address)
     for pk in all_pks[2:]:
         assert pk_regulator.get_max_provide(pk.address) == pytest.approx(10**18, abs=5)
 
 
+def test_debt_ratio_sum(peg_keepers, mock_peg_keepers, pk_regulator, stablecoin):
+    all_pks = mock_peg_keepers + peg_keepers
+
+    for i, pk in enumerate(all_pks):
+        pk.eval(f"self.debt = {(i + 1) * 10 ** 18}")
+        stablecoin.eval(f"self.balanceOf[{pk.address}] = {(7 - i) * 10 ** 18}")
+
+    # stored ratios are only updated on a sync or debt change via the regulator
+    for pk in all_pks:
+        pk_regulator.sync_debt_ratio(pk.address)
+
+    expected = []
+    for pk in all_pks:
+        debt = pk.debt()
+        ratio = debt * 10**18 // (1 + debt + stablecoin.balanceOf(pk.address))
+        expected.append(isqrt(ratio * 10**18))
+        assert pk_regulator.debt_ratio_sqrt(pk.address) == expected[-1]
+
+    assert pk_regulator.debt_ratio_sqrt_sum() == sum(expected)
+
+
+def test_sync_debt_ratio_unknown(pk_regulator, alice):
+    with boa.reverts("DFM:R Unknown PegKeeper"):
+        pk_regulator.sync_debt_ratio(alice)
+
+
 def test_set_killed(pk_regulator, peg_keepers, admin):
     peg_keeper = peg_keepers[0]
     with boa.env.prank(admin):
@@ -0,0 +1,92 @@
+import boa
+import pytest
+
+
+pytestmark = pytest.mark.usefixtures("add_initial_liquidity", "mint_alice")
+
+
+def _imbalance(swaps, redeemable_tokens, initial_amounts, alice):
+    with boa.env.prank(alice):
+        for swap, rtoken, (amount_r, _) in zip(swaps, redeemable_tokens, initial_amounts):
+            rtoken._mint_for_testing(alice, amount_r)
+            swap.add_liquidity([amount_r, 0], 0)
+
+
+def test_update_many_matches_update(
+    swaps,
+    redeemable_tokens,
+    initial_amounts,
+    alice,
+    peg_keepers,
+    pk_regulator,
+    peg_keeper_updater,
+):
+    _imbalance(swaps, redeemable_tokens, initial_amounts, alice)
+
+    with boa.env.anchor():
+        with boa.env.prank(peg_keeper_updater):
+            profit = sum(pk_regulator.update(pk) for pk in peg_keepers)
+        expected = [(swap.balances(0), swap.balances(1)) for swap in swaps]
+        expected_debt = [pk.debt() for pk in peg_keepers]
+
+    with boa.env.prank(peg_keeper_updater):
+        assert pk_regulator.update_many(peg_keepers) == profit
+
+    assert [(swap.balances(0), swap.balances(1)) for swap in swaps] == expected
+    assert [pk.debt() for pk in peg_keepers] == expected_debt
+    assert pk_regulator.active_debt() == sum(expected_debt)
+
+
+def test_update_many_skips_action_delay(
+    swaps,
+    redeemable_tokens,
+    initial_amounts,
+    alice,
+    peg_keepers,
+    pk_regulator,
+    peg_keeper_updater,
+):
+    _imbalance(swaps, redeemable_tokens, initial_amounts, alice)
+
+    with boa.env.prank(peg_keeper_updater):
+        pk_regulator.update(peg_keepers[0])
+        debt = peg_keepers[0].debt()
+
+        pk_regulator.update_many(peg_keepers)
+
+    assert peg_keepers[0].debt() == debt
+    assert peg_keepers[1].debt() > 0
+
+
+def test_update_many_skips_unprofitable(peg_keepers, pk_regulator, peg_keeper_updater):
+    # pools are balanced, so every update would revert
+    with boa.env.prank(peg_keeper_updater):
+        assert pk_regulator.update_many(peg_keepers) == 0
+
+    assert [pk.debt() for pk in peg_keepers] == [0, 0]
+
+
+def test_update_many_unknown_pk(peg_keepers, pk_regulator, peg_keeper_updater, alice):
+    with boa.env.prank(peg_keeper_updater):
+        with boa.reverts("DFM:R Unknown PegKeeper"):
+            pk_regulator.update_many([peg_keepers[0].address, alice])
+
+
+def test_update_many_clears_cache(
+    swaps,
+    redeemable_tokens,
+    initial_amounts,
+    alice,
+    peg_keepers,
+    mock_peg_keepers,
+    pk_regulator,
+    peg_keeper_updater,
+):
+    _imbalance(swaps, redeemable_tokens, initial_amounts, alice)
+
+    with boa.env.prank(peg_keeper_updater):
+        pk_regulator.update_many(peg_keepers)
+
+    assert pk_regulator.eval("self.cached_stable_price") == 0
+    for pk in peg_keepers + mock_peg_keepers:
+        assert pk_regulator.eval(f"self.cached_price_oracle[{pk.POOL()}]") == 0
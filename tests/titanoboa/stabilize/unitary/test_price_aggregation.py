@@ -54,3 +54,39 @@ def test_crypto_agg(dummy_tricrypto, crypto_agg, stableswap_a, stablecoin_a, adm
             p = stableswap_a.price_oracle(0)
             assert p > 10**18 * 1.01
             assert crypto_agg.price() > p * 1.01
+
+
+def test_price_uses_stored_price(stableswap_a, stablecoin_a, agg, admin):
+    with boa.env.anchor():
+        with boa.env.prank(admin):
+            stablecoin_a._mint_for_testing(admin, 300_000 * 10**6)
+            stableswap_a.exchange(0, 1, 300_000 * 10**6, 0)
+            boa.env.time_travel(3600)
+
+            p = agg.price()
+            assert agg.price_w() == p
+            assert agg.last_price() == p
+
+            # pool oracles do not move within a block
+            stablecoin_a._mint_for_testing(admin, 300_000 * 10**6)
+            stableswap_a.exchange(0, 1, 300_000 * 10**6, 0)
+            assert agg.price() == p
+
+            boa.env.time_travel(3600)
+            assert agg.price() != p
+
+
+def test_stored_price_updated_on_pair_change(stableswap_a, stablecoin_a, agg, admin):
+    with boa.env.anchor():
+        with boa.env.prank(admin):
+            stablecoin_a._mint_for_testing(admin, 300_000 * 10**6)
+            stableswap_a.exchange(0, 1, 300_000 * 10**6, 0)
+            boa.env.time_travel(86400)
+
+            p = agg.price_w()
+            agg.remove_price_pair(0)
+            assert agg.price() != p
+            assert agg.price() == agg.last_price()
+
+            boa.env.time_travel(1)
+            assert agg.last_price() == agg.price_w()